@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Chat, Message
+from .models import Chat, ChatSummary, Message
 
 admin.site.register(Chat)
 admin.site.register(Message)
+admin.site.register(ChatSummary)
@@ -0,0 +1,113 @@
+import json
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class BaseBroker:
+    """
+    Chat events broker interface - fans out the events published by the views to the callbacks subscribed by the
+    websocket connections of the receivers. Other backends (e.g. Redis pub/sub) only need to implement these methods
+    """
+
+    def subscribe(self, profile_id, callback):
+        raise NotImplementedError
+
+    def unsubscribe(self, profile_id, callback):
+        raise NotImplementedError
+
+    def publish(self, profile_ids, event):
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Broker that only reaches the websocket connections handled by the current process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, profile_id, callback):
+        with self.lock:
+            self.subscriptions.setdefault(profile_id, set()).add(callback)
+
+    def unsubscribe(self, profile_id, callback):
+        with self.lock:
+            callbacks = self.subscriptions.get(profile_id, set())
+            callbacks.discard(callback)
+
+            if not callbacks:
+                self.subscriptions.pop(profile_id, None)
+
+    def publish(self, profile_ids, event):
+        with self.lock:
+            callbacks = [
+                callback for profile_id in profile_ids for callback in self.subscriptions.get(profile_id, set())
+            ]
+
+        for callback in callbacks:
+            callback(event)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Broker shared by the processes (e.g. the web workers) through Redis pub/sub - the events are published to a single
+    channel and each process fans them out to its own connections. The Redis url is set by CHATS_BROKER_URL
+    """
+
+    channel = "chats-events"
+
+    def __init__(self, url=None):
+        super().__init__()
+
+        # optional dependency, only needed by this backend
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.CHATS_BROKER_URL)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{self.channel: self.handle_message})
+        self.thread = self.pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def handle_message(self, message):
+        data = json.loads(message["data"])
+        super().publish(data["profile_ids"], data["event"])
+
+    def publish(self, profile_ids, event):
+        self.client.publish(
+            self.channel, json.dumps({"profile_ids": list(profile_ids), "event": event}, cls=JSONEncoder)
+        )
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+
+    if _broker is None:
+        _broker = import_string(getattr(settings, "CHATS_BROKER", "chats.broker.InProcessBroker"))()
+
+    return _broker
+
+
+def publish_on_commit(profile_ids, event):
+    """
+    Publishes the event once the current transaction is committed, so receivers never see rolled back data
+    """
+
+    transaction.on_commit(lambda: get_broker().publish(profile_ids, event))
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+
+    if setting == "CHATS_BROKER":
+        _broker = None
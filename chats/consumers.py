@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .broker import get_broker
+
+# close code sent when the connection doesn't carry a valid access token (also when it expires)
+UNAUTHORIZED_CLOSE_CODE = 4001
+
+# the token of an open connection is validated again in this interval (seconds) and when it expires, so deactivated
+# or deleted users stop receiving events
+TOKEN_CHECK_INTERVAL = 60
+
+
+def authenticate(token):
+    """
+    Validates a simplejwt access token (the same one used by the HTTP API) - returns its user's profile id and its
+    expiration timestamp, or (None, None)
+    """
+
+    authentication = JWTAuthentication()
+
+    try:
+        validated_token = authentication.get_validated_token(token)
+        return authentication.get_user(validated_token).profile.id, validated_token["exp"]
+    except (InvalidToken, TokenError, AuthenticationFailed, ObjectDoesNotExist):
+        return None, None
+
+
+def get_token_check_delay(expiration):
+    # a bit after the expiration, so the token is already expired when it's checked
+    return max(min(TOKEN_CHECK_INTERVAL, expiration - time.time() + 0.1), 0)
+
+
+async def chats_websocket_application(scope, receive, send):
+    """
+    ASGI websocket application that pushes the chat events (new messages and visualizations) of the
+    authenticated profile - the access token is sent in the *token* query param, e.g. /ws/chats/?token=<access>. The
+    connection is closed once the token expires (the client reconnects with a refreshed one) or its user is
+    deactivated
+    """
+
+    message = await receive()
+
+    if message["type"] != "websocket.connect":
+        return
+
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+    profile_id, expiration = await sync_to_async(authenticate)(token) if token else (None, None)
+
+    if profile_id is None:
+        await send({"type": "websocket.close", "code": UNAUTHORIZED_CLOSE_CODE})
+        return
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    # the views publish from worker threads, so the events are handed to the event loop thread-safely
+    def callback(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    await send({"type": "websocket.accept"})
+
+    broker = get_broker()
+    broker.subscribe(profile_id, callback)
+
+    receive_task = asyncio.ensure_future(receive())
+    event_task = asyncio.ensure_future(events.get())
+    check_task = asyncio.ensure_future(asyncio.sleep(get_token_check_delay(expiration)))
+
+    try:
+        while True:
+            done, _ = await asyncio.wait([receive_task, event_task, check_task], return_when=asyncio.FIRST_COMPLETED)
+
+            if check_task in done:
+                if (await sync_to_async(authenticate)(token))[0] != profile_id:
+                    await send({"type": "websocket.close", "code": UNAUTHORIZED_CLOSE_CODE})
+                    break
+
+                check_task = asyncio.ensure_future(asyncio.sleep(get_token_check_delay(expiration)))
+
+            if event_task in done:
+                await send({"type": "websocket.send", "text": json.dumps(event_task.result(), cls=JSONEncoder)})
+                event_task = asyncio.ensure_future(events.get())
+
+            if receive_task in done:
+                if receive_task.result()["type"] == "websocket.disconnect":
+                    break
+
+                # clients don't send anything through the socket - incoming frames are ignored
+                receive_task = asyncio.ensure_future(receive())
+    finally:
+        broker.unsubscribe(profile_id, callback)
+
+        for task in [receive_task, event_task, check_task]:
+            task.cancel()
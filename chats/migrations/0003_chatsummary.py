@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 11:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_chats_summaries(apps, schema_editor):
+    Chat = apps.get_model("chats", "Chat")
+    ChatSummary = apps.get_model("chats", "ChatSummary")
+
+    for chat in Chat.objects.prefetch_related("members"):
+        last_message = chat.messages.order_by("-id").first()
+
+        for profile in chat.members.all():
+            ChatSummary.objects.create(
+                chat=chat,
+                profile=profile,
+                last_message=last_message,
+                last_message_created_at=last_message.created_at if last_message is not None else None,
+                last_visualized_message=chat.messages.filter(visualized_by=profile).order_by("-id").first(),
+                unvisualized_messages_number=chat.messages.exclude(visualized_by=profile).count(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0028_alter_profile_options'),
+        ('chats', '0002_auto_20210817_2310'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['id']},
+        ),
+        migrations.CreateModel(
+            name='ChatSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_created_at', models.DateTimeField(blank=True, null=True)),
+                ('unvisualized_messages_number', models.PositiveIntegerField(default=0)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='chats.chat')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.message')),
+                ('last_visualized_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.message')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chats_summaries', to='profiles.profile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatsummary',
+            index=models.Index(fields=['profile', 'last_message'], name='chats_chats_profile_e926f4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='chatsummary',
+            constraint=models.UniqueConstraint(fields=('chat', 'profile'), name='unique_chat_summary'),
+        ),
+        migrations.RunPython(create_chats_summaries, migrations.RunPython.noop),
+    ]
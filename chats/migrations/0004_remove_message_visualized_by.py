@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 11:33
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def move_visualized_by_to_read_cursors(apps, schema_editor):
+    ChatSummary = apps.get_model("chats", "ChatSummary")
+    Message = apps.get_model("chats", "Message")
+
+    for summary in ChatSummary.objects.all():
+        last_visualized_message_id = Message.objects.filter(
+            chat_id=summary.chat_id, visualized_by=summary.profile_id
+        ).aggregate(id=Max("id"))["id"]
+
+        if last_visualized_message_id is None:
+            continue
+
+        summary.last_visualized_message_id = last_visualized_message_id
+        summary.unvisualized_messages_number = (
+            Message.objects.filter(chat_id=summary.chat_id, id__gt=last_visualized_message_id)
+            .exclude(sender_id=summary.profile_id)
+            .count()
+        )
+        summary.save()
+
+
+def move_read_cursors_to_visualized_by(apps, schema_editor):
+    ChatSummary = apps.get_model("chats", "ChatSummary")
+    Message = apps.get_model("chats", "Message")
+
+    for summary in ChatSummary.objects.exclude(last_visualized_message=None):
+        Message.visualized_by.through.objects.bulk_create(
+            [
+                Message.visualized_by.through(message_id=message_id, profile_id=summary.profile_id)
+                for message_id in Message.objects.filter(
+                    chat_id=summary.chat_id, id__lte=summary.last_visualized_message_id
+                ).values_list("id", flat=True)
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_chatsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_visualized_by_to_read_cursors, move_read_cursors_to_visualized_by),
+        migrations.RemoveField(
+            model_name='message',
+            name='visualized_by',
+        ),
+    ]
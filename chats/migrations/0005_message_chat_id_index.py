@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0004_remove_message_visualized_by"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["chat", "id"], name="chats_messa_chat_id_e5b40a_idx"),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from profiles.models import Profile
 
+LAST_MESSAGES_LENGTH = 20
+
 
 class Chat(models.Model):
     """
@@ -14,10 +16,15 @@ class Chat(models.Model):
 
     @property
     def last_messages(self):
-        return list(self.messages.all())[-20:]
+        # *get_chats_list* prefetches the messages preview for the whole page at once
+        if hasattr(self, "prefetched_last_messages"):
+            return self.prefetched_last_messages
+
+        return list(reversed(self.messages.order_by("-id")[:LAST_MESSAGES_LENGTH]))
 
     def get_unvisualized_messages_number(self, profile):
-        return len(self.messages.exclude(visualized_by=profile))
+        summary = self.summaries.filter(profile=profile).first()
+        return summary.unvisualized_messages_number if summary is not None else 0
 
 
 class Message(models.Model):
@@ -28,12 +35,44 @@ class Message(models.Model):
     chat = models.ForeignKey(Chat, related_name="messages", on_delete=models.CASCADE, blank=True, null=True)
     sender = models.ForeignKey(Profile, related_name="sent_messages", on_delete=models.SET_NULL, blank=True, null=True)
     content = models.CharField(max_length=1000, blank=True)
-    visualized_by = models.ManyToManyField(Profile, related_name="visualized_messages", blank=True)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["id"]
+        indexes = [models.Index(fields=["chat", "id"])]
 
     def __str__(self):
         return f"{self.sender.user.username} - {self.content[:100]}"
+
+    @property
+    def visualized_by(self):
+        # derived from the members' read cursors - prefetch *chat__summaries* when serializing many messages
+        return [
+            summary.profile_id
+            for summary in self.chat.summaries.all()
+            if summary.profile_id == self.sender_id or (summary.last_visualized_message_id or 0) >= self.id
+        ]
+
+
+class ChatSummary(models.Model):
+    """
+    Chat summary table - one row per chat member, updated by the views that create and visualize messages.
+    *last_visualized_message* is the member's read cursor: every message up to it was visualized by the member
+    """
+
+    chat = models.ForeignKey(Chat, related_name="summaries", on_delete=models.CASCADE)
+    profile = models.ForeignKey(Profile, related_name="chats_summaries", on_delete=models.CASCADE)
+    last_message = models.ForeignKey(Message, related_name="+", on_delete=models.SET_NULL, blank=True, null=True)
+    last_message_created_at = models.DateTimeField(blank=True, null=True)
+    last_visualized_message = models.ForeignKey(
+        Message, related_name="+", on_delete=models.SET_NULL, blank=True, null=True
+    )
+    unvisualized_messages_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["chat", "profile"], name="unique_chat_summary")]
+        indexes = [models.Index(fields=["profile", "last_message"])]
+
+    def __str__(self):
+        return f"{self.profile} - {self.chat} [{self.unvisualized_messages_number}]"
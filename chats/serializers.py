@@ -6,6 +6,7 @@ from .models import Chat, Message
 
 class MessageSerializer01(serializers.ModelSerializer):
     sender = ProfileSerializer02()
+    visualized_by = serializers.ListField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Message
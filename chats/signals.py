@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from profiles.long_polling import bump_notifications_version
+
+from .models import Chat, Message
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_bump_notifications_version(sender, instance, **kwargs):
+    # the chat is queried by id, since it may be already deleted when the deletion cascades from it
+    bump_notifications_version(
+        Chat.members.through.objects.filter(chat_id=instance.chat_id).values_list("profile_id", flat=True)
+    )
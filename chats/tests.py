@@ -1,3 +1,501 @@
-from django.test import TestCase
+import datetime
+import json
+import sys
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from core.asgi import application
+from core.pagination import encode_cursor
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .broker import InProcessBroker, RedisBroker, get_broker
+from .consumers import UNAUTHORIZED_CLOSE_CODE, authenticate
+from .models import Chat, ChatSummary, Message
+from .serializers import ChatSerializer01, MessageSerializer01
+
+User = get_user_model()
+client = Client()
+BASE_URL = "/api/chats/"
+
+
+class LocalBroker(InProcessBroker):
+    """
+    Stand-in broker that records every published event
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, profile_ids, event):
+        self.published.append((sorted(profile_ids), event))
+        super().publish(profile_ids, event)
+
+
+def create_chat(*profiles):
+    chat = Chat.objects.create()
+    chat.members.set(profiles)
+    ChatSummary.objects.bulk_create([ChatSummary(chat=chat, profile=profile) for profile in profiles])
+    return chat
+
+
+def create_message(chat, sender, content):
+    client.force_login(sender.user)
+    response = client.post(
+        BASE_URL + f"create-message/{chat.id}", {"content": content}, content_type="application/json"
+    )
+    return Message.objects.get(pk=response.data["id"])
+
+
+class TestGetChatsList(TestCase):
+    url = BASE_URL + "get-chats-list"
+
+    def setUp(self):
+        self.user = User.objects.create(username="felipe")
+
+    def test_req(self):
+        client.logout()
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for params in [
+            "cursor=invalid",
+            f"cursor={encode_cursor(last_message_id='foo')}",
+            f"cursor={encode_cursor(last_message_id=None)}",
+            "batch-length=0",
+            "batch-length=-1",
+        ]:
+            response = client.get(f"{self.url}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for method in ["delete", "put", "patch", "post"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        profile01 = User.objects.create(username="peter").profile
+        profile02 = User.objects.create(username="john").profile
+
+        chat01 = create_chat(self.user.profile, profile01)
+        chat02 = create_chat(self.user.profile, profile02)
+        # chats without messages shouldn't be returned
+        create_chat(self.user.profile, profile01, profile02)
+
+        create_message(chat01, profile01, "hi")
+        create_message(chat02, profile02, "hello")
+        create_message(chat01, self.user.profile, "hey")
+
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected_chats = ChatSerializer01([chat01, chat02], many=True).data
+        expected_chats[0]["unvisualized_messages_number"] = 1
+        expected_chats[1]["unvisualized_messages_number"] = 1
+
+        self.assertEqual(response.data, {"chats": expected_chats, "next_cursor": None})
+
+        client.patch(BASE_URL + f"visualize-chat-messages/{chat01.id}")
+
+        # paginating one chat at a time
+        response = client.get(self.url + "?batch-length=1")
+        self.assertEqual([chat["id"] for chat in response.data["chats"]], [chat01.id])
+        self.assertEqual(response.data["chats"][0]["unvisualized_messages_number"], 0)
+        self.assertIsNotNone(response.data["next_cursor"])
+
+        response = client.get(self.url + f"?batch-length=1&cursor={response.data['next_cursor']}")
+        self.assertEqual([chat["id"] for chat in response.data["chats"]], [chat02.id])
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_last_messages(self):
+        chat = create_chat(self.user.profile, User.objects.create(username="peter").profile)
+
+        for i in range(25):
+            create_message(chat, self.user.profile, str(i))
+
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertEqual(
+            [message["content"] for message in response.data["chats"][0]["messages"]],
+            [str(i) for i in range(5, 25)],
+        )
+
+    def test_query_count(self):
+        def get_queries_number():
+            client.force_login(self.user)
+
+            with CaptureQueriesContext(connection) as context:
+                client.get(self.url)
+            return len(context)
+
+        profile = User.objects.create(username="user00").profile
+        create_message(create_chat(self.user.profile, profile), profile, "hi")
+        queries_number = get_queries_number()
+
+        for i in range(1, 10):
+            profile = User.objects.create(username=f"user0{i}").profile
+            chat = create_chat(self.user.profile, profile)
+
+            for j in range(3):
+                create_message(chat, profile, str(j))
+
+        self.assertEqual(get_queries_number(), queries_number)
+
+
+class TestGetUnvisualizedMessagesNumber(TestCase):
+    url = BASE_URL + "get-unvisualized-messages-number"
+
+    def test_req(self):
+        client.logout()
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        for method in ["delete", "put", "patch", "post"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        profile01 = User.objects.create(username="peter").profile
+        profile02 = User.objects.create(username="john").profile
+
+        client.force_login(user)
+        response = client.get(self.url)
+        self.assertEqual(response.data, 0)
+
+        chat01 = create_chat(user.profile, profile01)
+        chat02 = create_chat(user.profile, profile01, profile02)
+
+        create_message(chat01, profile01, "hi")
+        create_message(chat02, profile01, "hello")
+        create_message(chat02, profile02, "hey")
+        create_message(chat02, user.profile, "what's up?")
+
+        client.force_login(user)
+        response = client.get(self.url)
+        self.assertEqual(response.data, 3)
+
+        client.patch(BASE_URL + f"visualize-chat-messages/{chat02.id}")
+        response = client.get(self.url)
+        self.assertEqual(response.data, 1)
+
+        self.assertEqual(chat01.get_unvisualized_messages_number(user.profile), 1)
+        self.assertEqual(chat02.get_unvisualized_messages_number(user.profile), 0)
+        self.assertEqual(chat02.get_unvisualized_messages_number(profile01), 2)
+
+
+class TestCreateMessage(TestCase):
+    url = BASE_URL + "create-message/"
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        profile = User.objects.create(username="peter").profile
+        chat = create_chat(user.profile, profile)
+
+        message = create_message(chat, user.profile, "  hi  ")
+        self.assertEqual(message.content, "hi")
+        self.assertEqual(message.visualized_by, [user.profile.id])
+
+        summary = ChatSummary.objects.get(chat=chat, profile=profile)
+        self.assertEqual(summary.last_message, message)
+        self.assertEqual(summary.last_message_created_at, message.created_at)
+        self.assertEqual(summary.unvisualized_messages_number, 1)
+
+        summary = ChatSummary.objects.get(chat=chat, profile=user.profile)
+        self.assertEqual(summary.last_message, message)
+        self.assertEqual(summary.unvisualized_messages_number, 0)
+
+        client.force_login(User.objects.create(username="john"))
+        response = client.post(self.url + str(chat.id), {"content": "hi"}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, "Você não está na conversa!")
+
+
+class TestCreateChat(TestCase):
+    url = BASE_URL + "create-chat"
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        User.objects.create(username="peter")
+
+        client.force_login(user)
+        response = client.post(self.url, {"members": ["peter"]}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        chat = Chat.objects.get(pk=response.data["id"])
+        self.assertEqual(set(chat.summaries.values_list("profile__user__username", flat=True)), {"felipe", "peter"})
+
+
+class TestVisualizeChatMessages(TestCase):
+    url = BASE_URL + "visualize-chat-messages/"
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        profile = User.objects.create(username="peter").profile
+        chat = create_chat(user.profile, profile)
+
+        message01 = create_message(chat, profile, "hi")
+        message02 = create_message(chat, profile, "are you there?")
+        self.assertEqual(message01.visualized_by, [profile.id])
+
+        client.force_login(user)
+        response = client.get(BASE_URL + f"get-chat-messages/{chat.id}?unvisualized-only=true")
+        self.assertEqual([message["id"] for message in response.data["messages"]], [message02.id, message01.id])
+
+        response = client.patch(self.url + str(chat.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        summary = ChatSummary.objects.get(chat=chat, profile=user.profile)
+        self.assertEqual(summary.last_visualized_message, message02)
+        self.assertEqual(summary.unvisualized_messages_number, 0)
+        self.assertEqual(sorted(message01.visualized_by), sorted([user.profile.id, profile.id]))
+
+        response = client.get(BASE_URL + f"get-chat-messages/{chat.id}?unvisualized-only=true")
+        self.assertEqual(response.data["messages"], [])
+
+        message03 = create_message(chat, profile, "hello?")
+        client.force_login(user)
+        response = client.get(BASE_URL + f"get-chat-messages/{chat.id}?unvisualized-only=true")
+        self.assertEqual([message["id"] for message in response.data["messages"]], [message03.id])
+        self.assertEqual(response.data["messages"][0]["visualized_by"], [profile.id])
+
+    def test_writes_number(self):
+        user = User.objects.create(username="felipe")
+        profile = User.objects.create(username="peter").profile
+        chat = create_chat(user.profile, profile)
+
+        def count_writes():
+            client.force_login(user)
+
+            with CaptureQueriesContext(connection) as context:
+                client.patch(self.url + str(chat.id))
+
+            return len([query for query in context if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+
+        create_message(chat, profile, "hi")
+        writes_number = count_writes()
+
+        for i in range(50):
+            create_message(chat, profile, f"message {i}")
+
+        self.assertEqual(count_writes(), writes_number)
+        self.assertEqual(ChatSummary.objects.get(chat=chat, profile=user.profile).unvisualized_messages_number, 0)
+
+
+class TestGetChatMessages(TestCase):
+    url = BASE_URL + "get-chat-messages/"
+
+    def setUp(self):
+        self.user = User.objects.create(username="felipe")
+        self.chat = create_chat(self.user.profile, User.objects.create(username="peter").profile)
+        self.messages = [create_message(self.chat, self.user.profile, str(i)) for i in range(25)]
+        client.force_login(self.user)
+
+    def get_messages_ids(self, query_params=""):
+        response = client.get(f"{self.url}{self.chat.id}{query_params}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["has_more"], [message["id"] for message in response.data["messages"]]
+
+    def test_req(self):
+        for params in ["before_id=abc", "batch-length=0", "batch-length=-1", "scroll-index=-1"]:
+            response = client.get(f"{self.url}{self.chat.id}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = client.get(f"{self.url}0")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for method in ["delete", "put", "patch", "post"]:
+            response = getattr(client, method)(f"{self.url}{self.chat.id}")
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        ids = [message.id for message in reversed(self.messages)]
+
+        self.assertEqual(self.get_messages_ids(), (True, ids[:20]))
+        self.assertEqual(self.get_messages_ids("?scroll-index=1"), (False, ids[20:]))
+
+        self.assertEqual(self.get_messages_ids(f"?before_id={ids[19]}&batch-length=5"), (False, ids[20:]))
+        self.assertEqual(self.get_messages_ids(f"?before_id={ids[9]}&batch-length=5"), (True, ids[10:15]))
+        self.assertEqual(self.get_messages_ids(f"?after_id={ids[10]}&batch-length=5"), (True, ids[5:10]))
+        self.assertEqual(self.get_messages_ids(f"?after_id={ids[5]}&batch-length=5"), (False, ids[:5]))
+
+    def test_query_count(self):
+        with CaptureQueriesContext(connection) as context:
+            self.get_messages_ids(f"?before_id={self.messages[-1].id}&batch-length=5")
+        queries_number = len(context)
+
+        for i in range(25):
+            create_message(self.chat, self.user.profile, str(i))
+
+        client.force_login(self.user)
+        with self.assertNumQueries(queries_number):
+            self.get_messages_ids(f"?before_id={self.messages[-1].id}&batch-length=5")
+
+
+class TestInProcessBroker(TestCase):
+    def test_publish(self):
+        broker = InProcessBroker()
+        received = []
+
+        broker.subscribe(1, received.append)
+        broker.subscribe(2, received.append)
+        broker.publish([1, 3], {"type": "message"})
+        self.assertEqual(received, [{"type": "message"}])
+
+        broker.unsubscribe(1, received.append)
+        broker.publish([1], {"type": "message"})
+        self.assertEqual(received, [{"type": "message"}])
+        self.assertEqual(list(broker.subscriptions), [2])
+
+
+class TestRedisBroker(TestCase):
+    def test_publish(self):
+        # the redis client isn't a dependency of the tests, the broker only needs its pub/sub methods
+        redis = MagicMock()
+
+        with patch.dict(sys.modules, {"redis": redis}):
+            broker = RedisBroker("redis://localhost:6379")
+
+        client = redis.Redis.from_url.return_value
+        client.pubsub.return_value.subscribe.assert_called_once_with(**{"chats-events": broker.handle_message})
+
+        broker.publish({1, 2}, {"type": "message"})
+        channel, data = client.publish.call_args[0]
+        self.assertEqual(channel, "chats-events")
+        self.assertEqual(json.loads(data), {"profile_ids": [1, 2], "event": {"type": "message"}})
+
+        # the events published by any process are fanned out to the connections of this one
+        received = []
+        broker.subscribe(1, received.append)
+        broker.handle_message({"type": "message", "channel": b"chats-events", "data": data})
+        self.assertEqual(received, [{"type": "message"}])
+
+
+@override_settings(CHATS_BROKER="chats.tests.LocalBroker")
+class TestChatsEvents(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="felipe")
+        self.profile = User.objects.create(username="peter").profile
+        self.chat = create_chat(self.user.profile, self.profile)
+
+    def test_published_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            message = create_message(self.chat, self.profile, "hi")
+
+        members_ids = sorted([self.user.profile.id, self.profile.id])
+        self.assertEqual(
+            get_broker().published,
+            [
+                (
+                    members_ids,
+                    {"type": "message", "chat_id": self.chat.id, "message": MessageSerializer01(message).data},
+                )
+            ],
+        )
+
+        client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(BASE_URL + f"visualize-chat-messages/{self.chat.id}")
+
+        self.assertEqual(
+            get_broker().published[-1],
+            (
+                members_ids,
+                {
+                    "type": "visualization",
+                    "chat_id": self.chat.id,
+                    "profile_id": self.user.profile.id,
+                    "last_visualized_message_id": message.id,
+                },
+            ),
+        )
+
+    def test_websocket(self):
+        def create_message_on_commit(content):
+            with self.captureOnCommitCallbacks(execute=True):
+                return create_message(self.chat, self.profile, content)
+
+        async def connect(token):
+            communicator = ApplicationCommunicator(
+                application, {"type": "websocket", "path": "/ws/chats/", "query_string": f"token={token}".encode()}
+            )
+            await communicator.send_input({"type": "websocket.connect"})
+            return communicator, await communicator.receive_output(timeout=1)
+
+        async def scenario():
+            communicator, output = await connect("invalid-token")
+            self.assertEqual(output, {"type": "websocket.close", "code": UNAUTHORIZED_CLOSE_CODE})
+
+            communicator, output = await connect(str(AccessToken.for_user(self.user)))
+            self.assertEqual(output, {"type": "websocket.accept"})
+
+            message = await sync_to_async(create_message_on_commit)("hi")
+            output = await communicator.receive_output(timeout=1)
+            self.assertEqual(output["type"], "websocket.send")
+            self.assertEqual(json.loads(output["text"])["message"]["id"], message.id)
+
+            await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+            await communicator.wait(timeout=1)
+            self.assertEqual(get_broker().subscriptions, {})
+
+        async_to_sync(scenario)()
+
+    def test_websocket_token_of_unexistent_user(self):
+        inactive_user = User.objects.create(username="tim", is_active=False)
+        deleted_user = User.objects.create(username="john")
+        tokens = [str(AccessToken.for_user(inactive_user)), str(AccessToken.for_user(deleted_user))]
+        deleted_user.delete()
+
+        self.assertEqual([authenticate(token) for token in tokens], [(None, None), (None, None)])
+
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(authenticate(str(token)), (self.user.profile.id, token["exp"]))
+
+    def test_websocket_closed_when_token_expires(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=datetime.timedelta(seconds=1))
+
+        async def scenario():
+            communicator = ApplicationCommunicator(
+                application, {"type": "websocket", "path": "/ws/chats/", "query_string": f"token={token}".encode()}
+            )
+            await communicator.send_input({"type": "websocket.connect"})
+            self.assertEqual(await communicator.receive_output(timeout=1), {"type": "websocket.accept"})
+            self.assertEqual(
+                await communicator.receive_output(timeout=3),
+                {"type": "websocket.close", "code": UNAUTHORIZED_CLOSE_CODE},
+            )
+            await communicator.wait(timeout=1)
+            self.assertEqual(get_broker().subscriptions, {})
+
+        async_to_sync(scenario)()
+
+    @patch("chats.consumers.TOKEN_CHECK_INTERVAL", 0.1)
+    def test_websocket_closed_when_user_is_deactivated(self):
+        token = AccessToken.for_user(self.user)
+
+        async def scenario():
+            communicator = ApplicationCommunicator(
+                application, {"type": "websocket", "path": "/ws/chats/", "query_string": f"token={token}".encode()}
+            )
+            await communicator.send_input({"type": "websocket.connect"})
+            self.assertEqual(await communicator.receive_output(timeout=1), {"type": "websocket.accept"})
+
+            await sync_to_async(User.objects.filter(pk=self.user.pk).update)(is_active=False)
+            self.assertEqual(
+                await communicator.receive_output(timeout=1),
+                {"type": "websocket.close", "code": UNAUTHORIZED_CLOSE_CODE},
+            )
+            await communicator.wait(timeout=1)
+
+        async_to_sync(scenario)()
@@ -1,10 +1,16 @@
+from core.pagination import decode_cursor, encode_cursor
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Prefetch, Subquery, Sum, When
+from django.db.models.functions import Coalesce
 from jwt_auth.decorators import login_required
+from profiles.long_polling import bump_notifications_version
 from profiles.models import Profile
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from chats.models import Chat, Message
+from chats.broker import publish_on_commit
+from chats.models import LAST_MESSAGES_LENGTH, Chat, ChatSummary, Message
 
 from .serializers import ChatSerializer01, MessageSerializer01
 
@@ -12,29 +18,85 @@ from .serializers import ChatSerializer01, MessageSerializer01
 @api_view(["GET"])
 @login_required
 def get_chats_list(request):
-    index = request.query_params.get("scroll-index", 0)
-    batch_length = request.query_params.get("batch-length", 20)
+    profile = request.user.profile
+
+    try:
+        batch_length = int(request.query_params.get("batch-length", 20))
+        cursor = decode_cursor(request.query_params.get("cursor"))
+        cursor_last_message_id = int(cursor["last_message_id"]) if "last_message_id" in cursor else None
+
+        if batch_length < 1:
+            raise ValueError("Invalid batch length")
+    except (ValueError, TypeError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    chats = (
+        Chat.objects.filter(summaries__profile=profile, summaries__last_message__isnull=False)
+        .annotate(
+            last_message_id=F("summaries__last_message_id"),
+            unvisualized_messages_number=F("summaries__unvisualized_messages_number"),
+        )
+        .order_by("-last_message_id")
+    )
 
-    chats = Chat.objects.filter(members=request.user.profile).exclude(messages=None)
+    # keyset pagination - message ids grow with time, so the last message id orders the chats by recency
+    if cursor_last_message_id is not None:
+        chats = chats.filter(last_message_id__lt=cursor_last_message_id)
+
+    # only the last messages of each chat are fetched, all in a single query
+    last_messages = Message.objects.filter(
+        id__gte=Coalesce(
+            Subquery(
+                Message.objects.filter(chat=OuterRef("chat"))
+                .order_by("-id")
+                .values("id")[LAST_MESSAGES_LENGTH - 1 : LAST_MESSAGES_LENGTH]
+            ),
+            0,
+        )
+    )
 
-    ordered_chats = sorted(chats, key=lambda chat: chat.messages.last().created_at)
-    ordered_chats.reverse()
+    chats = list(
+        chats.prefetch_related(
+            Prefetch("members", queryset=Profile.objects.select_related("user")),
+            Prefetch(
+                "messages",
+                queryset=last_messages.select_related("sender__user", "chat").prefetch_related("chat__summaries"),
+                to_attr="prefetched_last_messages",
+            ),
+        )[: batch_length + 1]
+    )
 
-    serializer = ChatSerializer01(ordered_chats[index * batch_length : (index + 1) * batch_length], many=True)
+    next_cursor = None
+
+    if len(chats) > batch_length:
+        chats = chats[:batch_length]
+        next_cursor = encode_cursor(last_message_id=chats[-1].last_message_id)
+
+    serializer = ChatSerializer01(chats, many=True)
     response_data = serializer.data
 
-    for serialized_chat in response_data:
-        chat = Chat.objects.get(id=serialized_chat["id"])
-        serialized_chat["unvisualized_messages_number"] = chat.get_unvisualized_messages_number(request.user.profile)
+    for chat, serialized_chat in zip(chats, response_data):
+        serialized_chat["unvisualized_messages_number"] = chat.unvisualized_messages_number
 
-    return Response(response_data)
+    return Response({"chats": response_data, "next_cursor": next_cursor})
 
 
 @api_view(["GET"])
 @login_required
 def get_chat_messages(request, chat_id):
-    scroll_index = int(request.query_params.get("scroll-index", 0))
-    batch_length = int(request.query_params.get("batch-length", 20))
+    try:
+        scroll_index = int(request.query_params.get("scroll-index", 0))
+        batch_length = int(request.query_params.get("batch-length", 20))
+        before_id = request.query_params.get("before_id", None)
+        before_id = int(before_id) if before_id is not None else None
+        after_id = request.query_params.get("after_id", None)
+        after_id = int(after_id) if after_id is not None else None
+
+        if batch_length < 1 or scroll_index < 0:
+            raise ValueError("Invalid batch")
+    except ValueError:
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
     unvisualized_only = request.query_params.get("unvisualized-only", "false") == "true"
 
     try:
@@ -45,20 +107,43 @@ def get_chat_messages(request, chat_id):
     if request.user.profile not in chat.members.all():
         return Response("Você não está na conversa!", status=status.HTTP_400_BAD_REQUEST)
 
-    messages = (
-        chat.messages.all() if not unvisualized_only else chat.messages.exclude(visualized_by=request.user.profile)
-    )
+    messages = chat.messages.select_related("sender__user").prefetch_related("chat__summaries")
+    has_more = False
 
-    messages = sorted(messages, key=lambda message: -message.created_at.timestamp())
-    messages = list(
-        messages if unvisualized_only else messages[scroll_index * batch_length : (scroll_index + 1) * batch_length]
-    )
+    if unvisualized_only:
+        last_visualized_message_id = (
+            chat.summaries.filter(profile=request.user.profile)
+            .values_list("last_visualized_message_id", flat=True)
+            .first()
+        )
+        messages = list(
+            messages.filter(id__gt=last_visualized_message_id or 0)
+            .exclude(sender=request.user.profile)
+            .order_by("-id")
+        )
+    else:
+        # keyset pagination over the (chat, id) index - one extra row is fetched to know if there are more messages
+        if after_id is not None:
+            messages = messages.filter(id__gt=after_id).order_by("id")[: batch_length + 1]
+        elif before_id is not None:
+            messages = messages.filter(id__lt=before_id).order_by("-id")[: batch_length + 1]
+        else:
+            offset = scroll_index * batch_length
+            messages = messages.order_by("-id")[offset : offset + batch_length + 1]
+
+        messages = list(messages)
+        has_more = len(messages) > batch_length
+        messages = messages[:batch_length]
+
+        if after_id is not None:
+            messages.reverse()
 
     serializer = MessageSerializer01(messages, many=True)
 
     return Response(
         {
-            "fully_rendered": (scroll_index + 1) * batch_length > len(chat.messages.all()),
+            "fully_rendered": not has_more,
+            "has_more": has_more,
             "messages": serializer.data,
         }
     )
@@ -67,11 +152,11 @@ def get_chat_messages(request, chat_id):
 @api_view(["GET"])
 @login_required
 def get_unvisualized_messages_number(request):
-    profile = request.user.profile
-    chats = Chat.objects.filter(members=profile)
-    unvisualized_messages_number = sum([chat.get_unvisualized_messages_number(profile) for chat in chats])
+    unvisualized_messages_number = ChatSummary.objects.filter(profile=request.user.profile).aggregate(
+        number=Sum("unvisualized_messages_number")
+    )["number"]
 
-    return Response(unvisualized_messages_number)
+    return Response(unvisualized_messages_number or 0)
 
 
 @api_view(["PATCH"])
@@ -82,12 +167,26 @@ def visualize_chat_messages(request, chat_id):
     except:
         return Response("Conversa não encontrada!", status=status.HTTP_404_NOT_FOUND)
 
-    if request.user.profile not in chat.members.all():
+    members_ids = list(chat.members.values_list("id", flat=True))
+
+    if request.user.profile.id not in members_ids:
         return Response("Você não está na conversa!", status=status.HTTP_400_BAD_REQUEST)
 
-    for message in chat.messages.exclude(visualized_by=request.user.profile):
-        message.visualized_by.add(request.user.profile)
-        message.save()
+    with transaction.atomic():
+        # moving the member's read cursor to the last message of the chat
+        summaries = ChatSummary.objects.filter(chat=chat, profile=request.user.profile)
+        summaries.update(unvisualized_messages_number=0, last_visualized_message=F("last_message"))
+
+        bump_notifications_version([request.user.profile.id])
+        publish_on_commit(
+            members_ids,
+            {
+                "type": "visualization",
+                "chat_id": chat.id,
+                "profile_id": request.user.profile.id,
+                "last_visualized_message_id": summaries.values_list("last_visualized_message_id", flat=True).first(),
+            },
+        )
 
     return Response("success")
 
@@ -105,14 +204,26 @@ def create_message(request, chat_id):
     except:
         return Response("Conversa não encontrada!", status=status.HTTP_404_NOT_FOUND)
 
-    if request.user.profile not in chat.members.all():
+    members_ids = list(chat.members.values_list("id", flat=True))
+
+    if request.user.profile.id not in members_ids:
         return Response("Você não está na conversa!", status=status.HTTP_400_BAD_REQUEST)
 
-    message = Message.objects.create(chat=chat, sender=request.user.profile, content=content)
-    message.visualized_by.add(request.user.profile)
-    message.save()
+    with transaction.atomic():
+        message = Message.objects.create(chat=chat, sender=request.user.profile, content=content)
+
+        # the message is unvisualized for every member but its sender
+        ChatSummary.objects.filter(chat=chat).update(
+            last_message=message,
+            last_message_created_at=message.created_at,
+            unvisualized_messages_number=Case(
+                When(profile=request.user.profile, then=F("unvisualized_messages_number")),
+                default=F("unvisualized_messages_number") + 1,
+            ),
+        )
 
     serializer = MessageSerializer01(message)
+    publish_on_commit(members_ids, {"type": "message", "chat_id": chat.id, "message": serializer.data})
 
     return Response(serializer.data)
 
@@ -132,9 +243,10 @@ def create_chat(request):
     except:
         return Response("Nome de usuário inválido!", status=status.HTTP_404_NOT_FOUND)
 
-    chat = Chat.objects.create()
-    chat.members.set([request.user.profile, *other_members])
-    chat.save()
+    with transaction.atomic():
+        chat = Chat.objects.create()
+        chat.members.set([request.user.profile, *other_members])
+        ChatSummary.objects.bulk_create([ChatSummary(chat=chat, profile=profile) for profile in chat.members.all()])
 
     serializer = ChatSerializer01(chat)
 
@@ -11,6 +11,27 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after the django setup, since it depends on the installed apps
+from chats.consumers import chats_websocket_application  # noqa: E402
+
+websocket_routes = {
+    "/ws/chats/": chats_websocket_application,
+}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        websocket_application = websocket_routes.get(scope["path"])
+
+        if websocket_application is None:
+            await receive()
+            await send({"type": "websocket.close"})
+            return
+
+        return await websocket_application(scope, receive, send)
+
+    return await django_application(scope, receive, send)
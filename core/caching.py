@@ -0,0 +1,102 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# names of the cached reference lists
+SKILLS_LIST = "skills"
+FIELDS_LIST = "fields"
+PROJECT_CATEGORIES_LIST = "project-categories"
+UNIVERSITIES_LIST = "universities"
+MAJORS_LIST = "majors"
+
+REFERENCE_LIST_VERSION_CACHE_KEY = "reference-list-version:{name}"
+REFERENCE_LIST_CACHE_KEY = "reference-list:{name}:{version}"
+
+# the lists are invalidated by signals, the timeout only bounds how stale the caches of other processes can get when
+# the cache backend isn't shared (e.g. the default local-memory backend)
+REFERENCE_LIST_CACHE_TIMEOUT = 60 * 60
+
+# cache backends holding a separate cache in each process
+PER_PROCESS_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_cache_shared():
+    """
+    Tells if the default cache is shared by the processes (e.g. Memcached or a Redis backend) - otherwise the invalidations
+    made by a process don't reach the caches of the others
+    """
+
+    return settings.CACHES["default"]["BACKEND"] not in PER_PROCESS_CACHE_BACKENDS
+
+
+def get_reference_list_version(name):
+    return cache.get_or_set(REFERENCE_LIST_VERSION_CACHE_KEY.format(name=name), 0, timeout=None)
+
+
+def invalidate_reference_lists(*names):
+    """
+    Marks the cached reference lists as outdated - again once the current transaction is committed, since the old
+    rows may be cached by other requests until then
+    """
+
+    def invalidate():
+        for name in names:
+            key = REFERENCE_LIST_VERSION_CACHE_KEY.format(name=name)
+            cache.add(key, 0, timeout=None)
+
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def get_etag(data):
+    return quote_etag(hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest())
+
+
+def cached_reference_list(name):
+    """
+    Caches the data of a GET view of a near-static list - the responses have an ETag, so clients that send it back in
+    If-None-Match get a 304 while the list doesn't change. Must be applied below @api_view
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = REFERENCE_LIST_CACHE_KEY.format(name=name, version=get_reference_list_version(name))
+            cached = cache.get(key)
+
+            if cached is None:
+                response = view(request, *args, **kwargs)
+
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+                data = json.loads(json.dumps(response.data))
+                cached = (get_etag(data), data)
+                cache.set(key, cached, REFERENCE_LIST_CACHE_TIMEOUT)
+
+            etag, data = cached
+            etags = parse_etags(request.headers.get("If-None-Match", ""))
+
+            if etag in etags or "*" in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            return Response(data, headers={"ETag": etag})
+
+        return wrapper
+
+    return decorator
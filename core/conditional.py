@@ -0,0 +1,72 @@
+import datetime
+import functools
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def get_signed_urls_epoch():
+    """
+    Returns the start of the current half of the expiration interval of the signed media urls - pages are considered
+    modified at least this recently, so 304s never keep clients using expired urls
+    """
+
+    interval = getattr(settings, "AWS_QUERYSTRING_EXPIRE", 3600) // 2
+    timestamp = timezone.now().timestamp()
+
+    return datetime.datetime.fromtimestamp(timestamp - timestamp % interval, tz=datetime.timezone.utc)
+
+
+def page_condition(get_last_modified, per_user=False):
+    """
+    Conditional GET (ETag and Last-Modified) for the pages whose data is only changed with their updated_at - the
+    *get_last_modified(request, *args, **kwargs)* function returns the time of the last change (None if the page
+    doesn't exist) and runs once per request. The etags of *per_user* pages (e.g. the logged user's profile) also
+    depend on the user. Must be applied below @api_view
+    """
+
+    def last_modified_func(request, *args, **kwargs):
+        if not hasattr(request, "page_last_modified"):
+            last_modified = get_last_modified(request, *args, **kwargs)
+
+            if last_modified is not None:
+                last_modified = max(last_modified, get_signed_urls_epoch())
+
+            request.page_last_modified = last_modified
+
+        return request.page_last_modified
+
+    def etag_func(request, *args, **kwargs):
+        last_modified = last_modified_func(request, *args, **kwargs)
+
+        if last_modified is None:
+            return None
+
+        # the etag keeps the microseconds, which Last-Modified drops
+        seed = f"{request.path}:{last_modified.isoformat()}"
+
+        if per_user:
+            seed += f":{request.user.pk}"
+
+        return hashlib.md5(seed.encode()).hexdigest()
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+
+            # browsers must revalidate the page before reusing it (no heuristic freshness) and keep it per user, since
+            # the api is authenticated by the Authorization header
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Authorization"])
+
+            return response
+
+        return wrapper
+
+    return decorator
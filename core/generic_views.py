@@ -1,8 +1,21 @@
+from django.http import HttpResponse
+from jwt_auth.decorators import login_required
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from .metrics import registry
+
 
 @api_view(["GET", "PATCH", "PUT", "POST", "DELETE"])
 def http_404_not_found(request):
     return Response("Rota não encontrada!", status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(["GET"])
+@login_required
+def get_metrics(request):
+    if not request.user.is_staff:
+        return Response("Somente administradores podem acessar essa rota!", status=status.HTTP_403_FORBIDDEN)
+
+    return HttpResponse(registry.export(), content_type="text/plain; version=0.0.4; charset=utf-8")
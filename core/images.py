@@ -0,0 +1,293 @@
+import base64
+import binascii
+import io
+import logging
+import posixpath
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, models, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .storage import get_content_hash, is_blob_name, save_blob
+
+logger = logging.getLogger(__name__)
+
+# accepted image formats: {Pillow format: extension}
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+# formats of the data urls: {mime subtype: Pillow format}
+IMAGE_FORMATS = {"jpeg": "JPEG", "jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+# maximum size of the decoded images, in bytes
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+# resized variants: maximum width and height, in pixels. Each one is stored as JPEG (PNG if it's transparent) and
+# as WebP ("<variant>_webp")
+IMAGE_VARIANTS = {"avatar": 96, "card": 320, "full": 1280}
+
+# number of threads processing the images - 0 processes them in the request (e.g. in tests)
+IMAGE_WORKERS = getattr(settings, "IMAGE_WORKERS", 2)
+
+# the data urls are decoded in chunks of this number of characters (a multiple of 4)
+DECODE_CHUNK_SIZE = 64 * 1024
+
+DATA_URL_REGEX = re.compile(r"data:image/(?P<format>[a-z]+);base64,")
+
+
+def check_image(file, image_format=None):
+    """
+    Checks that the file is a valid image of a supported format (of *image_format*, if given) - returns its extension.
+    Raises ValueError otherwise
+    """
+
+    try:
+        file.seek(0)
+
+        with Image.open(file) as image:
+            if image.format not in IMAGE_EXTENSIONS or image_format not in (None, image.format):
+                raise ValueError("Invalid image")
+
+            image.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise ValueError("Invalid image")
+
+    file.seek(0)
+
+    return IMAGE_EXTENSIONS[image.format]
+
+
+def decode_image(data_url):
+    """
+    Decodes a base64 image data url ("data:image/png;base64,...") into a temporary file, chunk by chunk, and checks
+    that it's a valid image - returns the file and its extension. Raises ValueError if it isn't a supported image or
+    it's larger than MAX_IMAGE_SIZE
+    """
+
+    match = DATA_URL_REGEX.match(data_url) if isinstance(data_url, str) else None
+
+    if match is None or match["format"] not in IMAGE_FORMATS:
+        raise ValueError("Invalid image")
+
+    if (len(data_url) - match.end()) * 3 // 4 > MAX_IMAGE_SIZE:
+        raise ValueError("Image too large")
+
+    file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    try:
+        for index in range(match.end(), len(data_url), DECODE_CHUNK_SIZE):
+            file.write(base64.b64decode(data_url[index : index + DECODE_CHUNK_SIZE], validate=True))
+
+        return file, check_image(file, IMAGE_FORMATS[match["format"]])
+    except (binascii.Error, ValueError):
+        file.close()
+        raise ValueError("Invalid image")
+
+
+def read_image(uploaded_file):
+    """
+    Copies an uploaded image (multipart, streamed to memory or disk by the upload handlers) into a temporary file,
+    chunk by chunk, and checks that it's a valid image - the temporary file outlives the request, unlike the
+    uploaded one. Returns the file and its extension and raises ValueError like *decode_image*
+    """
+
+    if uploaded_file.size > MAX_IMAGE_SIZE:
+        raise ValueError("Image too large")
+
+    file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    try:
+        for chunk in uploaded_file.chunks():
+            file.write(chunk)
+
+        return file, check_image(file)
+    except ValueError:
+        file.close()
+        raise
+
+
+def get_variant_names(root, transparent):
+    """
+    Returns the {variant name: blob name} of the resized variants of an image
+    """
+
+    names = {}
+
+    for variant in IMAGE_VARIANTS:
+        names[variant] = f"{root}_{variant}.{'png' if transparent else 'jpg'}"
+        names[f"{variant}_webp"] = f"{root}_{variant}_webp.webp"
+
+    return names
+
+
+def create_image_variants(image):
+    """
+    Yields the (variant name, content) of the resized variants of the image
+    """
+
+    transparent = is_transparent(image)
+    image = ImageOps.exif_transpose(image)
+
+    for variant, size in IMAGE_VARIANTS.items():
+        thumbnail = image.convert("RGBA" if transparent else "RGB")
+        thumbnail.thumbnail((size, size))
+
+        for name, image_format in [(variant, "PNG" if transparent else "JPEG"), (f"{variant}_webp", "WEBP")]:
+            content = io.BytesIO()
+            thumbnail.save(content, image_format, quality=85)
+
+            yield name, content.getvalue()
+
+
+def is_transparent(image):
+    return image.mode in ("RGBA", "LA") or "transparency" in image.info
+
+
+def process_image(model, pk, field_name, file, extension):
+    """
+    Stores the original image and its variants as content addressed blobs and sets them to the *field_name* and
+    *<field_name>_variants* fields of the object - the object is saved, so its signals run (e.g. invalidating caches).
+    Blobs already stored (e.g. a photo uploaded again) aren't uploaded nor resized again
+    """
+
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+    root = field.generate_filename(None, get_content_hash(file))
+
+    try:
+        with Image.open(file) as image:
+            variants = get_variant_names(root, is_transparent(image))
+            missing_variants = {variant for variant, name in variants.items() if not storage.exists(name)}
+
+            if missing_variants:
+                for variant, content in create_image_variants(image):
+                    if variant in missing_variants:
+                        variants[variant] = storage.save(variants[variant], ContentFile(content))
+
+        file.seek(0)
+        original_name = save_blob(storage, f"{root}.{extension}", File(file))
+    finally:
+        file.close()
+
+    instance = model.objects.filter(pk=pk).first()
+
+    if instance is None:
+        return
+
+    setattr(instance, field_name, original_name)
+    setattr(instance, f"{field_name}_variants", variants)
+    instance.save(update_fields=[field_name, f"{field_name}_variants", "updated_at"])
+
+
+def get_image_fields():
+    """
+    Yields the (model, field name) of the image fields processed by the pipeline - the ones with a *<field>_variants*
+    field
+    """
+
+    for model in apps.get_models():
+        fields_names = {field.name for field in model._meta.fields}
+
+        for field in model._meta.fields:
+            if isinstance(field, models.ImageField) and f"{field.name}_variants" in fields_names:
+                yield model, field.name
+
+
+def get_unreferenced_blobs(min_age):
+    """
+    Yields the (storage, name) of the stored blobs that no object references - blobs modified less than *min_age* (a
+    timedelta) ago are kept, since they may belong to images still being processed
+    """
+
+    referenced = set()
+    directories = {}
+
+    for model, field_name in get_image_fields():
+        field = model._meta.get_field(field_name)
+        directories[field.upload_to] = field.storage
+
+        for name, variants in model.objects.values_list(field_name, f"{field_name}_variants").iterator():
+            referenced.add(name)
+            referenced.update((variants or {}).values())
+
+    max_modified_time = timezone.now() - min_age
+
+    for directory, storage in directories.items():
+        try:
+            _, files = storage.listdir(directory)
+        except FileNotFoundError:
+            continue
+
+        for file in files:
+            name = posixpath.join(directory, file)
+
+            if is_blob_name(name) and name not in referenced and storage.get_modified_time(name) < max_modified_time:
+                yield storage, name
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+
+        return _executor
+
+
+def run_process_image(*args):
+    try:
+        process_image(*args)
+    except Exception:
+        logger.exception("Image processing failed")
+    finally:
+        close_old_connections()
+
+
+def process_image_in_background(model, pk, field_name, file, extension):
+    """
+    Schedules *process_image* in the worker pool once the current transaction is committed - with IMAGE_WORKERS = 0
+    the image is processed in the request (e.g. in tests)
+    """
+
+    def submit():
+        if getattr(settings, "IMAGE_WORKERS", IMAGE_WORKERS):
+            get_executor().submit(run_process_image, model, pk, field_name, file, extension)
+        else:
+            process_image(model, pk, field_name, file, extension)
+
+    transaction.on_commit(submit)
+
+
+class ImageVariantField(serializers.ImageField):
+    """
+    Read only image field serializing the url of a resized variant (see IMAGE_VARIANTS) of the image, or of the
+    original image while the variants aren't created
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        value = super().get_attribute(instance)
+        variants = getattr(instance, f"{self.source_attrs[-1]}_variants", None) or {}
+
+        if value and variants.get(self.variant):
+            return FieldFile(value.instance, value.field, variants[self.variant])
+
+        return value
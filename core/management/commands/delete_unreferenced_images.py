@@ -0,0 +1,27 @@
+import datetime
+
+from core.images import get_unreferenced_blobs
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Deletes the stored image blobs (originals and variants) that no profile or project references"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=24, help="Keeps the blobs modified in this number of hours (default: 24)"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only lists the unreferenced blobs")
+
+    def handle(self, *args, **options):
+        deleted = 0
+
+        for storage, name in get_unreferenced_blobs(datetime.timedelta(hours=options["hours"])):
+            if options["dry_run"]:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+
+            deleted += 1
+
+        self.stdout.write(f"{deleted} images {'unreferenced' if options['dry_run'] else 'deleted'}")
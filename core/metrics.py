@@ -0,0 +1,264 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the buckets of the histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# histograms of the requests of each route: (metric name, help, buckets, RequestMetrics attribute)
+HISTOGRAMS = [
+    ("uniconn_request_duration_seconds", "Time to respond to the request", DURATION_BUCKETS, "duration"),
+    ("uniconn_request_db_queries", "Number of database queries of the request", QUERIES_BUCKETS, "queries"),
+    ("uniconn_request_db_duration_seconds", "Time spent in database queries", DURATION_BUCKETS, "db_duration"),
+    ("uniconn_request_render_duration_seconds", "Time to render the response", DURATION_BUCKETS, "render_duration"),
+    ("uniconn_response_size_bytes", "Size of the response body", SIZE_BUCKETS, "response_size"),
+]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative_counts(self):
+        """
+        Returns the (upper bound, number of values lower or equal to it) of each bucket, the last one being "+Inf"
+        """
+
+        cumulative_counts = []
+        total = 0
+
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            total += count
+            cumulative_counts.append((bound, total))
+
+        return cumulative_counts
+
+
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Histograms of the requests handled by this process, by method and route - each process (e.g. gunicorn worker)
+    has its own registry, so every one of them must be scraped
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # {(metric name, method, route): Histogram}
+
+    def observe(self, method, route, metrics):
+        with self.lock:
+            for name, _, buckets, attribute in HISTOGRAMS:
+                key = (name, method, route)
+
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+
+                self.histograms[key].observe(getattr(metrics, attribute))
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def export(self):
+        """
+        Returns the histograms in the Prometheus text format
+        """
+
+        lines = []
+
+        with self.lock:
+            for name, help, _, _ in HISTOGRAMS:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+
+                for (histogram_name, method, route), histogram in sorted(self.histograms.items()):
+                    if histogram_name != name:
+                        continue
+
+                    labels = f'method="{escape_label_value(method)}",route="{escape_label_value(route)}"'
+
+                    for bound, count in histogram.get_cumulative_counts():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """
+    Metrics of a request - also a database execute wrapper counting and timing the queries
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0
+        self.render_duration = 0
+        self.duration = 0
+        self.response_size = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += time.perf_counter() - start
+
+
+# metrics of the request being handled - a context variable, so it's also seen by the threads the sync code of an
+# ASGI request runs in (sync_to_async copies the context)
+current_metrics = contextvars.ContextVar("current_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed in every connection - the queries are counted in the metrics of the current request
+    """
+
+    metrics = current_metrics.get()
+
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection=connection, **kwargs):
+    # the connections are per thread, so the wrapper is installed in each one instead of around the request
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+def get_route(request):
+    """
+    Returns the route pattern of the request (e.g. "api/projects/get-project/<int:project_id>"), so requests to
+    different objects are aggregated together
+    """
+
+    return getattr(getattr(request, "resolver_match", None), "route", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the number and the time of the database queries, the rendering time (DRF renders the serialized data
+    to JSON) and the response size of each request - they're sent in the Server-Timing header, logged as a JSON line
+    by the "core.metrics" logger and aggregated in the per-route histograms exported by the metrics view. Should be
+    the first middleware, so the time of the others is measured too. It's sync and async capable, so the async views
+    (e.g. the long-poll ones) aren't switched to a thread under ASGI
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.query_recorder_installed = False
+
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        install_query_recorder()
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        return self.record(request, response, start)
+
+    async def __acall__(self, request):
+        if not self.query_recorder_installed:
+            # the sync views run in the thread sensitive thread, whose connection may have been created before the
+            # connection_created receiver was connected (new connections get the wrapper from it)
+            await sync_to_async(install_query_recorder)()
+            self.query_recorder_installed = True
+
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        return self.record(request, response, start)
+
+    def record(self, request, response, start):
+        metrics = request.metrics
+        metrics.duration = time.perf_counter() - start
+        metrics.response_size = 0 if response.streaming else len(response.content)
+        route = get_route(request)
+
+        response["Server-Timing"] = (
+            f'db;dur={metrics.db_duration * 1000:.2f};desc="{metrics.queries} queries", '
+            f"render;dur={metrics.render_duration * 1000:.2f}, "
+            f"total;dur={metrics.duration * 1000:.2f}"
+        )
+
+        registry.observe(request.method, route, metrics)
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "route": route,
+                    "status": response.status_code,
+                    "queries": metrics.queries,
+                    "db_duration": round(metrics.db_duration, 6),
+                    "render_duration": round(metrics.render_duration, 6),
+                    "duration": round(metrics.duration, 6),
+                    "response_size": metrics.response_size,
+                }
+            )
+        )
+
+        return response
+
+    def process_template_response(self, request, response):
+        # called right before the response is rendered
+        start = time.perf_counter()
+
+        def record_render_duration(response):
+            request.metrics.render_duration = time.perf_counter() - start
+
+        response.add_post_render_callback(record_render_duration)
+
+        return response
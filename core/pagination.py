@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(**values):
+    """
+    Encodes keyset values (e.g. the id of the last item of a page) into an opaque url-safe cursor
+    """
+
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor created by *encode_cursor* - raises ValueError if the cursor is malformed
+    """
+
+    if cursor is None or cursor == "":
+        return {}
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+
+    return values
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
     "universities",
     "projects",
     "chats",
+    "search",
+    "core",
 ]
 
 # JWTAuthentication => Authentication class that is actually used in the app
@@ -84,6 +86,7 @@ JWT_COOKIE_SECURE = True
 JWT_COOKIE_SAMESITE = "None"
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -190,8 +193,26 @@ AWS_STORAGE_BUCKET_NAME = "uniconn-bucket"
 AWS_S3_REGION_NAME = "us-east-2"
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+DEFAULT_FILE_STORAGE = "core.storage.BlobS3Storage"
+# serves the images by public unsigned urls - the bucket must accept public object ACLs (see core.storage)
+AWS_PUBLIC_BLOBS = False
 
 
 # Auth User Model
 AUTH_USER_MODEL = "profiles.User"
+
+
+# Chats events broker - fans out new messages and visualizations to the websocket connections
+CHATS_BROKER = "chats.broker.InProcessBroker"
+
+
+# Threads resizing the uploaded images in the background - 0 resizes them in the request
+IMAGE_WORKERS = 2
+
+
+# Cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
     "universities",
     "projects",
     "chats",
+    "search",
+    "core",
 ]
 
 # JWTAuthentication => Authentication class that is actually used in the app
@@ -81,6 +83,7 @@ JWT_COOKIE_SECURE = True
 JWT_COOKIE_SAMESITE = "None"
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -181,11 +184,54 @@ AWS_STORAGE_BUCKET_NAME = "uniconn-bucket"
 AWS_S3_REGION_NAME = "us-east-2"
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+DEFAULT_FILE_STORAGE = "core.storage.BlobS3Storage"
+# serves the images by public unsigned urls - the bucket must accept public object ACLs (see core.storage)
+AWS_PUBLIC_BLOBS = os.environ.get("AWS_PUBLIC_BLOBS") == "true"
 
 
 # Auth User Model
 AUTH_USER_MODEL = "profiles.User"
 
 
-django_heroku.settings(locals())
+# Chats events broker - fans out new messages and visualizations to the websocket connections. With more than one web
+# worker it must be shared by them (the Redis one, set by REDIS_URL), the in-process one only reaches the connections
+# of the publishing worker
+CHATS_BROKER_URL = os.environ.get("REDIS_URL")
+CHATS_BROKER = "chats.broker.RedisBroker" if CHATS_BROKER_URL else "chats.broker.InProcessBroker"
+
+
+# Threads resizing the uploaded images in the background - 0 resizes them in the request
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+
+
+# Cache - local memory by default, a shared backend (e.g. a redis one) can be set by environment variables
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+
+# Logging - the request metrics are written to stdout as JSON lines by the "core.metrics" logger. django_heroku's
+# logging config is disabled, since it only sets up its "testlogger"
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "metrics": {"class": "logging.StreamHandler", "stream": "ext://sys.stdout", "formatter": "message"},
+    },
+    "loggers": {
+        "core.metrics": {
+            "handlers": ["metrics"],
+            "level": os.environ.get("METRICS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+
+django_heroku.settings(locals(), logging=False)
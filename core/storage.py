@@ -0,0 +1,78 @@
+import hashlib
+import re
+
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import setting
+
+# blobs are named by the sha256 of their content (variants by the hash of their original plus a suffix), e.g.
+# "profile_photos/<hash>.jpg" and "profile_photos/<hash>_avatar_webp.webp"
+BLOB_NAME_REGEX = re.compile(r"(^|/)[0-9a-f]{64}(_[a-z_]+)?\.[a-z]+$")
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# the content of a blob never changes, so it can be cached forever
+IMMUTABLE_CACHE_CONTROL = "max-age=31536000, immutable"
+
+
+def is_blob_name(name):
+    return bool(BLOB_NAME_REGEX.search(name or ""))
+
+
+def get_content_hash(file):
+    """
+    Returns the sha256 of the content of the file, read in chunks
+    """
+
+    content_hash = hashlib.sha256()
+    file.seek(0)
+
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        content_hash.update(chunk)
+
+    file.seek(0)
+
+    return content_hash.hexdigest()
+
+
+def save_blob(storage, name, content):
+    """
+    Saves a content addressed blob - the upload is skipped when it's already stored, since a blob with the same name
+    has the same content
+    """
+
+    if storage.exists(name):
+        return name
+
+    return storage.save(name, content)
+
+
+class BlobS3Storage(S3Boto3Storage):
+    """
+    S3 storage uploading the content addressed blobs with a long Cache-Control, since their content never changes.
+    Their urls are signed like the ones of the other files (or served by AWS_S3_CUSTOM_DOMAIN, e.g. a CDN), unless
+    AWS_PUBLIC_BLOBS is set: then they're uploaded public-read and served by unsigned urls, stable and cached by the
+    browsers - the bucket must accept object ACLs (Object Ownership not "bucket owner enforced") and public ones (Block
+    Public Access off), and every profile and project photo becomes public
+    """
+
+    def get_default_settings(self):
+        return {**super().get_default_settings(), "public_blobs": setting("AWS_PUBLIC_BLOBS", False)}
+
+    def get_object_parameters(self, name):
+        parameters = super().get_object_parameters(name)
+
+        if is_blob_name(name):
+            parameters["CacheControl"] = IMMUTABLE_CACHE_CONTROL
+
+            if self.public_blobs:
+                parameters.update({"CacheControl": f"public, {IMMUTABLE_CACHE_CONTROL}", "ACL": "public-read"})
+
+        return parameters
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        url = super().url(name, parameters, expire, http_method)
+
+        if self.public_blobs and is_blob_name(name) and not self.custom_domain:
+            return self._strip_signing_parameters(url)
+
+        return url
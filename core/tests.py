@@ -0,0 +1,134 @@
+import json
+import re
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from .caching import is_cache_shared
+from .metrics import Histogram, RequestMetricsMiddleware, registry
+from .storage import IMMUTABLE_CACHE_CONTROL, BlobS3Storage
+
+User = get_user_model()
+client = Client()
+
+
+class TestHistogram(TestCase):
+    def test_observe(self):
+        histogram = Histogram((1, 5, 10))
+
+        for value in [0, 1, 3, 7, 50]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.get_cumulative_counts(), [(1, 2), (5, 3), (10, 4), ("+Inf", 5)])
+        self.assertEqual((histogram.sum, histogram.count), (61, 5))
+
+
+class TestIsCacheShared(TestCase):
+    def test_is_cache_shared(self):
+        for backend, shared in [
+            ("django.core.cache.backends.locmem.LocMemCache", False),
+            ("django.core.cache.backends.memcached.PyMemcacheCache", True),
+        ]:
+            # the dict is patched instead of overriding the settings, which would connect to the uninstalled backend
+            with mock.patch.dict(settings.CACHES["default"], BACKEND=backend):
+                self.assertEqual(is_cache_shared(), shared)
+
+
+class TestBlobS3Storage(TestCase):
+    def test_public_blobs(self):
+        blob_name = f"profile_photos/{'a' * 64}_avatar.jpg"
+
+        storage = BlobS3Storage()
+        self.assertEqual(storage.get_object_parameters(blob_name), {"CacheControl": IMMUTABLE_CACHE_CONTROL})
+        self.assertIn("X-Amz-Signature=", storage.url(blob_name))
+
+        # only when enabled, since the bucket must accept public ACLs
+        storage = BlobS3Storage(public_blobs=True)
+        self.assertEqual(
+            storage.get_object_parameters(blob_name),
+            {"CacheControl": f"public, {IMMUTABLE_CACHE_CONTROL}", "ACL": "public-read"},
+        )
+        self.assertNotIn("?", storage.url(blob_name))
+        self.assertIn("X-Amz-Signature=", storage.url("profile_photos/default.jpg"))
+        self.assertEqual(storage.get_object_parameters("profile_photos/default.jpg"), {})
+
+
+class TestRequestMetrics(TestCase):
+    url = "/api/metrics"
+
+    def setUp(self):
+        self.user = User.objects.create(username="jeff")
+        registry.clear()
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/profiles/get-profile/jeff")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(
+            response["Server-Timing"],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", render;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        self.assertGreater(response.wsgi_request.metrics.render_duration, 0)
+
+    async def test_async(self):
+        async def get_response(request):
+            pass
+
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(RequestMetricsMiddleware(lambda request: None)))
+
+        # the long-poll view is async, so the whole chain runs in the event loop under ASGI
+        with self.assertLogs("core.metrics", "INFO") as logs:
+            response = await AsyncClient().get("/api/profiles/wait-notifications-number")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["route"], "api/profiles/wait-notifications-number")
+
+    async def test_async_queries(self):
+        # get-profile is a sync view, so under ASGI its queries run in another thread than the middleware
+        response = await AsyncClient().get("/api/profiles/get-profile/jeff")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = response.asgi_request.metrics.queries
+        self.assertGreater(queries, 0)
+        self.assertIn(f'desc="{queries} queries"', response["Server-Timing"])
+
+    def test_req(self):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data, "Somente administradores podem acessar essa rota!")
+
+        for method in ["delete", "put", "patch", "post"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        client.get("/api/profiles/get-profile/jeff")
+        client.get("/api/profiles/get-profile/unexistent-username")
+
+        self.user.is_staff = True
+        self.user.save()
+        client.force_login(self.user)
+
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+        metrics = response.content.decode()
+        labels = 'method="GET",route="api/profiles/get-profile/<str:slug>"'
+        self.assertIn("# TYPE uniconn_request_db_queries histogram", metrics)
+        self.assertIn(f'uniconn_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', metrics)
+        self.assertIn(f"uniconn_response_size_bytes_count{{{labels}}} 2", metrics)
+        self.assertTrue(re.search(rf"uniconn_request_db_queries_sum{{{re.escape(labels)}}} [1-9]", metrics))
@@ -18,6 +18,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .generic_views import get_metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     # Auth routes
@@ -27,6 +29,8 @@ urlpatterns = [
     path("api/projects/", include("projects.urls")),
     path("api/universities/", include("universities.urls")),
     path("api/chats/", include("chats.urls")),
+    # Request metrics (Prometheus)
+    path("api/metrics", get_metrics),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+NOTIFICATIONS_VERSION_CACHE_KEY = "notifications-version:{profile_id}"
+
+# waiting requests re-check the version in this interval (seconds). The versions live in the default cache, so
+# changes made by other processes are only noticed when it's shared by them (e.g. Redis or Memcached, set by the
+# CACHE_BACKEND and CACHE_LOCATION variables) - with LocMemCache each process has its own versions and only the
+# changes made by the same process wake up its waiting requests
+POLL_INTERVAL = 2
+
+_waiters_lock = threading.Lock()
+_waiters = {}
+
+
+def get_notifications_version(profile_id):
+    return cache.get_or_set(NOTIFICATIONS_VERSION_CACHE_KEY.format(profile_id=profile_id), 0, timeout=None)
+
+
+def bump_notifications_version(profile_ids):
+    """
+    Marks the notifications of the given profiles as changed (once the current transaction is committed) and wakes
+    up their waiting requests
+    """
+
+    profile_ids = set(profile_ids)
+
+    def bump():
+        for profile_id in profile_ids:
+            key = NOTIFICATIONS_VERSION_CACHE_KEY.format(profile_id=profile_id)
+            cache.add(key, 0, timeout=None)
+
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+            with _waiters_lock:
+                waiters = list(_waiters.get(profile_id, []))
+
+            for loop, event in waiters:
+                loop.call_soon_threadsafe(event.set)
+
+    transaction.on_commit(bump)
+
+
+async def wait_notifications_version_change(profile_id, version, timeout):
+    """
+    Waits until the notifications version of the profile differs from *version* or the timeout expires - returns the
+    current version
+    """
+
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    waiter = (loop, event)
+    deadline = loop.time() + timeout
+
+    with _waiters_lock:
+        _waiters.setdefault(profile_id, set()).add(waiter)
+
+    try:
+        while True:
+            event.clear()
+            current_version = await sync_to_async(get_notifications_version)(profile_id)
+
+            if current_version != version or loop.time() >= deadline:
+                return current_version
+
+            try:
+                await asyncio.wait_for(event.wait(), min(POLL_INTERVAL, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _waiters_lock:
+            _waiters[profile_id].discard(waiter)
+
+            if not _waiters[profile_id]:
+                del _waiters[profile_id]
@@ -1,3 +1,4 @@
+from core.images import ImageVariantField
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from universities.serializers import MajorSerializer01, UniversitySerializer01
@@ -31,6 +32,7 @@ class ProfileSerializer01(serializers.ModelSerializer):
     """
 
     user = UserSerializer()
+    photo = ImageVariantField("full")
     skills = SkillSerializer01(many=True)
     links = LinkSerializer01(many=True)
     university = UniversitySerializer01()
@@ -57,10 +59,11 @@ class ProfileSerializer01(serializers.ModelSerializer):
 
 class ProfileSerializer02(serializers.ModelSerializer):
     """
-    Lightest Profile serializer - only id, user and image
+    Lightest Profile serializer - only id, user and image (the avatar variant)
     """
 
     user = UserSerializer()
+    photo = ImageVariantField("avatar")
 
     class Meta:
         model = Profile
@@ -73,6 +76,7 @@ class ProfileSerializer03(serializers.ModelSerializer):
     """
 
     user = UserSerializer()
+    photo = ImageVariantField("avatar")
 
     class Meta:
         model = Profile
@@ -84,3 +88,16 @@ class ProfileSerializer03(serializers.ModelSerializer):
             "last_name",
             "bio",
         ]
+
+
+class ProfileSerializer04(serializers.ModelSerializer):
+    """
+    Autocomplete Profile serializer - only id, username and image
+    """
+
+    username = serializers.CharField(source="user.username")
+    photo = ImageVariantField("avatar")
+
+    class Meta:
+        model = Profile
+        fields = ["id", "username", "photo"]
@@ -1,11 +1,69 @@
+from core.caching import SKILLS_LIST, invalidate_reference_lists
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from universities.models import Major, University
 
-from profiles.models import Profile
+from profiles.models import Link, Profile, Skill
 
 
 @receiver(post_save, sender=get_user_model())
 def post_save_create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=Skill)
+def skill_invalidate_list(sender, **kwargs):
+    invalidate_reference_lists(SKILLS_LIST)
+
+
+# the profile pages are only sent again when the updated_at of the profile changes (conditional GET), so the rows
+# shown in the page touch it
+
+
+def touch_profiles(ids):
+    Profile.objects.filter(id__in=ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=get_user_model())
+def user_touch_profile(sender, instance, created, update_fields, **kwargs):
+    if not created and update_fields != frozenset(["last_login"]):
+        touch_profiles(Profile.objects.filter(user=instance).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+def link_touch_profile(sender, instance, **kwargs):
+    if instance.profile_id is not None:
+        touch_profiles([instance.profile_id])
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Major)
+def profile_page_option_touch_profiles(sender, instance, created, **kwargs):
+    if not created:
+        touch_profiles(instance.profiles.values_list("id", flat=True))
+
+
+# the m2m rows are deleted (and the foreign keys set to null) without signals
+@receiver(pre_delete, sender=Skill)
+@receiver(pre_delete, sender=University)
+@receiver(pre_delete, sender=Major)
+def profile_page_option_delete_touch_profiles(sender, instance, **kwargs):
+    touch_profiles(instance.profiles.values_list("id", flat=True))
+
+
+@receiver(m2m_changed, sender=Profile.skills.through)
+def profile_skills_touch_profiles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+
+    if not reverse:
+        touch_profiles([instance.id])
+    elif action == "pre_clear":
+        touch_profiles(instance.profiles.values_list("id", flat=True))
+    else:
+        touch_profiles(pk_set)
@@ -13,6 +13,9 @@ class TestUrls(TestCase):
     def test_edit_my_profile_url(self):
         self.assertEqual(resolve(BASE_URL + "edit-my-profile").func, edit_my_profile)
 
+    def test_upload_my_profile_photo_url(self):
+        self.assertEqual(resolve(BASE_URL + "upload-my-profile-photo").func, upload_my_profile_photo)
+
     def test_get_my_profile_url(self):
         self.assertEqual(resolve(BASE_URL + "get-my-profile").func, get_my_profile)
 
@@ -34,9 +37,15 @@ class TestUrls(TestCase):
     def test_get_notifications_url(self):
         self.assertEqual(resolve(BASE_URL + "get-notifications").func, get_notifications)
 
+    def test_get_notifications_feed_url(self):
+        self.assertEqual(resolve(BASE_URL + "get-notifications-feed").func, get_notifications_feed)
+
     def test_get_notifications_number_url(self):
         self.assertEqual(resolve(BASE_URL + "get-notifications-number").func, get_notifications_number)
 
+    def test_wait_notifications_number_url(self):
+        self.assertEqual(resolve(BASE_URL + "wait-notifications-number").func, wait_notifications_number)
+
     def test_visualize_notifications_url(self):
         self.assertEqual(resolve(BASE_URL + "visualize-notifications").func, visualize_notifications)
 
@@ -1,21 +1,39 @@
+import base64
 import datetime
+import hashlib
+import io
+import shutil
+import tempfile
 
 import mock
 import pytz
+from core.pagination import encode_cursor
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
 from projects.models import (
+    DISCUSSION_REPLY_NOTIFICATION,
+    DISCUSSION_STAR_NOTIFICATION,
+    PROJECT_ENTRY_REQUEST_NOTIFICATION,
+    PROJECT_INVITATION_NOTIFICATION,
     Discussion,
     DiscussionReply,
     DiscussionStar,
+    Notification,
     Project,
     ProjectEntryRequest,
     ProjectInvitation,
     ProjectMember,
+    ProjectStar,
 )
 from projects.serializers import (
     DiscussionReplySerializer02,
     DiscussionStarSerializer02,
+    NotificationSerializer01,
     ProjectEntryRequestSerializer01,
     ProjectInvitationSerializer01,
     ProjectSerializer01,
@@ -23,7 +41,7 @@ from projects.serializers import (
 from rest_framework import status
 
 from ..models import Link, Profile, Skill
-from ..serializers import ProfileSerializer01, ProfileSerializer03, SkillSerializer01
+from ..serializers import ProfileSerializer01, ProfileSerializer02, ProfileSerializer03, SkillSerializer01
 
 User = get_user_model()
 client = Client()
@@ -34,8 +52,150 @@ class TestSignupView(TestCase):
     pass
 
 
+def create_notifications(number, user, discussion, project=None):
+    """
+    Creates *number* profiles starring and replying the discussion of the user - and inviting the user to the
+    project and requesting to enter it, if given
+    """
+
+    for i in range(number):
+        profile = User.objects.create(username=f"user{Profile.objects.count()}").profile
+
+        if project is not None:
+            ProjectInvitation.objects.create(project=project, sender=profile, receiver=user.profile)
+            ProjectEntryRequest.objects.create(project=project, profile=profile)
+
+        DiscussionStar.objects.create(discussion=discussion, profile=profile)
+        DiscussionReply.objects.create(discussion=discussion, profile=profile)
+
+
+def get_image_data_url(size, image_format="PNG"):
+    content = io.BytesIO()
+    Image.new("RGB", size, "red").save(content, image_format)
+
+    return f"data:image/{image_format.lower()};base64,{base64.b64encode(content.getvalue()).decode()}"
+
+
+def use_temporary_storage(test_case):
+    """
+    Stores the media files of the test in a temporary directory and processes the images in the request
+    """
+
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root)
+
+    settings = override_settings(
+        IMAGE_WORKERS=0,
+        DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+        MEDIA_ROOT=media_root,
+    )
+    settings.enable()
+    test_case.addCleanup(settings.disable)
+
+
 class TestEditMyProfileView(TestCase):
-    pass
+    url = BASE_URL + "edit-my-profile"
+
+    def setUp(self):
+        self.user = User.objects.create(username="jeff")
+        Skill.objects.create(name="design")
+        use_temporary_storage(self)
+
+    def test_photo(self):
+        client.force_login(self.user)
+        request_data = {
+            "username": "jeff",
+            "first_name": "Jeff",
+            "last_name": "Bezos",
+            "bio": "Space",
+            "is_attending_university": False,
+            "skills_names": ["design"],
+        }
+
+        # invalid base64, unsupported format and content not matching the format
+        for photo in [
+            "data:image/png;base64,invalid",
+            "data:image/svg;base64,",
+            get_image_data_url((10, 10), "JPEG").replace("jpeg", "png"),
+        ]:
+            response = client.put(self.url, {**request_data, "photo": photo}, content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, "Imagem inválida!")
+
+        photo = get_image_data_url((2000, 1000))
+        photo_content = base64.b64decode(photo.split(",")[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(self.url, {**request_data, "photo": photo}, content_type="application/json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        profile = Profile.objects.get(pk=self.user.profile.pk)
+        self.assertEqual(profile.photo.name, f"profile_photos/{hashlib.sha256(photo_content).hexdigest()}.png")
+        self.assertEqual(
+            set(profile.photo_variants), {"avatar", "avatar_webp", "card", "card_webp", "full", "full_webp"}
+        )
+
+        for variant, size in [("avatar", (96, 48)), ("card_webp", (320, 160)), ("full", (1280, 640))]:
+            with Image.open(profile.photo.storage.open(profile.photo_variants[variant])) as image:
+                self.assertEqual(image.size, size)
+                self.assertEqual(image.format, "WEBP" if variant.endswith("_webp") else "JPEG")
+
+        self.assertTrue(ProfileSerializer02(profile).data["photo"].endswith(profile.photo_variants["avatar"]))
+
+        # the same photo uploaded again (here by another user) reuses the stored blobs
+        client.force_login(User.objects.create(username="bezos"))
+        photos_number = len(profile.photo.storage.listdir("profile_photos")[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.put(
+                self.url, {**request_data, "username": "bezos", "photo": photo}, content_type="application/json"
+            )
+
+        other_profile = Profile.objects.get(user__username="bezos")
+        self.assertEqual(other_profile.photo.name, profile.photo.name)
+        self.assertEqual(other_profile.photo_variants, profile.photo_variants)
+        self.assertEqual(len(profile.photo.storage.listdir("profile_photos")[1]), photos_number)
+
+
+class TestUploadMyProfilePhoto(TestCase):
+    url = BASE_URL + "upload-my-profile-photo"
+
+    def setUp(self):
+        self.user = User.objects.create(username="jeff")
+        use_temporary_storage(self)
+
+    def test_req(self):
+        response = client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        for method in ["get", "delete", "post", "patch"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        client.force_login(self.user)
+
+        for photo in [None, SimpleUploadedFile("jeff.png", b"invalid")]:
+            data = encode_multipart(BOUNDARY, {"photo": photo} if photo else {})
+            response = client.put(self.url, data, content_type=MULTIPART_CONTENT)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, "Imagem inválida!")
+
+        content = io.BytesIO()
+        Image.new("RGB", (100, 200), "red").save(content, "WEBP")
+        data = encode_multipart(BOUNDARY, {"photo": SimpleUploadedFile("photo", content.getvalue())})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(self.url, data, content_type=MULTIPART_CONTENT)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        profile = Profile.objects.get(pk=self.user.profile.pk)
+        self.assertRegex(profile.photo.name, r"^profile_photos/[0-9a-f]{64}\.webp$")
+
+        with Image.open(profile.photo.storage.open(profile.photo_variants["avatar"])) as image:
+            self.assertEqual(image.size, (48, 96))
 
 
 class TestGetMyProfile(TestCase):
@@ -63,6 +223,27 @@ class TestGetMyProfile(TestCase):
         response = client.get(self.url)
         self.assertEqual(response.data, serializer.data)
 
+    def test_conditional_get(self):
+        other_user = User.objects.create(username="elon")
+        Profile.objects.update(updated_at=self.user.profile.updated_at)
+
+        client.force_login(self.user)
+        response = client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Authorization", response["Vary"])
+
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        # the same url and updated_at, but another user
+        client.force_login(other_user)
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], other_user.profile.id)
+        self.assertNotEqual(response["ETag"], etag)
+
 
 class TestGetProfile(TestCase):
     url = BASE_URL + "get-profile/"
@@ -89,6 +270,28 @@ class TestGetProfile(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_conditional_get(self):
+        url = self.url + self.user.username
+        etag = client.get(url)["ETag"]
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        skill = Skill.objects.create(name="design")
+        self.user.profile.skills.add(skill)
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["skills"], [{"id": skill.id, "name": "design"}])
+        etag = response["ETag"]
+
+        skill.name = "physics"
+        skill.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["skills"], [{"id": skill.id, "name": "physics"}])
+
 
 class TestGetProfileProjects(TestCase):
     url = BASE_URL + "get-profile-projects/"
@@ -118,6 +321,27 @@ class TestGetProfileProjects(TestCase):
         response = client.get(self.url + self.user.username)
         self.assertEqual(response.data, serializer.data)
 
+    def test_query_count(self):
+        def create_projects(number):
+            for i in range(number):
+                project = Project.objects.create(name=f"SpaceX{i}", category="startup")
+                ProjectMember.objects.create(profile=self.user.profile, project=project, role="admin")
+                ProjectStar.objects.create(profile=self.user.profile, project=project)
+                Discussion.objects.create(profile=self.user.profile, project=project)
+
+        create_projects(1)
+
+        with CaptureQueriesContext(connection) as context:
+            client.get(self.url + self.user.username)
+        queries_number = len(context)
+
+        create_projects(9)
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(self.url + self.user.username)
+
+        self.assertEqual(len(response.data), 10)
+
 
 class TestGetFilteredProfiles(TestCase):
     url = BASE_URL + "get-filtered-profiles/"
@@ -134,49 +358,40 @@ class TestGetFilteredProfiles(TestCase):
             self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def test_res(self):
-        User.objects.create(username="michael.JJ")
+        profile01 = User.objects.create(username="michael.JJ").profile
         User.objects.create(username="veronica")
-        User.objects.create(username="jordan")
-        User.objects.create(username="joanne")
+        profile03 = User.objects.create(username="jordan").profile
+        profile04 = User.objects.create(username="joanne").profile
+        User.objects.create(username="johnny", is_superuser=True)
 
-        query = "j"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 3)
-        self.assertEqual(
-            response.data, ProfileSerializer03(Profile.objects.filter(user__username__icontains=query), many=True).data
-        )
+        # words are matched as prefixes and superusers are never returned
+        response = client.get(self.url + "j")
+        self.assertEqual(response.data, ProfileSerializer03([profile04, profile03, profile01], many=True).data)
 
-        query = "JO"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(
-            response.data, ProfileSerializer03(Profile.objects.filter(user__username__icontains=query), many=True).data
-        )
+        response = client.get(self.url + "JO")
+        self.assertEqual(response.data, ProfileSerializer03([profile04, profile03], many=True).data)
 
-        query = "joanne"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(
-            response.data, ProfileSerializer03(Profile.objects.filter(user__username__icontains=query), many=True).data
-        )
+        response = client.get(self.url + "joanne")
+        self.assertEqual(response.data, ProfileSerializer03([profile04], many=True).data)
 
-        query = "unexistent-username"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 0)
-        self.assertEqual(
-            response.data, ProfileSerializer03(Profile.objects.filter(user__username__icontains=query), many=True).data
-        )
+        response = client.get(self.url + "unexistent-username")
+        self.assertEqual(response.data, [])
+
+        # names, bios and skills are searched too
+        profile04.first_name = "Joanne"
+        profile04.last_name = "Araújo"
+        profile04.save()
+        profile04.skills.add(Skill.objects.create(name="programação"))
+
+        response = client.get(self.url + "araujo programacao")
+        self.assertEqual(response.data, ProfileSerializer03([profile04], many=True).data)
 
         # asserting view only return 15 profiles
         for i in range(20):
             User.objects.create(username=f"kevin{i}")
 
-        query = "kevin"
-        response = client.get(self.url + query)
+        response = client.get(self.url + "kevin")
         self.assertEqual(len(response.data), 15)
-        self.assertEqual(
-            response.data, ProfileSerializer03(Profile.objects.filter(user__username__icontains=query), many=True).data
-        )
 
 
 class TestGetProfileList(TestCase):
@@ -200,21 +415,79 @@ class TestGetProfileList(TestCase):
         # asserting that the superuser's profile won't be returned by the view
         profiles.insert(0, User.objects.create(username="superuser", is_superuser=True))
 
+        # the photo urls are signed with the current time, so they're left out of the comparisons
+        def without_photos(data):
+            return {**data, "profiles": [{**profile, "photo": None} for profile in data["profiles"]]}
+
         response = client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(
-            response.data, {"isall": False, "profiles": ProfileSerializer03(profiles[1:21], many=True).data}
+            without_photos(response.data),
+            without_photos(
+                {
+                    "isall": False,
+                    "profiles": ProfileSerializer03(profiles[1:21], many=True).data,
+                    "next_cursor": encode_cursor(id=profiles[20].id),
+                    "total_estimate": 30,
+                }
+            ),
         )
 
         response = client.get(f"{self.url}?length=25")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(
-            response.data, {"isall": False, "profiles": ProfileSerializer03(profiles[1:26], many=True).data}
+            without_photos(response.data),
+            without_photos(
+                {
+                    "isall": False,
+                    "profiles": ProfileSerializer03(profiles[1:26], many=True).data,
+                    "next_cursor": encode_cursor(id=profiles[25].id),
+                    "total_estimate": 30,
+                }
+            ),
         )
 
         response = client.get(f"{self.url}?length=50")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, {"isall": True, "profiles": ProfileSerializer03(profiles[1:], many=True).data})
+        self.assertEqual(
+            without_photos(response.data),
+            without_photos(
+                {
+                    "isall": True,
+                    "profiles": ProfileSerializer03(profiles[1:], many=True).data,
+                    "next_cursor": None,
+                    "total_estimate": 30,
+                }
+            ),
+        )
+
+        # cursor mode
+        response = client.get(f"{self.url}?length=20")
+        response = client.get(f"{self.url}?length=20&cursor={response.data['next_cursor']}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            without_photos(response.data),
+            without_photos(
+                {
+                    "isall": True,
+                    "profiles": ProfileSerializer03(profiles[21:], many=True).data,
+                    "next_cursor": None,
+                    "total_estimate": None,
+                }
+            ),
+        )
+
+        for params in ["cursor=foo", "length=0", "length=-1"]:
+            response = client.get(f"{self.url}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, "Dados inválidos!")
+
+        # the matching profiles are counted, never loaded
+        with CaptureQueriesContext(connection) as context:
+            client.get(f"{self.url}?length=5")
+
+        self.assertEqual(len([query for query in context if "LIMIT 6" in query["sql"]]), 1)
+        self.assertEqual(len([query for query in context if "COUNT(" in query["sql"]]), 1)
 
 
 class TestGetSkillsNameList(TestCase):
@@ -239,6 +512,34 @@ class TestGetSkillsNameList(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, SkillSerializer01(skills, many=True).data)
 
+    def test_cache(self):
+        skill = Skill.objects.create(name="design")
+        response = client.get(self.url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = client.get(self.url)
+
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.data, SkillSerializer01([skill], many=True).data)
+
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        # changes invalidate the cached list
+        skill.name = "physics"
+        skill.save()
+
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data, SkillSerializer01([skill], many=True).data)
+
+        skill.delete()
+        response = client.get(self.url)
+        self.assertEqual(response.data, [])
+
 
 class TestGetNotifications(TestCase):
     url = BASE_URL + "get-notifications"
@@ -282,7 +583,7 @@ class TestGetNotifications(TestCase):
 
         project_request01 = ProjectEntryRequest.objects.create(project=project01, profile=profile01)
         # since the logged user is a 'member' in the project02, the project_request02 shouldn't be in their notifications
-        project_request02 = ProjectEntryRequest.objects.create(project=project02, profile=profile01)
+        ProjectEntryRequest.objects.create(project=project02, profile=profile01)
         project_request03 = ProjectInvitation.objects.create(project=project03, receiver=user.profile)
 
         # unvisualized
@@ -334,6 +635,125 @@ class TestGetNotifications(TestCase):
             },
         )
 
+    def test_query_count(self):
+        user = User.objects.create(username="felipe")
+        project = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+        ProjectMember.objects.create(profile=user.profile, project=project, role="admin")
+        discussion = Discussion.objects.create(profile=user.profile, project=project)
+
+        create_notifications(1, user, discussion, project)
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as context:
+            client.get(self.url)
+        queries_number = len(context)
+
+        create_notifications(10, user, discussion, project)
+        client.force_login(user)
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(self.url)
+
+        self.assertEqual(len(response.data["discussions_replies"]), 11)
+
+
+class TestGetNotificationsFeed(TestCase):
+    url = BASE_URL + "get-notifications-feed"
+
+    def test_req(self):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        for method in ["delete", "put", "patch", "post"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        user = User.objects.create(username="felipe")
+        client.force_login(user)
+
+        for params in ["?cursor=foo", "?length=foo", "?length=0", "?length=-1"]:
+            response = client.get(self.url + params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        client.force_login(user)
+
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"notifications": [], "next_cursor": None})
+
+        profile01 = User.objects.create(username="peter").profile
+        profile02 = User.objects.create(username="john").profile
+
+        project01 = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+        ProjectMember.objects.create(profile=user.profile, project=project01, role="admin")
+
+        project02 = Project.objects.create(name="BlueOrigin", category="startup", slogan="Your favorite space company")
+        discussion = Discussion.objects.create(profile=user.profile, project=project02)
+
+        project_request01 = ProjectEntryRequest.objects.create(project=project01, profile=profile01)
+        project_request02 = ProjectInvitation.objects.create(project=project02, receiver=user.profile)
+        discussion_star01 = DiscussionStar.objects.create(discussion=discussion, profile=profile01)
+        discussion_reply01 = DiscussionReply.objects.create(discussion=discussion, profile=profile01)
+        discussion_star02 = DiscussionStar.objects.create(discussion=discussion, profile=profile02)
+        discussion_reply02 = DiscussionReply.objects.create(discussion=discussion, profile=profile02)
+
+        # visualized 3 days ago (shouldn't be returned by the view)
+        with mock.patch("django.utils.timezone.now") as mock_now:
+            mock_now.return_value = pytz.utc.localize(datetime.datetime.now() - datetime.timedelta(days=3))
+            discussion_reply02.visualized = True
+            discussion_reply02.save()
+
+        notifications = [
+            Notification.objects.get(type=type, object_id=instance.id)
+            for type, instance in [
+                (DISCUSSION_STAR_NOTIFICATION, discussion_star02),
+                (DISCUSSION_REPLY_NOTIFICATION, discussion_reply01),
+                (DISCUSSION_STAR_NOTIFICATION, discussion_star01),
+                (PROJECT_INVITATION_NOTIFICATION, project_request02),
+                (PROJECT_ENTRY_REQUEST_NOTIFICATION, project_request01),
+            ]
+        ]
+
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"notifications": NotificationSerializer01(notifications, many=True).data, "next_cursor": None},
+        )
+
+        # paginating
+        response = client.get(self.url + "?length=3")
+        self.assertEqual(response.data["notifications"], NotificationSerializer01(notifications[:3], many=True).data)
+
+        response = client.get(self.url + f"?length=3&cursor={response.data['next_cursor']}")
+        self.assertEqual(
+            response.data,
+            {"notifications": NotificationSerializer01(notifications[3:], many=True).data, "next_cursor": None},
+        )
+
+    def test_query_count(self):
+        user = User.objects.create(username="felipe")
+        project = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+        ProjectMember.objects.create(profile=user.profile, project=project, role="admin")
+        discussion = Discussion.objects.create(profile=user.profile, project=project)
+
+        create_notifications(1, user, discussion, project)
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as context:
+            client.get(self.url)
+        queries_number = len(context)
+
+        create_notifications(10, user, discussion, project)
+        client.force_login(user)
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(self.url + "?length=100")
+
+        self.assertEqual(len(response.data["notifications"]), 44)
+
 
 class TestGetNotificationsNumber(TestCase):
     url = BASE_URL + "get-notifications-number"
@@ -385,6 +805,49 @@ class TestGetNotificationsNumber(TestCase):
         self.assertEqual(response.data, 4)
 
 
+class TestWaitNotificationsNumber(TestCase):
+    url = BASE_URL + "wait-notifications-number"
+
+    def test_req(self):
+        client.logout()
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_login(User.objects.create(username="felipe"))
+
+        for params in ["?version=abc", "?timeout=abc", "?timeout=nan", "?timeout=inf", "?timeout=-1"]:
+            response = client.get(self.url + params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for method in ["delete", "post", "put", "patch"]:
+            response = getattr(client, method)(self.url)
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        user = User.objects.create(username="felipe")
+        client.force_login(user)
+
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        version = response.json()["version"]
+        self.assertEqual(
+            response.json(), {"version": version, "notifications_number": 0, "unvisualized_messages_number": 0}
+        )
+
+        # nothing changed, so the request is only answered when the timeout expires
+        response = client.get(self.url + f"?version={version}&timeout=0.1")
+        self.assertEqual(response.json()["version"], version)
+
+        project = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectInvitation.objects.create(project=project, receiver=user.profile)
+
+        response = client.get(self.url + f"?version={version}&timeout=10")
+        self.assertNotEqual(response.json()["version"], version)
+        self.assertEqual(response.json()["notifications_number"], 1)
+
+
 class TestVisualizeNotifications(TestCase):
     url = BASE_URL + "visualize-notifications"
 
@@ -433,6 +896,27 @@ class TestVisualizeNotifications(TestCase):
         self.assertTrue(discussion_reply01.visualized)
         self.assertTrue(discussion_reply02.visualized)
 
+        self.assertFalse(Notification.objects.filter(recipient=user.profile, visualized=False).exists())
+
+    def test_writes_number(self):
+        user = User.objects.create(username="felipe")
+        discussion = Discussion.objects.create(profile=user.profile)
+        client.force_login(user)
+
+        def count_writes():
+            with CaptureQueriesContext(connection) as context:
+                client.patch(self.url)
+
+            return len([query for query in context if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+
+        create_notifications(1, user, discussion)
+        writes_number = count_writes()
+
+        create_notifications(50, user, discussion)
+        self.assertEqual(count_writes(), writes_number)
+        self.assertFalse(DiscussionStar.objects.filter(visualized=False).exists())
+        self.assertFalse(DiscussionReply.objects.filter(visualized=False).exists())
+
 
 class TestCreateLink(TestCase):
     url = BASE_URL + "create-link"
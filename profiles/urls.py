@@ -6,14 +6,18 @@ from .views import *
 urlpatterns = [
     path("post-signup", signup_view),
     path("edit-my-profile", edit_my_profile),
+    path("upload-my-profile-photo", upload_my_profile_photo),
     path("get-my-profile", get_my_profile),
     path("get-profile/<str:slug>", get_profile),
     path("get-profile-projects/<str:slug>", get_profile_projects),
     path("get-filtered-profiles/<str:query>", get_filtered_profiles),
+    path("autocomplete-profiles/<str:query>", autocomplete_profiles),
     path("get-profile-list", get_profile_list),
     path("get-skills-name-list", get_skills_name_list),
     path("get-notifications", get_notifications),
+    path("get-notifications-feed", get_notifications_feed),
     path("get-notifications-number", get_notifications_number),
+    path("wait-notifications-number", wait_notifications_number),
     path("visualize-notifications", visualize_notifications),
     path("create-link", create_link),
     path("delete-link/<int:link_id>", delete_link),
@@ -1,35 +1,70 @@
-import base64
 import datetime
-
-import pytz
+import math
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from chats.models import ChatSummary
+from core.caching import SKILLS_LIST, cached_reference_list
+from core.conditional import page_condition
+from core.images import decode_image, process_image_in_background, read_image
+from core.pagination import decode_cursor, encode_cursor
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.files.base import ContentFile
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from jwt_auth.decorators import login_required
+from projects.cards import CARD_FORMATS, FULL_CARD, get_project_cards
 from projects.models import (
+    DISCUSSION_REPLY_NOTIFICATION,
+    DISCUSSION_STAR_NOTIFICATION,
+    PROJECT_ENTRY_REQUEST_NOTIFICATION,
+    PROJECT_INVITATION_NOTIFICATION,
     DiscussionReply,
     DiscussionStar,
+    Notification,
+    Project,
     ProjectEntryRequest,
     ProjectInvitation,
+    pending_notification_types,
 )
 from projects.serializers import (
     DiscussionReplySerializer02,
     DiscussionStarSerializer02,
+    NotificationSerializer01,
     ProjectEntryRequestSerializer01,
     ProjectInvitationSerializer01,
-    ProjectSerializer01,
 )
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from search.documents import (
+    AUTOCOMPLETE_CACHE_TIMEOUT,
+    AUTOCOMPLETE_MAX_PREFIX_LENGTH,
+    PROFILE,
+    autocomplete,
+    get_autocomplete_cache_key,
+    search,
+)
 from universities.models import Major, University
 
+from .long_polling import bump_notifications_version, get_notifications_version, wait_notifications_version_change
 from .models import Link, Profile, Skill
-from .serializers import ProfileSerializer01, ProfileSerializer03, SkillSerializer01
+from .serializers import ProfileSerializer01, ProfileSerializer03, ProfileSerializer04, SkillSerializer01
 
 User = get_user_model()
 
+# maximum time (seconds) a long-poll request is held
+LONG_POLL_TIMEOUT = 25
+
 
 @api_view(["POST"])
 def signup_view(request):
@@ -159,10 +194,10 @@ def edit_my_profile(request):
         return Response("Respeite os limites de caracteres de cada campo!", status=status.HTTP_400_BAD_REQUEST)
 
     if photo is not None:
-        format, photostr = photo.split(";base64,")
-        photo_format = format.split("/")[-1]
-        profile_photo = ContentFile(base64.b64decode(photostr), name=f"{profile.user.username}.{photo_format}")
-        profile.photo = profile_photo
+        try:
+            photo_file, photo_extension = decode_image(photo)
+        except ValueError:
+            return Response("Imagem inválida!", status=status.HTTP_400_BAD_REQUEST)
 
     if is_attending_university:
         try:
@@ -187,11 +222,34 @@ def edit_my_profile(request):
     profile.user.save()
     profile.save()
 
+    if photo is not None:
+        process_image_in_background(Profile, profile.id, "photo", photo_file, photo_extension)
+
+    return Response("success")
+
+
+@api_view(["PUT"])
+@parser_classes([MultiPartParser])
+@login_required
+def upload_my_profile_photo(request):
+    """
+    Multipart alternative to the base64 photo of edit_my_profile - the file is streamed by the upload handlers
+    instead of being parsed as JSON
+    """
+
+    try:
+        photo_file, photo_extension = read_image(request.FILES["photo"])
+    except (KeyError, ValueError):
+        return Response("Imagem inválida!", status=status.HTTP_400_BAD_REQUEST)
+
+    process_image_in_background(Profile, request.user.profile.id, "photo", photo_file, photo_extension)
+
     return Response("success")
 
 
 @api_view(["GET"])
 @login_required
+@page_condition(lambda request: request.user.profile.updated_at, per_user=True)
 def get_my_profile(request):
     profile = request.user.profile
     serializer = ProfileSerializer01(profile)
@@ -200,6 +258,9 @@ def get_my_profile(request):
 
 
 @api_view(["GET"])
+@page_condition(
+    lambda request, slug: Profile.objects.filter(user__username=slug).values_list("updated_at", flat=True).first()
+)
 def get_profile(request, slug):
     try:
         profile = Profile.objects.get(user__username=slug)
@@ -212,26 +273,58 @@ def get_profile(request, slug):
 
 @api_view(["GET"])
 def get_profile_projects(request, slug):
+    card_format = request.query_params.get("card", FULL_CARD)
+
+    if card_format not in CARD_FORMATS:
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
     try:
         profile = Profile.objects.get(user__username=slug)
-        serializer = ProjectSerializer01(profile.projects, many=True)
+        projects_ids = (
+            Project.objects.filter(members__profile=profile).order_by("members__id").values_list("id", flat=True)
+        )
 
-        return Response(serializer.data)
+        return Response(get_project_cards(projects_ids, card_format, request.user))
     except ObjectDoesNotExist:
         return Response("Usuário não encontrado", status=status.HTTP_404_NOT_FOUND)
 
 
 @api_view(["GET"])
 def get_filtered_profiles(request, query):
-    profiles = Profile.objects.filter(user__username__icontains=query, user__is_superuser=False)[:15]
+    profiles = search(Profile.objects.filter(user__is_superuser=False).select_related("user"), PROFILE, query, 15)
     serializer = ProfileSerializer03(profiles, many=True)
 
     return Response(serializer.data)
 
 
+@api_view(["GET"])
+def autocomplete_profiles(request, query):
+    query = query[:AUTOCOMPLETE_MAX_PREFIX_LENGTH]
+    cache_key = get_autocomplete_cache_key(PROFILE, query)
+    data = cache.get(cache_key)
+
+    if data is None:
+        profiles = autocomplete(
+            Profile.objects.filter(user__is_superuser=False).select_related("user"), PROFILE, query, 10
+        )
+        data = ProfileSerializer04(profiles, many=True).data
+        cache.set(cache_key, data, AUTOCOMPLETE_CACHE_TIMEOUT)
+
+    return Response(data)
+
+
 @api_view(["GET"])
 def get_profile_list(request):
-    length = request.query_params.get("length", 20)
+    try:
+        length = int(request.query_params.get("length", 20))
+        cursor = decode_cursor(request.query_params.get("cursor"))
+        cursor_id = int(cursor["id"]) if cursor else None
+
+        if length < 1:
+            raise ValueError("Invalid length")
+    except (ValueError, TypeError, KeyError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
     is_attending_university = request.query_params.get("is_attending_university", None)
     universities = request.query_params.get("universities", None)
     majors = request.query_params.get("majors", None)
@@ -251,18 +344,37 @@ def get_profile_list(request):
     if skills is not None:
         filter.append(Q(skills__name__in=skills.split(";")))
 
-    profiles = Profile.objects.filter(*filter).distinct()[: int(length)]
-    serializer = ProfileSerializer03(profiles, many=True)
+    profiles = Profile.objects.filter(*filter).distinct()
+
+    # cursor mode - only the slice after the last loaded item (items are ordered by -id) is fetched
+    if cursor_id is not None:
+        profiles = profiles.filter(id__lt=cursor_id)
+
+    # fetching one extra profile tells if there are more, without loading all of them
+    page = list(profiles.select_related("user")[: length + 1])
+    isall = len(page) <= length
+    page = page[:length]
+
+    serializer = ProfileSerializer03(page, many=True)
+
+    # the total is only estimated for the first page
+    total_estimate = None
+
+    if cursor_id is None:
+        total_estimate = len(page) if isall else profiles.count()
 
     return Response(
         {
-            "isall": len(serializer.data) == len(Profile.objects.filter(*filter).distinct()),
+            "isall": isall,
             "profiles": serializer.data,
+            "next_cursor": encode_cursor(id=page[-1].id) if not isall else None,
+            "total_estimate": total_estimate,
         }
     )
 
 
 @api_view(["GET"])
+@cached_reference_list(SKILLS_LIST)
 def get_skills_name_list(request):
     skills = Skill.objects.all()
     serializer = SkillSerializer01(skills, many=True)
@@ -270,88 +382,200 @@ def get_skills_name_list(request):
     return Response(serializer.data)
 
 
+# groups of the notifications in the get_notifications response:
+# {notification type: (key, event model, event serializer, related objects of the event)}
+NOTIFICATIONS_GROUPS = {
+    PROJECT_INVITATION_NOTIFICATION: (
+        "projects_invitations",
+        ProjectInvitation,
+        ProjectInvitationSerializer01,
+        ["project", "sender__user"],
+    ),
+    PROJECT_ENTRY_REQUEST_NOTIFICATION: (
+        "projects_entry_requests",
+        ProjectEntryRequest,
+        ProjectEntryRequestSerializer01,
+        ["project", "profile__user"],
+    ),
+    DISCUSSION_STAR_NOTIFICATION: (
+        "discussions_stars",
+        DiscussionStar,
+        DiscussionStarSerializer02,
+        ["profile__user", "discussion"],
+    ),
+    DISCUSSION_REPLY_NOTIFICATION: (
+        "discussions_replies",
+        DiscussionReply,
+        DiscussionReplySerializer02,
+        ["profile__user", "discussion"],
+    ),
+}
+
+
+def get_recent_notifications(profile):
+    # answered notifications (stars and replies) stay in the feed for 2 days after being visualized
+    recent = Q(type__in=pending_notification_types) | Q(visualized=False)
+    recent |= Q(updated_at__gt=timezone.now() - datetime.timedelta(days=2))
+
+    return Notification.objects.filter(recent, recipient=profile)
+
+
 @api_view(["GET"])
 @login_required
 def get_notifications(request):
     profile = request.user.profile
-    now = datetime.datetime.now()
-    now = pytz.utc.localize(now)
+    objects_ids = defaultdict(list)
 
-    projects_invitations = ProjectInvitation.objects.filter(receiver=profile)
-    projects_entry_requests = [
-        request
-        for request in ProjectEntryRequest.objects.filter(project__members__profile=profile)
-        if request.project.members.get(profile=profile).role == "admin"
-    ]
+    for notification_type, object_id in get_recent_notifications(profile).values_list("type", "object_id"):
+        objects_ids[notification_type].append(object_id)
 
-    discussions_stars = []
+    response = {}
 
-    for star in DiscussionStar.objects.filter(discussion__profile=profile).exclude(profile=profile):
-        if not star.visualized:
-            discussions_stars.append(star)
-            continue
+    # one query for the notifications and one for the events of each type
+    for notification_type, (key, model, serializer_class, related_objects) in NOTIFICATIONS_GROUPS.items():
+        objects = model.objects.filter(id__in=objects_ids[notification_type]).select_related(*related_objects)
+        response[key] = serializer_class(objects, many=True).data
 
-        if now - star.updated_at < datetime.timedelta(days=2):
-            discussions_stars.append(star)
+    return Response(response)
 
-    discussions_replies = []
 
-    for reply in DiscussionReply.objects.filter(discussion__profile=profile).exclude(profile=profile):
-        if not reply.visualized:
-            discussions_replies.append(reply)
-            continue
+@api_view(["GET"])
+@login_required
+def get_notifications_feed(request):
+    profile = request.user.profile
 
-        if now - reply.updated_at < datetime.timedelta(days=2):
-            discussions_replies.append(reply)
+    try:
+        length = int(request.query_params.get("length", 20))
+        cursor = decode_cursor(request.query_params.get("cursor"))
 
-    projects_invitations_serializer = ProjectInvitationSerializer01(projects_invitations, many=True)
-    projects_entry_requests_serializer = ProjectEntryRequestSerializer01(projects_entry_requests, many=True)
-    discussions_stars_serializer = DiscussionStarSerializer02(discussions_stars, many=True)
-    discussions_replies_serializer = DiscussionReplySerializer02(discussions_replies, many=True)
+        if length < 1:
+            raise ValueError("Invalid length")
 
-    return Response(
-        {
-            "projects_invitations": projects_invitations_serializer.data,
-            "projects_entry_requests": projects_entry_requests_serializer.data,
-            "discussions_stars": discussions_stars_serializer.data,
-            "discussions_replies": discussions_replies_serializer.data,
-        }
+        if cursor:
+            cursor_created_at = parse_datetime(cursor["created_at"])
+            cursor_id = int(cursor["id"])
+
+            if cursor_created_at is None:
+                raise ValueError("Invalid cursor")
+    except (ValueError, TypeError, KeyError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    notifications = get_recent_notifications(profile).select_related("actor__user", "project", "discussion")
+
+    # keyset pagination over the (recipient, created_at) index
+    if cursor:
+        notifications = notifications.filter(
+            Q(created_at__lt=cursor_created_at) | Q(created_at=cursor_created_at, id__lt=cursor_id)
+        )
+
+    notifications = list(notifications[: length + 1])
+    next_cursor = None
+
+    if len(notifications) > length:
+        notifications = notifications[:length]
+        next_cursor = encode_cursor(created_at=notifications[-1].created_at.isoformat(), id=notifications[-1].id)
+
+    serializer = NotificationSerializer01(notifications, many=True)
+
+    return Response({"notifications": serializer.data, "next_cursor": next_cursor})
+
+
+def count_notifications(profile):
+    return (
+        Notification.objects.filter(recipient=profile)
+        .filter(Q(type__in=pending_notification_types) | Q(visualized=False))
+        .count()
     )
 
 
 @api_view(["GET"])
 @login_required
 def get_notifications_number(request):
-    profile = request.user.profile
-
-    projects_invitations = ProjectInvitation.objects.filter(receiver=profile)
-    projects_entry_requests = [
-        request
-        for request in ProjectEntryRequest.objects.filter(project__members__profile=profile)
-        if request.project.members.get(profile=profile).role == "admin"
-    ]
+    return Response(count_notifications(request.user.profile))
 
-    unvisualized_discussions_stars = DiscussionStar.objects.filter(discussion__profile=profile, visualized=False)
-    unvisualized_replies = DiscussionReply.objects.filter(discussion__profile=profile, visualized=False)
 
-    return Response(
-        len(projects_invitations)
-        + len(projects_entry_requests)
-        + len(unvisualized_discussions_stars)
-        + len(unvisualized_replies)
+def get_request_user(request):
+    drf_request = Request(
+        request, authenticators=[authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
     )
 
+    try:
+        return drf_request.user
+    except APIException:
+        return AnonymousUser()
+
+
+def get_notifications_numbers(profile):
+    unvisualized_messages_number = ChatSummary.objects.filter(profile=profile).aggregate(
+        number=Sum("unvisualized_messages_number")
+    )["number"]
+
+    return {
+        "notifications_number": count_notifications(profile),
+        "unvisualized_messages_number": unvisualized_messages_number or 0,
+    }
+
+
+async def wait_notifications_number(request):
+    """
+    Long-poll alternative to polling *get_notifications_number* - the request is held until the notifications (or the
+    unvisualized messages) of the profile change or the timeout expires. The returned *version* must be sent back in
+    the next request. It's an async view so the waiting requests don't hold worker threads
+    """
+
+    if request.method != "GET":
+        return JsonResponse(
+            f'Method "{request.method}" not allowed.', status=status.HTTP_405_METHOD_NOT_ALLOWED, safe=False
+        )
+
+    user = await sync_to_async(get_request_user)(request)
+
+    if not user.is_authenticated:
+        return JsonResponse(
+            "Você precisa logar para acessar essa rota", status=status.HTTP_401_UNAUTHORIZED, safe=False
+        )
+
+    try:
+        version = request.GET.get("version", None)
+        version = int(version) if version is not None else None
+        timeout = float(request.GET.get("timeout", LONG_POLL_TIMEOUT))
+
+        if not math.isfinite(timeout) or timeout < 0:
+            raise ValueError("Invalid timeout")
+
+        timeout = min(timeout, LONG_POLL_TIMEOUT)
+    except ValueError:
+        return JsonResponse("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST, safe=False)
+
+    profile = await sync_to_async(lambda: user.profile)()
+
+    if version is not None:
+        version = await wait_notifications_version_change(profile.id, version, timeout)
+    else:
+        version = await sync_to_async(get_notifications_version)(profile.id)
+
+    notifications_numbers = await sync_to_async(get_notifications_numbers)(profile)
+
+    return JsonResponse({"version": version, **notifications_numbers})
+
 
 @api_view(["PATCH"])
 @login_required
 def visualize_notifications(request):
-    for star in DiscussionStar.objects.filter(discussion__profile=request.user.profile, visualized=False):
-        star.visualized = True
-        star.save()
+    profile = request.user.profile
+    now = timezone.now()
+
+    # set-based updates, so the number of writes doesn't depend on how many notifications are pending
+    with transaction.atomic():
+        Notification.objects.filter(recipient=profile, visualized=False).update(visualized=True, updated_at=now)
+        DiscussionStar.objects.filter(discussion__profile=profile, visualized=False).update(
+            visualized=True, updated_at=now
+        )
+        DiscussionReply.objects.filter(discussion__profile=profile, visualized=False).update(
+            visualized=True, updated_at=now
+        )
 
-    for reply in DiscussionReply.objects.filter(discussion__profile=request.user.profile, visualized=False):
-        reply.visualized = True
-        reply.save()
+        bump_notifications_version([profile.id])
 
     return Response("success")
 
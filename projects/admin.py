@@ -6,6 +6,7 @@ from .models import (
     DiscussionStar,
     Field,
     Link,
+    Notification,
     Project,
     ProjectEntryRequest,
     ProjectInvitation,
@@ -27,3 +28,4 @@ admin.site.register(ProjectInvitation)
 admin.site.register(Discussion)
 admin.site.register(DiscussionStar)
 admin.site.register(DiscussionReply)
+admin.site.register(Notification)
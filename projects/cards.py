@@ -0,0 +1,90 @@
+from core.caching import is_cache_shared
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Project, ProjectStar
+from .serializers import ProjectSerializer01, ProjectSerializer04
+
+# card formats, selected by the "card" query parameter of the project lists
+FULL_CARD = "full"
+COMPACT_CARD = "compact"
+
+# format: (serializer, ProjectQuerySet method fetching its data)
+CARD_FORMATS = {
+    FULL_CARD: (ProjectSerializer01, "prefetch_list_data"),
+    COMPACT_CARD: (ProjectSerializer04, "prefetch_card_data"),
+}
+
+# the version is bumped whenever the card serializers change, so cards of the old format aren't served
+PROJECT_CARD_VERSION = 3
+PROJECT_CARD_CACHE_KEY = "project-card:{version}:{card_format}:{project_id}"
+
+# cards are invalidated by signals. With a shared cache the timeout keeps the signed media urls of the cached cards
+# valid, otherwise the signals only invalidate the cache of their own process, so it's short to bound how stale the
+# cards cached by the other processes get
+PROJECT_CARD_CACHE_TIMEOUT = getattr(settings, "AWS_QUERYSTRING_EXPIRE", 3600) // 2 if is_cache_shared() else 60
+
+
+def get_project_card_cache_key(project_id, card_format=FULL_CARD):
+    return PROJECT_CARD_CACHE_KEY.format(version=PROJECT_CARD_VERSION, card_format=card_format, project_id=project_id)
+
+
+def get_project_cards(projects_ids, card_format=FULL_CARD, user=None):
+    """
+    Returns the cards of the projects, in the order of the ids - the cached cards are fetched in a single cache
+    round-trip and only the missing ones are loaded from the database. Unexistent projects are skipped.
+    Compact cards also tell if the *user* starred the project
+    """
+
+    serializer_class, prefetch = CARD_FORMATS[card_format]
+    projects_ids = list(projects_ids)
+    keys = {project_id: get_project_card_cache_key(project_id, card_format) for project_id in projects_ids}
+    cards = cache.get_many(keys.values())
+
+    missing_ids = [project_id for project_id in projects_ids if keys[project_id] not in cards]
+
+    if missing_ids:
+        projects = getattr(Project.objects.filter(id__in=missing_ids), prefetch)()
+        missing_cards = {keys[card["id"]]: card for card in serializer_class(projects, many=True).data}
+
+        cache.set_many(missing_cards, PROJECT_CARD_CACHE_TIMEOUT)
+        cards.update(missing_cards)
+
+    cards = [cards[keys[project_id]] for project_id in projects_ids if keys[project_id] in cards]
+
+    if card_format == COMPACT_CARD:
+        starred_ids = set()
+
+        if user is not None and user.is_authenticated and cards:
+            starred_ids = set(
+                ProjectStar.objects.filter(
+                    profile__user=user, project_id__in=[card["id"] for card in cards]
+                ).values_list("project_id", flat=True)
+            )
+
+        cards = [{**card, "starred_by_me": card["id"] in starred_ids} for card in cards]
+
+    return cards
+
+
+def invalidate_project_cards(projects_ids):
+    """
+    Deletes the cached cards of the projects - again once the current transaction is committed, since the old rows
+    may be cached by other requests until then
+    """
+
+    keys = [
+        get_project_card_cache_key(project_id, card_format)
+        for project_id in projects_ids
+        for card_format in CARD_FORMATS
+    ]
+
+    if not keys:
+        return
+
+    def invalidate():
+        cache.delete_many(keys)
+
+    invalidate()
+    transaction.on_commit(invalidate)
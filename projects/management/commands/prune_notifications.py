@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from projects.models import Notification, pending_notification_types
+
+
+class Command(BaseCommand):
+    help = "Deletes the visualized notifications older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Retention period in days (default: 30)")
+
+    def handle(self, *args, **options):
+        # pending notifications (invitations and entry requests) are deleted with the request itself
+        deleted, _ = (
+            Notification.objects.filter(
+                visualized=True, created_at__lt=timezone.now() - datetime.timedelta(days=options["days"])
+            )
+            .exclude(type__in=pending_notification_types)
+            .delete()
+        )
+
+        self.stdout.write(f"{deleted} notifications deleted")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from projects.models import recompute_counter_caches
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stars, members, discussions and replies counters of projects and discussions"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recompute_counter_caches()
+
+        self.stdout.write("Counters recomputed")
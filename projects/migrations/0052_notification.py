@@ -0,0 +1,152 @@
+# Generated by Django 3.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_notifications(apps, schema_editor):
+    Notification = apps.get_model("projects", "Notification")
+    ProjectInvitation = apps.get_model("projects", "ProjectInvitation")
+    ProjectEntryRequest = apps.get_model("projects", "ProjectEntryRequest")
+    ProjectMember = apps.get_model("projects", "ProjectMember")
+    DiscussionStar = apps.get_model("projects", "DiscussionStar")
+    DiscussionReply = apps.get_model("projects", "DiscussionReply")
+
+    notifications = []
+
+    for invitation in ProjectInvitation.objects.filter(receiver__isnull=False):
+        notifications.append(
+            Notification(
+                type=1,
+                recipient_id=invitation.receiver_id,
+                actor_id=invitation.sender_id,
+                project_id=invitation.project_id,
+                object_id=invitation.id,
+                content=invitation.message,
+            )
+        )
+
+    for entry_request in ProjectEntryRequest.objects.all():
+        for profile_id in ProjectMember.objects.filter(project_id=entry_request.project_id, role="admin").values_list(
+            "profile_id", flat=True
+        ):
+            notifications.append(
+                Notification(
+                    type=2,
+                    recipient_id=profile_id,
+                    actor_id=entry_request.profile_id,
+                    project_id=entry_request.project_id,
+                    object_id=entry_request.id,
+                    content=entry_request.message,
+                )
+            )
+
+    for type, model in [(3, DiscussionStar), (4, DiscussionReply)]:
+        for activity in model.objects.filter(discussion__profile__isnull=False).select_related("discussion"):
+            if activity.discussion.profile_id == activity.profile_id:
+                continue
+
+            notifications.append(
+                Notification(
+                    type=type,
+                    recipient_id=activity.discussion.profile_id,
+                    actor_id=activity.profile_id,
+                    project_id=activity.discussion.project_id,
+                    discussion_id=activity.discussion_id,
+                    object_id=activity.id,
+                    content=getattr(activity, "content", None) or "",
+                    visualized=activity.visualized,
+                )
+            )
+
+    Notification.objects.bulk_create(notifications, batch_size=500)
+
+    # keep the original dates, so the feed order and the retention pruning stay meaningful
+    for type, model in [(3, DiscussionStar), (4, DiscussionReply)]:
+        for activity in model.objects.all():
+            Notification.objects.filter(type=type, object_id=activity.id).update(
+                created_at=activity.created_at, updated_at=activity.updated_at
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0028_alter_profile_options"),
+        ("projects", "0051_auto_20210802_1014"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "type",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (1, "convite para projeto"),
+                            (2, "pedido de entrada em projeto"),
+                            (3, "curtida em discussão"),
+                            (4, "comentário em discussão"),
+                        ]
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("content", models.CharField(blank=True, max_length=500)),
+                ("visualized", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="profiles.profile",
+                    ),
+                ),
+                (
+                    "discussion",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="projects.discussion",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="projects.project",
+                    ),
+                ),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to="profiles.profile",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["recipient", "-created_at"], name="projects_no_recipie_ecf137_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["type", "object_id"], name="projects_no_type_8f9183_idx"),
+        ),
+        migrations.RunPython(create_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2 on 2026-10-18 12:11
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# counted model: (counter model, foreign key to it, counter field)
+COUNTER_CACHES = {
+    "ProjectStar": ("Project", "project", "stars_count"),
+    "ProjectMember": ("Project", "project", "members_count"),
+    "Discussion": ("Project", "project", "discussions_count"),
+    "DiscussionStar": ("Discussion", "discussion", "stars_count"),
+    "DiscussionReply": ("Discussion", "discussion", "replies_count"),
+}
+
+
+def compute_counter_caches(apps, schema_editor):
+    for counted_model_name, (model_name, foreign_key, field) in COUNTER_CACHES.items():
+        counted_model = apps.get_model("projects", counted_model_name)
+        model = apps.get_model("projects", model_name)
+
+        counts = (
+            counted_model.objects.filter(**{foreign_key: models.OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        model.objects.update(**{field: Coalesce(models.Subquery(counts), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0052_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='stars_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='discussions_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='members_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='stars_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_counter_caches, migrations.RunPython.noop),
+    ]
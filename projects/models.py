@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest
 from profiles.models import Profile
 
 
@@ -23,7 +24,72 @@ project_categories_choices = [
 ]
 
 
-class Project(models.Model):
+class CounterCacheModel(models.Model):
+    """
+    Model with counter cache columns (*counter_fields*) - they're only changed by F() updates (see COUNTER_CACHES),
+    so saving a loaded instance never writes them back, since its values may be outdated
+    """
+
+    counter_fields = []
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and not kwargs.get("force_insert") and not kwargs.get("update_fields"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class ProjectQuerySet(models.QuerySet):
+    def annotate_discussions_number(self):
+        return self.annotate(discussions_number=models.F("discussions_count"))
+
+    def prefetch_list_data(self):
+        """
+        Fetches everything *ProjectSerializer01* renders (members, fields, stars and the discussions number) in a
+        fixed number of queries, regardless of the number of projects
+        """
+
+        return self.annotate_discussions_number().prefetch_related(
+            models.Prefetch("members", queryset=ProjectMember.objects.select_related("profile__user")),
+            models.Prefetch("stars", queryset=ProjectStar.objects.select_related("profile__user")),
+            "fields",
+        )
+
+    def prefetch_card_data(self):
+        """
+        Fetches everything *ProjectSerializer04* renders (members and fields) in a fixed number of queries - the stars
+        aren't loaded, only counted
+        """
+
+        return self.annotate_discussions_number().prefetch_related(
+            models.Prefetch("members", queryset=ProjectMember.objects.select_related("profile__user")),
+            "fields",
+        )
+
+    def prefetch_page_data(self):
+        """
+        Fetches the whole graph *ProjectSerializer02* renders in a fixed number of queries, regardless of the number
+        of members, invitations, tools or stars
+        """
+
+        return self.annotate_discussions_number().prefetch_related(
+            models.Prefetch("members", queryset=ProjectMember.objects.select_related("profile__user")),
+            models.Prefetch("invitations", queryset=ProjectInvitation.objects.select_related("receiver__user")),
+            models.Prefetch("stars", queryset=ProjectStar.objects.select_related("profile__user")),
+            "fields",
+            "links",
+            "tools_categories__tools",
+        )
+
+
+class Project(CounterCacheModel):
     """
     Project table
     """
@@ -38,10 +104,21 @@ class Project(models.Model):
         max_length=20000,
     )
     image = models.ImageField(default="default_project.jpg", upload_to="project_images")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     fields = models.ManyToManyField(Field, related_name="projects", blank=True)
+    stars_count = models.PositiveIntegerField(default=0, editable=False)
+    members_count = models.PositiveIntegerField(default=0, editable=False)
+    discussions_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
+    counter_fields = ["stars_count", "members_count", "discussions_count"]
+
+    # number of members shown in the compact cards
+    card_members_number = 5
+
     class Meta:
         ordering = ["-id"]
 
@@ -59,6 +136,10 @@ class Project(models.Model):
     def members_profiles(self):
         return [member.profile for member in self.members.all()]
 
+    @property
+    def card_members_profiles(self):
+        return self.members_profiles[: self.card_members_number]
+
     @property
     def pending_invited_profiles(self):
         return [invitation.receiver for invitation in self.invitations.all()]
@@ -69,6 +150,10 @@ class Project(models.Model):
 
     @property
     def discussions_length(self):
+        # annotated by ProjectQuerySet.prefetch_list_data
+        if hasattr(self, "discussions_number"):
+            return self.discussions_number
+
         return len(self.discussions.all())
 
 
@@ -201,7 +286,40 @@ discussion_categories_choices = [
 ]
 
 
-class Discussion(models.Model):
+class DiscussionQuerySet(models.QuerySet):
+    def prefetch_thread_data(self):
+        """
+        Fetches everything *DiscussionSerializer01* renders (the author, stars and replies with their profiles) in a
+        fixed number of queries, regardless of the number of discussions
+        """
+
+        return self.select_related("profile__user").prefetch_related(
+            models.Prefetch("stars", queryset=DiscussionStar.objects.select_related("profile__user")),
+            models.Prefetch("replies", queryset=DiscussionReply.objects.select_related("profile__user")),
+        )
+
+    def prefetch_summary_data(self):
+        """
+        Fetches everything *DiscussionSerializer03* renders (the author and the latest reply) in a fixed number of
+        queries - only the latest reply of each discussion is loaded
+        """
+
+        latest_reply_id = (
+            DiscussionReply.objects.filter(discussion=models.OuterRef("discussion")).order_by("-id").values("id")[:1]
+        )
+
+        return self.select_related("profile__user").prefetch_related(
+            models.Prefetch(
+                "replies",
+                queryset=DiscussionReply.objects.filter(id=models.Subquery(latest_reply_id)).select_related(
+                    "profile__user"
+                ),
+                to_attr="latest_replies",
+            )
+        )
+
+
+class Discussion(CounterCacheModel):
     """
     Discussion table
     """
@@ -211,9 +329,15 @@ class Discussion(models.Model):
     category = models.CharField(max_length=15, choices=discussion_categories_choices, blank=True, null=True)
     profile = models.ForeignKey(Profile, related_name="discussions", on_delete=models.CASCADE, blank=True, null=True)
     project = models.ForeignKey(Project, related_name="discussions", on_delete=models.CASCADE, blank=True, null=True)
+    stars_count = models.PositiveIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DiscussionQuerySet.as_manager()
+
+    counter_fields = ["stars_count", "replies_count"]
+
     class Meta:
         ordering = ["-id"]
 
@@ -231,6 +355,14 @@ class Discussion(models.Model):
     def category_value_and_readable(self):
         return {"value": self.category, "readable": self.get_category_display()}
 
+    @property
+    def latest_reply(self):
+        # prefetched by DiscussionQuerySet.prefetch_summary_data
+        if hasattr(self, "latest_replies"):
+            return self.latest_replies[0] if self.latest_replies else None
+
+        return self.replies.first()
+
 
 class DiscussionStar(models.Model):
     """
@@ -271,3 +403,96 @@ class DiscussionReply(models.Model):
 
     def __str__(self):
         return f"{self.profile.user.username} replied {self.content[:50]} to {self.discussion.title[:50]}"
+
+
+# counted model: (foreign key to the counter model, counter field) - the counters are updated by signals
+COUNTER_CACHES = {
+    ProjectStar: ("project", "stars_count"),
+    ProjectMember: ("project", "members_count"),
+    Discussion: ("project", "discussions_count"),
+    DiscussionStar: ("discussion", "stars_count"),
+    DiscussionReply: ("discussion", "replies_count"),
+}
+
+
+def update_counter_cache(instance, delta):
+    foreign_key, field = COUNTER_CACHES[type(instance)]
+    relation = instance._meta.get_field(foreign_key)
+    pk = getattr(instance, relation.attname)
+
+    if pk is None:
+        return
+
+    # clamped at 0, so a counter that drifted (e.g. rows deleted without signals) never goes negative
+    relation.related_model.objects.filter(pk=pk).update(**{field: Greatest(models.F(field) + delta, 0)})
+
+    # the loaded counter object (e.g. the one given to create()) is kept up to date too
+    if relation.is_cached(instance) and getattr(instance, foreign_key) is not None:
+        related = getattr(instance, foreign_key)
+        setattr(related, field, max(getattr(related, field) + delta, 0))
+
+
+def recompute_counter_caches():
+    """
+    Sets every counter to the number of counted rows - for rows changed without signals (e.g. fixtures or bulk
+    operations)
+    """
+
+    for counted_model, (foreign_key, field) in COUNTER_CACHES.items():
+        model = counted_model._meta.get_field(foreign_key).related_model
+        counts = (
+            counted_model.objects.filter(**{foreign_key: models.OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(count=models.Count("pk"))
+            .values("count")
+        )
+        model.objects.update(**{field: Coalesce(models.Subquery(counts), 0)})
+
+
+PROJECT_INVITATION_NOTIFICATION = 1
+PROJECT_ENTRY_REQUEST_NOTIFICATION = 2
+DISCUSSION_STAR_NOTIFICATION = 3
+DISCUSSION_REPLY_NOTIFICATION = 4
+
+notification_types_choices = [
+    (PROJECT_INVITATION_NOTIFICATION, "convite para projeto"),
+    (PROJECT_ENTRY_REQUEST_NOTIFICATION, "pedido de entrada em projeto"),
+    (DISCUSSION_STAR_NOTIFICATION, "curtida em discussão"),
+    (DISCUSSION_REPLY_NOTIFICATION, "comentário em discussão"),
+]
+
+# notifications that stay in the feed until they are answered, regardless of being visualized
+pending_notification_types = [PROJECT_INVITATION_NOTIFICATION, PROJECT_ENTRY_REQUEST_NOTIFICATION]
+
+
+class Notification(models.Model):
+    """
+    Notification table - rows are written by signals when the event happens (invitation, entry request, discussion
+    star or reply), so each profile's feed is a single indexed query. *object_id* is the id of the event row
+    """
+
+    type = models.PositiveSmallIntegerField(choices=notification_types_choices)
+    recipient = models.ForeignKey(Profile, related_name="notifications", on_delete=models.CASCADE)
+    actor = models.ForeignKey(Profile, related_name="+", on_delete=models.CASCADE, blank=True, null=True)
+    project = models.ForeignKey(Project, related_name="+", on_delete=models.CASCADE, blank=True, null=True)
+    discussion = models.ForeignKey(Discussion, related_name="+", on_delete=models.CASCADE, blank=True, null=True)
+    object_id = models.BigIntegerField()
+    content = models.CharField(max_length=500, blank=True)
+    visualized = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["recipient", "-created_at"]),
+            models.Index(fields=["type", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} [{self.object_id}] to {self.recipient}"
+
+    @property
+    def type_value_and_readable(self):
+        return {"value": self.type, "readable": self.get_type_display()}
@@ -1,3 +1,4 @@
+from core.images import ImageVariantField
 from profiles.serializers import ProfileSerializer02, ProfileSerializer03
 from rest_framework import serializers
 
@@ -7,6 +8,7 @@ from .models import (
     DiscussionStar,
     Field,
     Link,
+    Notification,
     Project,
     ProjectEntryRequest,
     ProjectInvitation,
@@ -69,6 +71,7 @@ class ProjectSerializer01(serializers.ModelSerializer):
     """
 
     category = serializers.DictField(source="category_value_and_readable")
+    image = ImageVariantField("card")
     members_profiles = ProfileSerializer02(many=True)
     fields = FieldSerializer01(many=True)
     stars = ProjectStarSerializer01(many=True)
@@ -84,6 +87,8 @@ class ProjectSerializer01(serializers.ModelSerializer):
             "members_profiles",
             "fields",
             "stars",
+            "stars_count",
+            "members_count",
             "discussions_length",
         ]
 
@@ -94,6 +99,7 @@ class ProjectSerializer02(serializers.ModelSerializer):
     """
 
     category = serializers.DictField(source="category_value_and_readable")
+    image = ImageVariantField("full")
     members = ProjectMemberSerializer01(many=True)
     pending_invited_profiles = ProfileSerializer03(many=True)
     fields = FieldSerializer01(many=True)
@@ -122,14 +128,43 @@ class ProjectSerializer02(serializers.ModelSerializer):
 
 class ProjectSerializer03(serializers.ModelSerializer):
     """
-    Lightest project serializer - only id, name and image
+    Lightest project serializer - only id, name and image (the avatar variant)
     """
 
+    image = ImageVariantField("avatar")
+
     class Meta:
         model = Project
         fields = ["id", "name", "image"]
 
 
+class ProjectSerializer04(serializers.ModelSerializer):
+    """
+    Compact project card - the stars are only counted and only the first members are shown, so the size of the card
+    doesn't depend on the popularity of the project
+    """
+
+    category = serializers.DictField(source="category_value_and_readable")
+    image = ImageVariantField("card")
+    members_profiles = ProfileSerializer02(many=True, source="card_members_profiles")
+    fields = FieldSerializer01(many=True)
+
+    class Meta:
+        model = Project
+        fields = [
+            "id",
+            "category",
+            "name",
+            "slogan",
+            "image",
+            "members_profiles",
+            "members_count",
+            "fields",
+            "stars_count",
+            "discussions_length",
+        ]
+
+
 class ProjectEntryRequestSerializer01(serializers.ModelSerializer):
     project = ProjectSerializer03()
     profile = ProfileSerializer02()
@@ -172,17 +207,52 @@ class DiscussionSerializer01(serializers.ModelSerializer):
 
     class Meta:
         model = Discussion
-        fields = ["id", "title", "body", "category", "profile", "stars", "replies", "created_at"]
+        fields = [
+            "id",
+            "title",
+            "body",
+            "category",
+            "profile",
+            "stars",
+            "replies",
+            "stars_count",
+            "replies_count",
+            "created_at",
+        ]
 
 
 class DiscussionSerializer02(serializers.ModelSerializer):
-    project_id = serializers.IntegerField(source="project.id")
+    project_id = serializers.IntegerField()
 
     class Meta:
         model = Discussion
         fields = ["id", "title", "project_id"]
 
 
+class DiscussionSerializer03(serializers.ModelSerializer):
+    """
+    Discussion summary - counts instead of the stars and replies, and only the latest reply
+    """
+
+    profile = ProfileSerializer03()
+    category = serializers.DictField(source="category_value_and_readable")
+    latest_reply = DiscussionReplySerializer01()
+
+    class Meta:
+        model = Discussion
+        fields = [
+            "id",
+            "title",
+            "body",
+            "category",
+            "profile",
+            "stars_count",
+            "replies_count",
+            "latest_reply",
+            "created_at",
+        ]
+
+
 class DiscussionStarSerializer02(serializers.ModelSerializer):
     profile = ProfileSerializer02()
     discussion = DiscussionSerializer02()
@@ -199,3 +269,14 @@ class DiscussionReplySerializer02(serializers.ModelSerializer):
     class Meta:
         model = DiscussionReply
         fields = ["id", "profile", "discussion", "content", "created_at"]
+
+
+class NotificationSerializer01(serializers.ModelSerializer):
+    type = serializers.DictField(source="type_value_and_readable")
+    actor = ProfileSerializer02()
+    project = ProjectSerializer03()
+    discussion = DiscussionSerializer02()
+
+    class Meta:
+        model = Notification
+        fields = ["id", "type", "actor", "project", "discussion", "object_id", "content", "visualized", "created_at"]
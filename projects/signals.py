@@ -1,7 +1,33 @@
-from django.db.models.signals import post_save
+from core.caching import FIELDS_LIST, invalidate_reference_lists
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from profiles.long_polling import bump_notifications_version
+from profiles.models import Profile
 
-from .models import Project, ToolCategory
+from .cards import invalidate_project_cards
+from .models import (
+    DISCUSSION_REPLY_NOTIFICATION,
+    DISCUSSION_STAR_NOTIFICATION,
+    PROJECT_ENTRY_REQUEST_NOTIFICATION,
+    PROJECT_INVITATION_NOTIFICATION,
+    Discussion,
+    DiscussionReply,
+    DiscussionStar,
+    Field,
+    Link,
+    Notification,
+    Project,
+    ProjectEntryRequest,
+    ProjectInvitation,
+    ProjectMember,
+    ProjectStar,
+    Tool,
+    ToolCategory,
+    update_counter_cache,
+)
 
 
 @receiver(post_save, sender=Project)
@@ -10,3 +36,269 @@ def post_save_create_profile(sender, instance, created, **kwargs):
         ToolCategory.objects.create(name="Gerenciadores de Tarefas", project=instance)
         ToolCategory.objects.create(name="Documentos em Nuvem", project=instance)
         ToolCategory.objects.create(name="Ferramentas de Desenvolvimento", project=instance)
+
+
+@receiver(post_save, sender=ProjectInvitation)
+@receiver(post_delete, sender=ProjectInvitation)
+def project_invitation_bump_notifications_version(sender, instance, **kwargs):
+    if instance.receiver_id is not None:
+        bump_notifications_version([instance.receiver_id])
+
+
+@receiver(post_save, sender=ProjectEntryRequest)
+@receiver(post_delete, sender=ProjectEntryRequest)
+def project_entry_request_bump_notifications_version(sender, instance, **kwargs):
+    # related rows are queried by id, since they may be already deleted when the deletion cascades from them
+    bump_notifications_version(
+        ProjectMember.objects.filter(project_id=instance.project_id, role="admin").values_list("profile_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=DiscussionStar)
+@receiver(post_delete, sender=DiscussionStar)
+@receiver(post_save, sender=DiscussionReply)
+@receiver(post_delete, sender=DiscussionReply)
+def discussion_activity_bump_notifications_version(sender, instance, **kwargs):
+    bump_notifications_version(
+        Discussion.objects.filter(pk=instance.discussion_id, profile__isnull=False).values_list(
+            "profile_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=ProjectInvitation)
+def project_invitation_create_notification(sender, instance, created, **kwargs):
+    if created and instance.receiver_id is not None:
+        Notification.objects.create(
+            type=PROJECT_INVITATION_NOTIFICATION,
+            recipient_id=instance.receiver_id,
+            actor_id=instance.sender_id,
+            project_id=instance.project_id,
+            object_id=instance.id,
+            content=instance.message,
+        )
+
+
+def get_entry_request_notification(entry_request, profile_id):
+    return Notification(
+        type=PROJECT_ENTRY_REQUEST_NOTIFICATION,
+        recipient_id=profile_id,
+        actor_id=entry_request.profile_id,
+        project_id=entry_request.project_id,
+        object_id=entry_request.id,
+        content=entry_request.message,
+    )
+
+
+@receiver(post_save, sender=ProjectEntryRequest)
+def project_entry_request_create_notifications(sender, instance, created, **kwargs):
+    # only the admins of the project are notified
+    if created:
+        Notification.objects.bulk_create(
+            [
+                get_entry_request_notification(instance, profile_id)
+                for profile_id in ProjectMember.objects.filter(
+                    project_id=instance.project_id, role="admin"
+                ).values_list("profile_id", flat=True)
+            ]
+        )
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def project_member_sync_entry_requests_notifications(sender, instance, **kwargs):
+    """
+    Keeps the entry requests notifications of the member in sync with their role - promoted admins are notified of
+    the pending requests and members no longer admins (demoted, removed or leaving) lose them
+    """
+
+    if instance.profile_id is None or instance.project_id is None:
+        return
+
+    notifications = Notification.objects.filter(
+        type=PROJECT_ENTRY_REQUEST_NOTIFICATION, recipient_id=instance.profile_id, project_id=instance.project_id
+    )
+    is_admin = ProjectMember.objects.filter(
+        profile_id=instance.profile_id, project_id=instance.project_id, role="admin"
+    ).exists()
+
+    if is_admin:
+        entry_requests = ProjectEntryRequest.objects.filter(project_id=instance.project_id).exclude(
+            id__in=notifications.values("object_id")
+        )
+        changed = Notification.objects.bulk_create(
+            [get_entry_request_notification(entry_request, instance.profile_id) for entry_request in entry_requests]
+        )
+    else:
+        changed = notifications.delete()[0]
+
+    if changed:
+        bump_notifications_version([instance.profile_id])
+
+
+@receiver(post_save, sender=DiscussionStar)
+def discussion_star_save_notification(sender, instance, created, **kwargs):
+    save_discussion_activity_notification(DISCUSSION_STAR_NOTIFICATION, instance, created)
+
+
+@receiver(post_save, sender=DiscussionReply)
+def discussion_reply_save_notification(sender, instance, created, **kwargs):
+    save_discussion_activity_notification(DISCUSSION_REPLY_NOTIFICATION, instance, created, instance.content or "")
+
+
+def save_discussion_activity_notification(type, instance, created, content=""):
+    """
+    Notifies the discussion author of a star or reply (except their own ones) - later saves only sync the visualized
+    flag of the notification
+    """
+
+    if not created:
+        Notification.objects.filter(type=type, object_id=instance.id).exclude(visualized=instance.visualized).update(
+            visualized=instance.visualized, updated_at=instance.updated_at
+        )
+        return
+
+    discussion = Discussion.objects.filter(pk=instance.discussion_id).values("profile_id", "project_id").first()
+
+    if discussion is None or discussion["profile_id"] is None or discussion["profile_id"] == instance.profile_id:
+        return
+
+    Notification.objects.create(
+        type=type,
+        recipient_id=discussion["profile_id"],
+        actor_id=instance.profile_id,
+        project_id=discussion["project_id"],
+        discussion_id=instance.discussion_id,
+        object_id=instance.id,
+        content=content,
+        visualized=instance.visualized,
+    )
+
+
+@receiver(post_delete, sender=ProjectInvitation)
+@receiver(post_delete, sender=ProjectEntryRequest)
+@receiver(post_delete, sender=DiscussionStar)
+@receiver(post_delete, sender=DiscussionReply)
+def delete_notifications(sender, instance, **kwargs):
+    type = {
+        ProjectInvitation: PROJECT_INVITATION_NOTIFICATION,
+        ProjectEntryRequest: PROJECT_ENTRY_REQUEST_NOTIFICATION,
+        DiscussionStar: DISCUSSION_STAR_NOTIFICATION,
+        DiscussionReply: DISCUSSION_REPLY_NOTIFICATION,
+    }[sender]
+
+    Notification.objects.filter(type=type, object_id=instance.id).delete()
+
+
+@receiver([post_save, post_delete], sender=Field)
+def field_invalidate_list(sender, **kwargs):
+    invalidate_reference_lists(FIELDS_LIST)
+
+
+# the project page is only sent again when the updated_at of the project changes (conditional GET), so the rows
+# shown in the page (and in the cards) touch it and invalidate the cached cards
+
+
+def touch_projects(ids):
+    ids = [project_id for project_id in ids if project_id is not None]
+
+    Project.objects.filter(id__in=ids).update(updated_at=timezone.now())
+    invalidate_project_cards(ids)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_invalidate_card(sender, instance, **kwargs):
+    invalidate_project_cards([instance.id])
+
+
+@receiver(post_save, sender=Profile)
+def profile_invalidate_projects_cards(sender, instance, created, **kwargs):
+    # the cards show the profiles of the members and stargazers
+    if not created:
+        invalidate_project_cards(
+            Project.objects.filter(Q(members__profile=instance) | Q(stars__profile=instance))
+            .values_list("id", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_invalidate_projects_cards(sender, instance, created, update_fields, **kwargs):
+    if not created and update_fields != frozenset(["last_login"]):
+        invalidate_project_cards(
+            Project.objects.filter(Q(members__profile__user=instance) | Q(stars__profile__user=instance))
+            .values_list("id", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+@receiver(post_save, sender=ProjectInvitation)
+@receiver(post_delete, sender=ProjectInvitation)
+@receiver(post_save, sender=ProjectStar)
+@receiver(post_delete, sender=ProjectStar)
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+@receiver(post_save, sender=ToolCategory)
+@receiver(post_delete, sender=ToolCategory)
+@receiver(post_save, sender=Discussion)
+@receiver(post_delete, sender=Discussion)
+def project_page_row_touch_project(sender, instance, **kwargs):
+    if instance.project_id is not None:
+        touch_projects([instance.project_id])
+
+
+@receiver(post_save, sender=Tool)
+@receiver(post_delete, sender=Tool)
+def tool_touch_project(sender, instance, **kwargs):
+    touch_projects(ToolCategory.objects.filter(id=instance.category_id).values_list("project", flat=True))
+
+
+@receiver(post_save, sender=Field)
+def field_touch_projects(sender, instance, created, **kwargs):
+    if not created:
+        touch_projects(instance.projects.values_list("id", flat=True))
+
+
+# the m2m rows are deleted without m2m_changed signals
+@receiver(pre_delete, sender=Field)
+def field_delete_touch_projects(sender, instance, **kwargs):
+    touch_projects(instance.projects.values_list("id", flat=True))
+
+
+@receiver(m2m_changed, sender=Project.fields.through)
+def project_fields_touch_projects(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+
+    if not reverse:
+        touch_projects([instance.id])
+    elif action == "pre_clear":
+        touch_projects(instance.projects.values_list("id", flat=True))
+    else:
+        touch_projects(pk_set)
+
+
+# counter caches (see COUNTER_CACHES) - fixtures (raw saves) aren't counted, the recompute_counters command must be
+# run after loading them
+
+
+@receiver(post_save, sender=ProjectStar)
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_save, sender=Discussion)
+@receiver(post_save, sender=DiscussionStar)
+@receiver(post_save, sender=DiscussionReply)
+def counted_row_increment_counter(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        update_counter_cache(instance, 1)
+
+
+@receiver(post_delete, sender=ProjectStar)
+@receiver(post_delete, sender=ProjectMember)
+@receiver(post_delete, sender=Discussion)
+@receiver(post_delete, sender=DiscussionStar)
+@receiver(post_delete, sender=DiscussionReply)
+def counted_row_decrement_counter(sender, instance, **kwargs):
+    update_counter_cache(instance, -1)
@@ -1,16 +1,24 @@
 import datetime
+import tempfile
+from io import StringIO
 
 import pytz
+from core.images import process_image
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
 from django.db import transaction
 from django.db.utils import IntegrityError
 from django.test import TestCase
+from PIL import Image
+from profiles.tests.test_views import use_temporary_storage
 from projects.models import (
     Discussion,
     DiscussionReply,
     DiscussionStar,
     Field,
     Link,
+    Notification,
     Project,
     ProjectEntryRequest,
     ProjectInvitation,
@@ -19,6 +27,7 @@ from projects.models import (
     Tool,
     ToolCategory,
     discussion_categories_choices,
+    notification_types_choices,
     project_categories_choices,
     project_member_role_choices,
 )
@@ -778,3 +787,217 @@ class TestDiscussionReply(TestCase):
             str(discussion_reply),
             f"{profile01.user.username} replied {discussion_reply.content[:50]} to {discussion.title[:50]}",
         )
+
+
+class TestNotification(TestCase):
+    def test_create_delete(self):
+        profile = User.objects.create().profile
+
+        # test create
+        notification = Notification.objects.create(type=1, recipient=profile, object_id=1)
+        self.assertIsInstance(notification, Notification)
+        self.assertFalse(notification.visualized)
+
+        # test delete
+        notification.delete()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_type_value_and_readable_method(self):
+        notification = Notification.objects.create(type=3, recipient=User.objects.create().profile, object_id=1)
+        self.assertEqual(
+            notification.type_value_and_readable,
+            {"value": 3, "readable": dict(notification_types_choices)[3]},
+        )
+
+    def test_recipient_relation(self):
+        profile = User.objects.create().profile
+        notification = Notification.objects.create(type=1, recipient=profile, object_id=1)
+
+        # testing related name
+        self.assertIn(notification, profile.notifications.all())
+
+        # testing cascade
+        profile.delete()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_fan_out_on_write(self):
+        profile01 = User.objects.create(username="peter").profile
+        profile02 = User.objects.create(username="john").profile
+        profile03 = User.objects.create(username="jane").profile
+
+        project = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+        ProjectMember.objects.create(profile=profile01, project=project, role="admin")
+        ProjectMember.objects.create(profile=profile02, project=project, role="admin")
+        discussion = Discussion.objects.create(profile=profile01, project=project)
+
+        # every admin of the project is notified of an entry request
+        entry_request = ProjectEntryRequest.objects.create(project=project, profile=profile03, message="Hi!")
+        self.assertEqual(
+            set(Notification.objects.filter(type=2).values_list("recipient", "actor", "object_id", "content")),
+            {
+                (profile01.id, profile03.id, entry_request.id, "Hi!"),
+                (profile02.id, profile03.id, entry_request.id, "Hi!"),
+            },
+        )
+
+        invitation = ProjectInvitation.objects.create(project=project, sender=profile01, receiver=profile03)
+        self.assertTrue(Notification.objects.filter(type=1, recipient=profile03, object_id=invitation.id).exists())
+
+        # the author of the discussion isn't notified of their own stars
+        DiscussionStar.objects.create(discussion=discussion, profile=profile01)
+        self.assertFalse(Notification.objects.filter(type=3).exists())
+
+        reply = DiscussionReply.objects.create(discussion=discussion, profile=profile02, content="Foo bar")
+        notification = Notification.objects.get(type=4)
+        self.assertEqual(notification.recipient, profile01)
+        self.assertEqual(notification.discussion, discussion)
+        self.assertEqual(notification.content, "Foo bar")
+
+        # the visualized flag follows the reply
+        reply.visualized = True
+        reply.save()
+        notification.refresh_from_db()
+        self.assertTrue(notification.visualized)
+
+        # answering a request deletes its notifications
+        entry_request.delete()
+        invitation.delete()
+        reply.delete()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_entry_requests_follow_admins(self):
+        profile01 = User.objects.create(username="peter").profile
+        profile02 = User.objects.create(username="john").profile
+        profile03 = User.objects.create(username="jane").profile
+
+        project = Project.objects.create(name="SpaceX", category="startup", slogan="Wait for us, red planet!")
+        membership01 = ProjectMember.objects.create(profile=profile01, project=project, role="admin")
+        membership02 = ProjectMember.objects.create(profile=profile02, project=project, role="member")
+        entry_request = ProjectEntryRequest.objects.create(project=project, profile=profile03)
+
+        def get_recipients():
+            return set(
+                Notification.objects.filter(type=2, object_id=entry_request.id).values_list("recipient", flat=True)
+            )
+
+        self.assertEqual(get_recipients(), {profile01.id})
+
+        # a promoted admin is notified of the pending requests
+        membership02.role = "admin"
+        membership02.save()
+        self.assertEqual(get_recipients(), {profile01.id, profile02.id})
+
+        # saving again doesn't duplicate them
+        membership02.save()
+        self.assertEqual(Notification.objects.filter(recipient=profile02).count(), 1)
+
+        # a removed admin loses them
+        membership01.delete()
+        self.assertEqual(get_recipients(), {profile02.id})
+
+        # and a demoted one too
+        membership02.role = "member"
+        membership02.save()
+        self.assertEqual(get_recipients(), set())
+
+
+class TestCounterCaches(TestCase):
+    def test_counters(self):
+        project = Project.objects.create()
+        profile01 = User.objects.create(username="jeff").profile
+        profile02 = User.objects.create(username="elon").profile
+
+        ProjectMember.objects.create(profile=profile01, project=project, role="admin")
+        star = ProjectStar.objects.create(profile=profile01, project=project)
+        ProjectStar.objects.create(profile=profile02, project=project)
+        discussion = Discussion.objects.create(profile=profile01, project=project)
+        DiscussionStar.objects.create(profile=profile02, discussion=discussion)
+        DiscussionReply.objects.create(profile=profile02, discussion=discussion)
+        DiscussionReply.objects.create(profile=profile01, discussion=discussion)
+
+        # the instances given to create() are updated too
+        self.assertEqual((project.members_count, project.stars_count, project.discussions_count), (1, 2, 1))
+
+        star.delete()
+        project.refresh_from_db()
+        discussion.refresh_from_db()
+        self.assertEqual((project.members_count, project.stars_count, project.discussions_count), (1, 1, 1))
+        self.assertEqual((discussion.stars_count, discussion.replies_count), (1, 2))
+
+        discussion.delete()
+        project.refresh_from_db()
+        self.assertEqual(project.discussions_count, 0)
+
+    def test_save_keeps_counters(self):
+        project = Project.objects.create()
+        outdated_project = Project.objects.get(pk=project.pk)
+        ProjectStar.objects.create(project=project)
+
+        outdated_project.name = "SpaceX"
+        outdated_project.save()
+
+        project.refresh_from_db()
+        self.assertEqual((project.name, project.stars_count), ("SpaceX", 1))
+
+    def test_counters_dont_go_negative(self):
+        project = Project.objects.create()
+        star = ProjectStar.objects.create(project=project)
+
+        # a counter out of sync (e.g. rows created without signals)
+        Project.objects.update(stars_count=0)
+        star.delete()
+
+        project.refresh_from_db()
+        self.assertEqual(project.stars_count, 0)
+
+    def test_recompute_counters_command(self):
+        project = Project.objects.create()
+        discussion = Discussion.objects.create(project=project)
+        DiscussionReply.objects.create(discussion=discussion)
+        Project.objects.update(discussions_count=5)
+        Discussion.objects.update(replies_count=0)
+
+        call_command("recompute_counters", stdout=StringIO())
+
+        project.refresh_from_db()
+        discussion.refresh_from_db()
+        self.assertEqual((project.discussions_count, project.stars_count), (1, 0))
+        self.assertEqual(discussion.replies_count, 1)
+
+
+class TestImageBlobs(TestCase):
+    def setUp(self):
+        use_temporary_storage(self)
+
+    def process_image(self, project, color):
+        file = tempfile.SpooledTemporaryFile()
+        Image.new("RGB", (400, 200), color).save(file, "JPEG")
+
+        process_image(Project, project.id, "image", file, "jpg")
+        project.refresh_from_db()
+
+    def test_delete_unreferenced_images(self):
+        project = Project.objects.create(name="SpaceX")
+        storage = project.image.storage
+        storage.save("project_images/uploaded_before.jpg", ContentFile(b"image"))
+
+        self.process_image(project, "red")
+        old_names = {project.image.name, *project.image_variants.values()}
+        self.assertEqual(len(old_names), 7)
+
+        self.process_image(project, "blue")
+        names = {project.image.name, *project.image_variants.values()}
+
+        # recently modified blobs are kept
+        call_command("delete_unreferenced_images", stdout=StringIO())
+        self.assertTrue(all(storage.exists(name) for name in old_names | names))
+
+        output = StringIO()
+        call_command("delete_unreferenced_images", "--hours", "0", "--dry-run", stdout=output)
+        self.assertIn("7 images unreferenced", output.getvalue())
+        self.assertTrue(all(storage.exists(name) for name in old_names))
+
+        call_command("delete_unreferenced_images", "--hours", "0", stdout=StringIO())
+        self.assertFalse(any(storage.exists(name) for name in old_names))
+        self.assertTrue(all(storage.exists(name) for name in names))
+        self.assertTrue(storage.exists("project_images/uploaded_before.jpg"))
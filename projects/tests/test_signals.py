@@ -1,8 +1,13 @@
 from unittest import signals
 
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
-from ..models import Project, ToolCategory
+from ..cards import get_project_cards
+from ..models import Discussion, Field, Project, ProjectMember, ProjectStar, ToolCategory
+
+User = get_user_model()
 
 
 class TestSignals(TestCase):
@@ -16,3 +21,67 @@ class TestSignals(TestCase):
         self.assertTrue(ToolCategory.objects.filter(name="Gerenciadores de Tarefas", project=project).exists())
         self.assertTrue(ToolCategory.objects.filter(name="Documentos em Nuvem", project=project).exists())
         self.assertTrue(ToolCategory.objects.filter(name="Ferramentas de Desenvolvimento", project=project).exists())
+
+
+class TestProjectCards(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_get_project_cards(self):
+        project01 = Project.objects.create(name="SpaceX")
+        project02 = Project.objects.create(name="Tesla")
+
+        with self.assertNumQueries(4):
+            cards = get_project_cards([project02.id, 0, project01.id])
+
+        self.assertEqual([card["name"] for card in cards], ["Tesla", "SpaceX"])
+
+        # a page of cached cards doesn't hit the database
+        with self.assertNumQueries(0):
+            self.assertEqual(get_project_cards([project02.id, project01.id]), cards)
+
+        # only the missing cards are loaded
+        project03 = Project.objects.create(name="Boring")
+
+        with self.assertNumQueries(4):
+            cards = get_project_cards([project03.id, project02.id, project01.id])
+
+        self.assertEqual([card["name"] for card in cards], ["Boring", "Tesla", "SpaceX"])
+
+    def test_invalidation(self):
+        project = Project.objects.create(name="SpaceX")
+        profile = User.objects.create(username="jeff").profile
+
+        def get_card():
+            return get_project_cards([project.id])[0]
+
+        project.name = "Tesla"
+        project.save()
+        self.assertEqual(get_card()["name"], "Tesla")
+
+        ProjectMember.objects.create(profile=profile, project=project, role="admin")
+        self.assertEqual([profile["id"] for profile in get_card()["members_profiles"]], [profile.id])
+
+        profile.user.username = "jeff.bezos"
+        profile.user.save()
+        self.assertEqual(get_card()["members_profiles"][0]["user"]["username"], "jeff.bezos")
+
+        star = ProjectStar.objects.create(profile=profile, project=project)
+        self.assertEqual(len(get_card()["stars"]), 1)
+
+        star.delete()
+        self.assertEqual(len(get_card()["stars"]), 0)
+
+        Discussion.objects.create(profile=profile, project=project)
+        self.assertEqual(get_card()["discussions_length"], 1)
+
+        field = Field.objects.create(name="Innovation")
+        project.fields.add(field)
+        self.assertEqual(get_card()["fields"], [{"id": field.id, "name": "Innovation"}])
+
+        field.name = "Finance"
+        field.save()
+        self.assertEqual(get_card()["fields"], [{"id": field.id, "name": "Finance"}])
+
+        project.delete()
+        self.assertEqual(get_project_cards([project.id]), [])
@@ -28,6 +28,9 @@ class TestUrls(TestCase):
     def test_edit_project_url(self):
         self.assertEqual(resolve(BASE_URL + "edit-project/4").func, edit_project)
 
+    def test_upload_project_image_url(self):
+        self.assertEqual(resolve(BASE_URL + "upload-project-image/4").func, upload_project_image)
+
     def test_invite_to_project_url(self):
         self.assertEqual(resolve(BASE_URL + "invite-users-to-project/1").func, invite_users_to_project)
 
@@ -79,6 +82,9 @@ class TestUrls(TestCase):
     def test_get_project_discussion_url(self):
         self.assertEqual(resolve(BASE_URL + "get-project-discussion/3").func, get_project_discussion)
 
+    def test_get_discussion_replies_url(self):
+        self.assertEqual(resolve(BASE_URL + "get-discussion-replies/3").func, get_discussion_replies)
+
     def test_delete_project_discussion_url(self):
         self.assertEqual(resolve(BASE_URL + "delete-project-discussion").func, delete_project_discussion)
 
@@ -1,6 +1,15 @@
+import io
+
+from core.pagination import encode_cursor
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
 from profiles.models import Profile
+from profiles.tests.test_views import use_temporary_storage
 from rest_framework import status
 
 from ..models import (
@@ -10,15 +19,43 @@ from ..models import (
     Field,
     Link,
     Project,
+    ProjectInvitation,
+    ProjectMember,
     ProjectStar,
+    Tool,
+    ToolCategory,
 )
-from ..serializers import FieldSerializer01, ProjectSerializer01, ProjectSerializer02
+from ..serializers import DiscussionSerializer01, FieldSerializer01, ProjectSerializer01, ProjectSerializer02
 
 User = get_user_model()
 client = Client()
 BASE_URL = "/api/projects/"
 
 
+def create_projects(number, name="SpaceX"):
+    """
+    Creates projects with everything rendered by ProjectSerializer01 (members, fields, stars and discussions)
+    """
+
+    field = Field.objects.get_or_create(name="Innovation")[0]
+
+    for i in range(number):
+        profile = User.objects.create(username=f"user{Profile.objects.count()}").profile
+        project = Project.objects.create(name=f"{name}{Project.objects.count()}", category="startup")
+        project.fields.add(field)
+        ProjectMember.objects.create(profile=profile, project=project, role="admin")
+        ProjectStar.objects.create(profile=profile, project=project)
+        Discussion.objects.create(profile=profile, project=project)
+        Discussion.objects.create(profile=profile, project=project)
+
+
+def count_queries(url):
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+
+    return len(context)
+
+
 class TestGetFieldsNameList(TestCase):
     url = BASE_URL + "get-fields-name-list"
 
@@ -55,55 +92,52 @@ class TestGetFilteredProjects(TestCase):
             self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def test_res(self):
-        Project.objects.create(name="Uniconn")
-        Project.objects.create(name="UniCorn")
+        project01 = Project.objects.create(name="Uniconn", slogan="Conectando universitários")
+        project02 = Project.objects.create(name="UniCorn")
         Project.objects.create(name="Connectuni")
         Project.objects.create(name="SpaceX")
-        Project.objects.create(name="BlueOrigin")
+        project05 = Project.objects.create(name="BlueOrigin", slogan="Foguetes reutilizáveis para universidades")
 
-        query = "Uni"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 3)
-        self.assertEqual(
-            response.data, ProjectSerializer01(Project.objects.filter(name__icontains=query), many=True).data
-        )
+        # words are matched as prefixes, ignoring case and accents - the name and slogan of project01 both match
+        response = client.get(self.url + "Uni")
+        self.assertEqual(response.data, ProjectSerializer01([project01, project02, project05], many=True).data)
 
-        query = "UNI"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 3)
-        self.assertEqual(
-            response.data, ProjectSerializer01(Project.objects.filter(name__icontains=query), many=True).data
-        )
+        response = client.get(self.url + "UNI")
+        self.assertEqual(response.data, ProjectSerializer01([project01, project02, project05], many=True).data)
 
-        query = "uniconn"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(
-            response.data, ProjectSerializer01(Project.objects.filter(name__icontains=query), many=True).data
-        )
+        response = client.get(self.url + "uniconn")
+        self.assertEqual(response.data, ProjectSerializer01([project01], many=True).data)
 
-        query = "unexistent-name"
-        response = client.get(self.url + query)
-        self.assertEqual(len(response.data), 0)
-        self.assertEqual(
-            response.data, ProjectSerializer01(Project.objects.filter(name__icontains=query), many=True).data
-        )
+        # slogans are searched too, with portuguese plurals reduced to the singular
+        response = client.get(self.url + "foguete universidade")
+        self.assertEqual(response.data, ProjectSerializer01([project05], many=True).data)
+
+        response = client.get(self.url + "unexistent-name")
+        self.assertEqual(response.data, [])
 
         # asserting view only return 5 projects
         for i in range(20):
             Project.objects.create(name=f"SpaceDiggers{i}")
 
-        query = "SpaceDiggers"
-        response = client.get(self.url + query)
+        response = client.get(self.url + "SpaceDiggers")
         self.assertEqual(len(response.data), 5)
-        self.assertEqual(
-            response.data, ProjectSerializer01(Project.objects.filter(name__icontains=query)[:5], many=True).data
-        )
 
+    def test_query_count(self):
+        create_projects(1, name="Uniconn")
+        queries_number = count_queries(self.url + "uniconn")
+
+        create_projects(4, name="Uniconn")
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(self.url + "uniconn")
+
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]["discussions_length"], 2)
 
-#-------------------------------------------------------------
+
+# -------------------------------------------------------------
 # ---------- CONTINUE FROM HERE ------------------------------
-#-------------------------------------------------------------
+# -------------------------------------------------------------
 
 
 class TestGetProjectsList(TestCase):
@@ -126,6 +160,80 @@ class TestGetProjectsList(TestCase):
         response = client.get(self.url)
         self.assertEqual(response.data, serializer.data)
 
+    def test_isall(self):
+        create_projects(3)
+        projects = list(Project.objects.all())
+
+        response = client.get(self.url + "?length=2")
+        self.assertFalse(response.data["isall"])
+        self.assertEqual(response.data["next_cursor"], encode_cursor(id=projects[1].id))
+        self.assertEqual(response.data["total_estimate"], 3)
+
+        response = client.get(self.url + "?length=3")
+        self.assertTrue(response.data["isall"])
+        self.assertIsNone(response.data["next_cursor"])
+        self.assertEqual(response.data["total_estimate"], 3)
+
+    def test_cursor(self):
+        create_projects(5)
+        projects = list(Project.objects.all())
+
+        response = client.get(self.url + "?length=2")
+        self.assertEqual([project["id"] for project in response.data["projects"]], [p.id for p in projects[:2]])
+
+        response = client.get(self.url + f"?length=2&cursor={response.data['next_cursor']}")
+        self.assertEqual(response.data["projects"], ProjectSerializer01(projects[2:4], many=True).data)
+        self.assertFalse(response.data["isall"])
+        self.assertIsNone(response.data["total_estimate"])
+
+        response = client.get(self.url + f"?length=2&cursor={response.data['next_cursor']}")
+        self.assertEqual(response.data["projects"], ProjectSerializer01(projects[4:], many=True).data)
+        self.assertTrue(response.data["isall"])
+        self.assertIsNone(response.data["next_cursor"])
+
+        response = client.get(self.url + "?cursor=foo")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_params(self):
+        for params in ["cursor=foo", "length=0", "length=-1", "card=foo"]:
+            response = client.get(f"{self.url}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, "Dados inválidos!")
+
+    def test_query_count(self):
+        create_projects(1)
+        queries_number = count_queries(self.url)
+
+        create_projects(9)
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(self.url)
+
+        self.assertEqual(len(response.data["projects"]), 10)
+        self.assertEqual(response.data["projects"][0]["discussions_length"], 2)
+
+    def test_compact_cards(self):
+        project = Project.objects.create(name="SpaceX")
+        profiles = [User.objects.create(username=f"user{i}").profile for i in range(7)]
+
+        for profile in profiles:
+            ProjectMember.objects.create(profile=profile, project=project, role="member")
+            ProjectStar.objects.create(profile=profile, project=project)
+
+        response = client.get(f"{self.url}?card=compact")
+        card = response.data["projects"][0]
+        self.assertNotIn("stars", card)
+        self.assertEqual([profile["id"] for profile in card["members_profiles"]], [p.id for p in profiles[:5]])
+        self.assertEqual((card["members_count"], card["stars_count"], card["starred_by_me"]), (7, 7, False))
+
+        user_client = Client()
+        user_client.force_login(profiles[0].user)
+        card = user_client.get(f"{self.url}?card=compact").data["projects"][0]
+        self.assertTrue(card["starred_by_me"])
+
+        response = client.get(f"{self.url}?card=foo")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestGetFilteredProjectsList(TestCase):
     url = BASE_URL + "get-filtered-projects-list"
@@ -319,6 +427,92 @@ class TestGetProject(TestCase):
         response = client.get(f"{self.url}1")
         self.assertEqual(response.data, ProjectSerializer02(project).data)
 
+    def test_query_count(self):
+        project = Project.objects.create(name="SpaceX", category="startup")
+        project.fields.add(Field.objects.create(name="Innovation"))
+        category = ToolCategory.objects.filter(project=project).first()
+
+        def create_project_data(number):
+            for i in range(number):
+                profile = User.objects.create(username=f"user{Profile.objects.count()}").profile
+                ProjectMember.objects.create(profile=profile, project=project, role="member")
+                ProjectInvitation.objects.create(project=project, receiver=profile)
+                ProjectStar.objects.create(profile=profile, project=project)
+                Link.objects.create(project=project, name=f"link{i}")
+                Tool.objects.create(category=category, name=f"tool{i}")
+                Discussion.objects.create(profile=profile, project=project)
+
+        create_project_data(1)
+        queries_number = count_queries(f"{self.url}{project.id}")
+
+        create_project_data(10)
+
+        with self.assertNumQueries(queries_number):
+            response = client.get(f"{self.url}{project.id}")
+
+        # the image urls are signed with the current time, so only the related objects are compared
+        data = ProjectSerializer02(project).data
+
+        for key in ["members", "pending_invited_profiles", "links", "tools_categories", "stars"]:
+            self.assertEqual([item["id"] for item in response.data[key]], [item["id"] for item in data[key]])
+
+        self.assertEqual(len(response.data["members"]), 11)
+        self.assertEqual(response.data["discussions_length"], 11)
+
+    def test_conditional_get(self):
+        project = Project.objects.create(name="SpaceX")
+        url = f"{self.url}{project.id}"
+
+        def assert_not_modified(etag):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        def assert_modified(etag):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+            return response["ETag"]
+
+        response = client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        # the page isn't serialized again
+        with self.assertNumQueries(2):
+            assert_not_modified(etag)
+
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        profile = User.objects.create(username="jeff").profile
+        member = ProjectMember.objects.create(profile=profile, project=project, role="admin")
+        etag = assert_modified(etag)
+
+        profile.bio = "Hi"
+        profile.save()
+        etag = assert_modified(etag)
+        assert_not_modified(etag)
+
+        Link.objects.create(project=project, name="site")
+        etag = assert_modified(etag)
+
+        Tool.objects.create(category=ToolCategory.objects.filter(project=project).first(), name="git")
+        etag = assert_modified(etag)
+
+        field = Field.objects.create(name="Innovation")
+        project.fields.add(field)
+        etag = assert_modified(etag)
+
+        field.name = "Finance"
+        field.save()
+        etag = assert_modified(etag)
+
+        member.delete()
+        etag = assert_modified(etag)
+
+        response = client.get(f"{self.url}0", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class TestEditProject(TestCase):
     url = BASE_URL + "edit-project/"
@@ -401,6 +595,61 @@ class TestEditProject(TestCase):
         # TODO project image upload test
 
 
+class TestUploadProjectImage(TestCase):
+    url = BASE_URL + "upload-project-image/"
+
+    def setUp(self):
+        use_temporary_storage(self)
+
+    def test_req(self):
+        response = client.put(f"{self.url}1")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        for method in ["get", "delete", "post", "patch"]:
+            response = getattr(client, method)(f"{self.url}1")
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_res(self):
+        profile = User.objects.create().profile
+        client.force_login(profile.user)
+
+        content = io.BytesIO()
+        Image.new("RGBA", (600, 300), (255, 0, 0, 128)).save(content, "PNG")
+        data = encode_multipart(BOUNDARY, {"image": SimpleUploadedFile("image.png", content.getvalue())})
+
+        response = client.put(f"{self.url}1", data, content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, "Projeto não encontrado")
+
+        project = Project.objects.create(name="SpaceX")
+        url = f"{self.url}{project.id}"
+
+        response = client.put(url, data, content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, "Você não faz parte do projeto!")
+
+        membership = ProjectMember.objects.create(profile=profile, project=project, role="member")
+
+        response = client.put(url, data, content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, "Somente admins podem editar o projeto!")
+
+        membership.role = "admin"
+        membership.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(url, data, content_type=MULTIPART_CONTENT)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        project.refresh_from_db()
+        self.assertRegex(project.image.name, r"^project_images/[0-9a-f]{64}\.png$")
+
+        # transparent images keep their transparency in the PNG variants
+        with Image.open(project.image.storage.open(project.image_variants["card"])) as image:
+            self.assertEqual((image.format, image.mode, image.size), ("PNG", "RGBA", (320, 160)))
+
+
 class TestInviteUsersToProject(TestCase):
     url = BASE_URL + "invite-{}-to-project/{}"
 
@@ -650,11 +899,112 @@ class TestCreateProjectDiscussion(TestCase):
 
 
 class TestGetProjectDiscussions(TestCase):
-    pass
+    url = BASE_URL + "get-project-discussions/"
+
+    def create_discussions(self, project, number):
+        for i in range(number):
+            profile = User.objects.create(username=f"user{Profile.objects.count()}").profile
+            discussion = Discussion.objects.create(profile=profile, project=project, title=f"discussion{i}")
+            DiscussionStar.objects.create(profile=profile, discussion=discussion)
+            DiscussionReply.objects.create(profile=profile, discussion=discussion, content="first")
+            DiscussionReply.objects.create(profile=profile, discussion=discussion, content="latest")
+
+    def test_res(self):
+        response = client.get(f"{self.url}1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        project = Project.objects.create()
+        self.create_discussions(project, 3)
+        discussions = list(Discussion.objects.all())
+
+        response = client.get(f"{self.url}{project.id}?length=2")
+        self.assertEqual(
+            [discussion["id"] for discussion in response.data["discussions"]], [d.id for d in discussions[:2]]
+        )
+        self.assertEqual(len(response.data["discussions"][0]["replies"]), 2)
+
+        response = client.get(f"{self.url}{project.id}?length=2&cursor={response.data['next_cursor']}")
+        self.assertEqual([discussion["id"] for discussion in response.data["discussions"]], [discussions[2].id])
+        self.assertIsNone(response.data["next_cursor"])
+
+        response = client.get(f"{self.url}{project.id}?mode=summary")
+        discussion = response.data["discussions"][0]
+        self.assertNotIn("replies", discussion)
+        self.assertEqual((discussion["stars_count"], discussion["replies_count"]), (1, 2))
+        self.assertEqual(discussion["latest_reply"]["content"], "latest")
+
+        for params in ["mode=foo", "cursor=foo", "length=foo", "length=0", "length=-1"]:
+            response = client.get(f"{self.url}{project.id}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # without pagination params, the whole list
+        self.create_discussions(project, 10)
+        response = client.get(f"{self.url}{project.id}")
+        self.assertEqual(
+            response.data, DiscussionSerializer01(Discussion.objects.prefetch_thread_data(), many=True).data
+        )
+        self.assertEqual(len(response.data), 13)
+
+    def test_query_count(self):
+        project = Project.objects.create()
+        self.create_discussions(project, 1)
+
+        for mode, queries_number in [("full", 4), ("summary", 3)]:
+            with self.assertNumQueries(queries_number):
+                client.get(f"{self.url}{project.id}?mode={mode}")
+
+        self.create_discussions(project, 10)
+
+        for mode, queries_number in [("full", 4), ("summary", 3)]:
+            with self.assertNumQueries(queries_number):
+                response = client.get(f"{self.url}{project.id}?mode={mode}")
+
+            self.assertEqual(len(response.data["discussions"]), 10)
 
 
 class TestGetProjectDiscussion(TestCase):
-    pass
+    url = BASE_URL + "get-project-discussion/"
+
+    def test_res(self):
+        response = client.get(f"{self.url}1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        profile = User.objects.create(username="jeff").profile
+        discussion = Discussion.objects.create(profile=profile, title="Foo")
+        DiscussionReply.objects.create(profile=profile, discussion=discussion, content="bar")
+
+        response = client.get(f"{self.url}{discussion.id}?mode=summary")
+        self.assertEqual(response.data["replies_count"], 1)
+        self.assertEqual(response.data["latest_reply"]["content"], "bar")
+
+        discussion = Discussion.objects.create(profile=profile, title="Foo")
+        response = client.get(f"{self.url}{discussion.id}?mode=summary")
+        self.assertIsNone(response.data["latest_reply"])
+
+
+class TestGetDiscussionReplies(TestCase):
+    url = BASE_URL + "get-discussion-replies/"
+
+    def test_res(self):
+        response = client.get(f"{self.url}1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        profile = User.objects.create(username="jeff").profile
+        discussion = Discussion.objects.create(profile=profile)
+        replies = [DiscussionReply.objects.create(profile=profile, discussion=discussion) for i in range(5)][::-1]
+
+        with self.assertNumQueries(2):
+            response = client.get(f"{self.url}{discussion.id}?length=3")
+
+        self.assertEqual([reply["id"] for reply in response.data["replies"]], [reply.id for reply in replies[:3]])
+
+        response = client.get(f"{self.url}{discussion.id}?length=3&cursor={response.data['next_cursor']}")
+        self.assertEqual([reply["id"] for reply in response.data["replies"]], [reply.id for reply in replies[3:]])
+        self.assertIsNone(response.data["next_cursor"])
+
+        for params in ["cursor=foo", "length=0", "length=-1"]:
+            response = client.get(f"{self.url}{discussion.id}?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class TestDeleteProjectDiscussion(TestCase):
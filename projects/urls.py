@@ -6,11 +6,13 @@ from .views import *
 urlpatterns = [
     path("get-fields-name-list", get_fields_name_list),
     path("get-filtered-projects/<str:query>", get_filtered_projects),
+    path("autocomplete-projects/<str:query>", autocomplete_projects),
     path("get-projects-list", get_projects_list),
     path("get-projects-categories-list", get_projects_categories_list),
     path("create-project", create_project),
     path("get-project/<int:project_id>", get_project),
     path("edit-project/<int:project_id>", edit_project),
+    path("upload-project-image/<int:project_id>", upload_project_image),
     path("invite-users-to-project/<int:project_id>", invite_users_to_project),
     path("uninvite-user-from-project/<int:project_id>", uninvite_user_from_project),
     path("ask-to-join-project/<int:project_id>", ask_to_join_project),
@@ -28,6 +30,7 @@ urlpatterns = [
     path("create-project-discussion/<int:project_id>", create_project_discussion),
     path("get-project-discussions/<int:project_id>", get_project_discussions),
     path("get-project-discussion/<int:discussion_id>", get_project_discussion),
+    path("get-discussion-replies/<int:discussion_id>", get_discussion_replies),
     path("delete-project-discussion", delete_project_discussion),
     path("star-discussion/<int:discussion_id>", star_discussion),
     path("unstar-discussion/<int:discussion_id>", unstar_discussion),
@@ -1,12 +1,25 @@
-import base64
-
-from django.core.files.base import ContentFile
+from core.caching import FIELDS_LIST, PROJECT_CATEGORIES_LIST, cached_reference_list
+from core.conditional import page_condition
+from core.images import decode_image, process_image_in_background, read_image
+from core.pagination import decode_cursor, encode_cursor
+from django.core.cache import cache
+from django.db.models import Max, Q
 from jwt_auth.decorators import login_required
 from profiles.models import Profile
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from search.documents import (
+    AUTOCOMPLETE_CACHE_TIMEOUT,
+    AUTOCOMPLETE_MAX_PREFIX_LENGTH,
+    PROJECT,
+    autocomplete,
+    get_autocomplete_cache_key,
+    search,
+)
 
+from .cards import CARD_FORMATS, FULL_CARD, get_project_cards
 from .models import (
     Discussion,
     DiscussionReply,
@@ -23,14 +36,17 @@ from .models import (
     project_categories_choices,
 )
 from .serializers import (
+    DiscussionReplySerializer01,
     DiscussionSerializer01,
+    DiscussionSerializer03,
     FieldSerializer01,
-    ProjectSerializer01,
     ProjectSerializer02,
+    ProjectSerializer03,
 )
 
 
 @api_view(["GET"])
+@cached_reference_list(FIELDS_LIST)
 def get_fields_name_list(request):
     Fields = Field.objects.all()
     serializer = FieldSerializer01(Fields, many=True)
@@ -40,15 +56,46 @@ def get_fields_name_list(request):
 
 @api_view(["GET"])
 def get_filtered_projects(request, query):
-    profiles = Project.objects.filter(name__icontains=query)[:5]
-    serializer = ProjectSerializer01(profiles, many=True)
+    card_format = request.query_params.get("card", FULL_CARD)
 
-    return Response(serializer.data)
+    if card_format not in CARD_FORMATS:
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    projects = search(Project.objects.only("id"), PROJECT, query, 5)
+
+    return Response(get_project_cards([project.id for project in projects], card_format, request.user))
+
+
+@api_view(["GET"])
+def autocomplete_projects(request, query):
+    query = query[:AUTOCOMPLETE_MAX_PREFIX_LENGTH]
+    cache_key = get_autocomplete_cache_key(PROJECT, query)
+    data = cache.get(cache_key)
+
+    if data is None:
+        projects = autocomplete(Project.objects.all(), PROJECT, query, 10)
+        data = ProjectSerializer03(projects, many=True).data
+        cache.set(cache_key, data, AUTOCOMPLETE_CACHE_TIMEOUT)
+
+    return Response(data)
 
 
 @api_view(["GET"])
 def get_projects_list(request):
-    length = request.query_params.get("length", 10)
+    try:
+        length = int(request.query_params.get("length", 10))
+        cursor = decode_cursor(request.query_params.get("cursor"))
+        cursor_id = int(cursor["id"]) if cursor else None
+        card_format = request.query_params.get("card", FULL_CARD)
+
+        if length < 1:
+            raise ValueError("Invalid length")
+
+        if card_format not in CARD_FORMATS:
+            raise ValueError("Invalid card format")
+    except (ValueError, TypeError, KeyError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
     categories = request.query_params.get("categories", None)
     fields = request.query_params.get("fields", None)
 
@@ -60,18 +107,36 @@ def get_projects_list(request):
     if fields is not None:
         filter["fields__name__in"] = fields.split(";")
 
-    projects = Project.objects.filter(**filter).distinct()[: int(length)]
-    serializer = ProjectSerializer01(projects, many=True)
+    projects = Project.objects.filter(**filter).distinct()
+
+    # cursor mode - only the slice after the last loaded item (items are ordered by -id) is fetched
+    if cursor_id is not None:
+        projects = projects.filter(id__lt=cursor_id)
+
+    # fetching one extra project tells if there are more, without loading all of them. Only the ids are fetched,
+    # the cards are mostly cached
+    page = list(projects.values_list("id", flat=True)[: length + 1])
+    isall = len(page) <= length
+    page = page[:length]
+
+    # the total is only estimated for the first page
+    total_estimate = None
+
+    if cursor_id is None:
+        total_estimate = len(page) if isall else projects.count()
 
     return Response(
         {
-            "isall": len(serializer.data) == len(Project.objects.filter(**filter).distinct()),
-            "projects": serializer.data,
+            "isall": isall,
+            "projects": get_project_cards(page, card_format, request.user),
+            "next_cursor": encode_cursor(id=page[-1]) if not isall else None,
+            "total_estimate": total_estimate,
         }
     )
 
 
 @api_view(["GET"])
+@cached_reference_list(PROJECT_CATEGORIES_LIST)
 def get_projects_categories_list(request):
     categories = [
         {"value": category[0], "readable": category[1]} for category in Project.get_project_categories_choices()
@@ -114,10 +179,30 @@ def create_project(request):
     return Response(project.id)
 
 
+def get_project_page_last_modified(request, project_id):
+    """
+    Related rows touch the updated_at of their project (see signals), except for the profiles shown in the page
+    """
+
+    updated_at = Project.objects.filter(pk=project_id).values_list("updated_at", flat=True).first()
+
+    if updated_at is None:
+        return None
+
+    profiles_updated_at = Profile.objects.filter(
+        Q(id__in=ProjectMember.objects.filter(project=project_id).values("profile"))
+        | Q(id__in=ProjectStar.objects.filter(project=project_id).values("profile"))
+        | Q(id__in=ProjectInvitation.objects.filter(project=project_id).values("receiver"))
+    ).aggregate(Max("updated_at"))["updated_at__max"]
+
+    return max(updated_at, profiles_updated_at or updated_at)
+
+
 @api_view(["GET"])
+@page_condition(get_project_page_last_modified)
 def get_project(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.objects.prefetch_page_data().get(pk=project_id)
     except:
         return Response("Projeto não encontrado", status=status.HTTP_404_NOT_FOUND)
 
@@ -162,10 +247,10 @@ def edit_project(request, project_id):
         return Response("Selecione pelo menos uma área de atuação válida!", status=status.HTTP_400_BAD_REQUEST)
 
     if image is not None:
-        format, imgstr = image.split(";base64,")
-        img_format = format.split("/")[-1]
-        project_image = ContentFile(base64.b64decode(imgstr), name=f"{project.name}.{img_format}")
-        project.image = project_image
+        try:
+            image_file, image_extension = decode_image(image)
+        except ValueError:
+            return Response("Imagem inválida!", status=status.HTTP_400_BAD_REQUEST)
 
     project.name = name
     project.category = category
@@ -174,6 +259,41 @@ def edit_project(request, project_id):
 
     project.save()
 
+    if image is not None:
+        process_image_in_background(Project, project.id, "image", image_file, image_extension)
+
+    return Response("success")
+
+
+@api_view(["PUT"])
+@parser_classes([MultiPartParser])
+@login_required
+def upload_project_image(request, project_id):
+    """
+    Multipart alternative to the base64 image of edit_project - the file is streamed by the upload handlers instead
+    of being parsed as JSON
+    """
+
+    try:
+        project = Project.objects.get(pk=project_id)
+    except:
+        return Response("Projeto não encontrado", status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        project_membership = ProjectMember.objects.get(profile=request.user.profile, project=project)
+    except:
+        return Response("Você não faz parte do projeto!", status=status.HTTP_401_UNAUTHORIZED)
+
+    if project_membership.role != "admin":
+        return Response("Somente admins podem editar o projeto!", status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        image_file, image_extension = read_image(request.FILES["image"])
+    except (KeyError, ValueError):
+        return Response("Imagem inválida!", status=status.HTTP_400_BAD_REQUEST)
+
+    process_image_in_background(Project, project.id, "image", image_file, image_extension)
+
     return Response("success")
 
 
@@ -575,30 +695,99 @@ def create_project_discussion(request, project_id):
     return Response("success")
 
 
+# discussion modes - "full" has every star and reply, "summary" only their numbers and the latest reply
+discussion_modes = {
+    "full": (DiscussionSerializer01, "prefetch_thread_data"),
+    "summary": (DiscussionSerializer03, "prefetch_summary_data"),
+}
+
+
 @api_view(["GET"])
 def get_project_discussions(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
-    except:
+        length = int(request.query_params.get("length", 10))
+        cursor = decode_cursor(request.query_params.get("cursor"))
+        cursor_id = int(cursor["id"]) if cursor else None
+        serializer_class, prefetch = discussion_modes[request.query_params.get("mode", "full")]
+
+        if length < 1:
+            raise ValueError("Invalid length")
+    except (ValueError, TypeError, KeyError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    if not Project.objects.filter(pk=project_id).exists():
         return Response("Projeto não encontrado!", status=status.HTTP_404_NOT_FOUND)
 
-    serializer = DiscussionSerializer01(project.discussions, many=True)
+    discussions = getattr(Discussion.objects.filter(project=project_id), prefetch)()
 
-    return Response(serializer.data)
+    # without any of the pagination params every discussion is returned, in the list the clients already read
+    if not any(param in request.query_params for param in ["length", "cursor", "mode"]):
+        serializer = serializer_class(discussions, many=True)
+
+        return Response(serializer.data)
+
+    # keyset pagination over the ids (discussions are ordered by -id)
+    if cursor_id is not None:
+        discussions = discussions.filter(id__lt=cursor_id)
+
+    page = list(discussions[: length + 1])
+    isall = len(page) <= length
+    page = page[:length]
+
+    serializer = serializer_class(page, many=True)
+
+    return Response(
+        {"discussions": serializer.data, "next_cursor": encode_cursor(id=page[-1].id) if not isall else None}
+    )
 
 
 @api_view(["GET"])
 def get_project_discussion(request, discussion_id):
     try:
-        discussion = Discussion.objects.get(pk=discussion_id)
+        serializer_class, prefetch = discussion_modes[request.query_params.get("mode", "full")]
+    except KeyError:
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        discussion = getattr(Discussion.objects, prefetch)().get(pk=discussion_id)
     except:
         return Response("Discussão não encontrada", status=status.HTTP_404_NOT_FOUND)
 
-    serializer = DiscussionSerializer01(discussion)
+    serializer = serializer_class(discussion)
 
     return Response(serializer.data)
 
 
+@api_view(["GET"])
+def get_discussion_replies(request, discussion_id):
+    try:
+        length = int(request.query_params.get("length", 20))
+        cursor = decode_cursor(request.query_params.get("cursor"))
+        cursor_id = int(cursor["id"]) if cursor else None
+
+        if length < 1:
+            raise ValueError("Invalid length")
+    except (ValueError, TypeError, KeyError):
+        return Response("Dados inválidos!", status=status.HTTP_400_BAD_REQUEST)
+
+    if not Discussion.objects.filter(pk=discussion_id).exists():
+        return Response("Discussão não encontrada", status=status.HTTP_404_NOT_FOUND)
+
+    replies = DiscussionReply.objects.filter(discussion=discussion_id).select_related("profile__user")
+
+    # keyset pagination over the ids (replies are ordered by -id)
+    if cursor_id is not None:
+        replies = replies.filter(id__lt=cursor_id)
+
+    page = list(replies[: length + 1])
+    isall = len(page) <= length
+    page = page[:length]
+
+    serializer = DiscussionReplySerializer01(page, many=True)
+
+    return Response({"replies": serializer.data, "next_cursor": encode_cursor(id=page[-1].id) if not isall else None})
+
+
 @api_view(["DELETE"])
 @login_required
 def delete_project_discussion(request):
@@ -0,0 +1,303 @@
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models.functions import Length
+from django.utils.module_loading import import_string
+
+from .trie import Trie
+
+DEFAULT_SEARCH_BACKENDS = {
+    "postgresql": "search.backends.PostgreSQLSearchBackend",
+    "sqlite": "search.backends.SQLiteSearchBackend",
+}
+
+
+def strip_accents(text):
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+
+def get_words(text):
+    """
+    Splits the text into lowercase words without accents - anything that isn't a word character is dropped, so the
+    words are always safe to be used in the full-text query syntax of the backends
+    """
+
+    return re.findall(r"[^\W_]+", strip_accents(text or "").lower())
+
+
+class BaseSearchBackend:
+    """
+    Full-text search backend interface - each kind of document (e.g. "project") has its own index table, keyed by the
+    id of the indexed object. Documents have a *title* (ranked higher) and a *body*
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_table_name(self, kind):
+        return f"search_{kind}_document"
+
+    def create_index(self, schema_editor, kind):
+        raise NotImplementedError
+
+    def drop_index(self, schema_editor, kind):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.get_table_name(kind)}")
+
+    def index(self, kind, object_id, title, body):
+        raise NotImplementedError
+
+    def clear(self, kind):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.get_table_name(kind)}")
+
+    def delete(self, kind, object_ids):
+        if not object_ids:
+            return
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.get_table_name(kind)} WHERE {self.id_column} IN "
+                f"({', '.join(['%s'] * len(object_ids))})",
+                list(object_ids),
+            )
+
+    def search(self, kind, query, limit):
+        """
+        Returns the ids of the objects that match every word of the query, from the most to the least relevant. The
+        words are matched as prefixes, since the query is usually typed incrementally
+        """
+
+        raise NotImplementedError
+
+    def create_autocomplete_index(self, schema_editor, table_name, column):
+        pass
+
+    def drop_autocomplete_index(self, schema_editor, table_name, column):
+        pass
+
+    def autocomplete(self, kind, queryset, field, prefix, limit):
+        """
+        Returns the ids of the objects of the queryset whose *field* starts with the prefix (case insensitive) -
+        shorter values first, then alphabetically
+        """
+
+        raise NotImplementedError
+
+    def update_autocomplete(self, kind, object_id, key):
+        pass
+
+    def remove_autocomplete(self, kind, object_id):
+        pass
+
+
+# suffixes replaced to reduce portuguese plurals to the singular form (light version of the RSLP stemmer first step)
+PLURAL_SUFFIXES = [("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m")]
+
+
+def stem(word):
+    if len(word) <= 3 or not word.isalpha():
+        return word
+
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if word.endswith(suffix):
+            return word[: -len(suffix)] + replacement
+
+    # singular words ending in "s" (e.g. "onibus", "lapis", "stress") are kept
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+
+    return word
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 backend for development and tests - FTS5 has no portuguese stemmer, so the words are stemmed before being
+    indexed or searched. The rowid of the index table is the id of the indexed object
+    """
+
+    id_column = "rowid"
+
+    # maximum number of indexed terms a query word (a prefix) is expanded into. Unlike the PostgreSQL backend (":*"
+    # prefix queries), short prefixes matching more terms only find the documents of the most frequent ones - the rare
+    # terms are dropped, so dev and tests may return fewer documents than production for them
+    MAX_PREFIX_TERMS = 50
+
+    def create_index(self, schema_editor, kind):
+        table_name = self.get_table_name(kind)
+
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table_name} USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {table_name}_terms USING fts5vocab({table_name}, 'row')")
+
+    def drop_index(self, schema_editor, kind):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.get_table_name(kind)}_terms")
+        super().drop_index(schema_editor, kind)
+
+    def prepare(self, text):
+        return " ".join(stem(word) for word in get_words(text))
+
+    def index(self, kind, object_id, title, body):
+        table_name = self.get_table_name(kind)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table_name} WHERE rowid = %s", [object_id])
+            cursor.execute(
+                f"INSERT INTO {table_name} (rowid, title, body) VALUES (%s, %s, %s)",
+                [object_id, self.prepare(title), self.prepare(body)],
+            )
+
+    def get_prefix_terms(self, cursor, kind, prefix):
+        """
+        Native FTS5 prefix queries ("word"*) may fail with "database disk image is malformed" when rows were deleted
+        in the current transaction (SQLite 3.40), so the prefixes are expanded into the indexed terms by the
+        vocabulary table instead - only the MAX_PREFIX_TERMS most frequent ones
+        """
+
+        cursor.execute(
+            f"SELECT term FROM {self.get_table_name(kind)}_terms WHERE term >= %s AND term < %s "
+            "ORDER BY doc DESC LIMIT %s",
+            [prefix, prefix + "\uffff", self.MAX_PREFIX_TERMS],
+        )
+
+        return [row[0] for row in cursor.fetchall()]
+
+    def search(self, kind, query, limit):
+        words = [stem(word) for word in get_words(query)]
+
+        if not words:
+            return []
+
+        table_name = self.get_table_name(kind)
+
+        with self.connection.cursor() as cursor:
+            terms_groups = []
+
+            for word in words:
+                terms = self.get_prefix_terms(cursor, kind, word)
+
+                if not terms:
+                    return []
+
+                terms_groups.append(" OR ".join(f'"{term}"' for term in terms))
+
+            cursor.execute(
+                f"SELECT rowid FROM {table_name} WHERE {table_name} MATCH %s "
+                f"ORDER BY bm25({table_name}, 10.0, 1.0), rowid DESC LIMIT %s",
+                [" AND ".join(f"({terms})" for terms in terms_groups), limit],
+            )
+
+            return [row[0] for row in cursor.fetchall()]
+
+    # SQLite has no trigram index, so the autocomplete keys are kept in in-memory tries ({kind: (trie, built_at)}),
+    # updated by the signals of this process and rebuilt from the database after TRIE_MAX_AGE seconds to catch the
+    # changes made by other processes
+    tries = {}
+    tries_lock = threading.Lock()
+    TRIE_MAX_AGE = 300
+
+    def get_trie(self, kind, queryset, field):
+        with self.tries_lock:
+            trie, built_at = self.tries.get(kind, (None, 0))
+
+            if trie is None or time.monotonic() - built_at > self.TRIE_MAX_AGE:
+                trie = Trie()
+
+                for object_id, key in queryset.values_list("id", field).iterator():
+                    trie.insert(object_id, key)
+
+                self.tries[kind] = (trie, time.monotonic())
+
+            return trie
+
+    def autocomplete(self, kind, queryset, field, prefix, limit):
+        return self.get_trie(kind, queryset, field).find(prefix, limit)
+
+    def update_autocomplete(self, kind, object_id, key):
+        trie, _ = self.tries.get(kind, (None, 0))
+
+        if trie is not None:
+            trie.insert(object_id, key)
+
+    def remove_autocomplete(self, kind, object_id):
+        trie, _ = self.tries.get(kind, (None, 0))
+
+        if trie is not None:
+            trie.remove(object_id)
+
+
+class PostgreSQLSearchBackend(BaseSearchBackend):
+    """
+    tsvector backend for production - the documents are stored already parsed (accents removed and stemmed by the
+    portuguese text search configuration) and indexed with GIN
+    """
+
+    id_column = "object_id"
+    text_search_config = "portuguese"
+
+    def create_index(self, schema_editor, kind):
+        table_name = self.get_table_name(kind)
+
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        schema_editor.execute(f"CREATE TABLE {table_name} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)")
+        schema_editor.execute(f"CREATE INDEX {table_name}_gin ON {table_name} USING GIN (document)")
+
+    def index(self, kind, object_id, title, body):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.get_table_name(kind)} (object_id, document) VALUES (%s, "
+                "setweight(to_tsvector(%s::regconfig, unaccent(%s)), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, unaccent(%s)), 'B')) "
+                "ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                [object_id, self.text_search_config, title or "", self.text_search_config, body or ""],
+            )
+
+    def search(self, kind, query, limit):
+        words = get_words(query)
+
+        if not words:
+            return []
+
+        table_name = self.get_table_name(kind)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT object_id FROM {table_name}, to_tsquery(%s::regconfig, %s) query "
+                "WHERE document @@ query ORDER BY ts_rank(document, query) DESC, object_id DESC LIMIT %s",
+                [self.text_search_config, " & ".join(f"{word}:*" for word in words), limit],
+            )
+
+            return [row[0] for row in cursor.fetchall()]
+
+    def create_autocomplete_index(self, schema_editor, table_name, column):
+        # the indexed expression is the one django generates for the istartswith lookup
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX {table_name}_{column}_trgm ON {table_name} USING GIN ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+    def drop_autocomplete_index(self, schema_editor, table_name, column):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table_name}_{column}_trgm")
+
+    def autocomplete(self, kind, queryset, field, prefix, limit):
+        return list(
+            queryset.filter(**{f"{field}__istartswith": prefix})
+            .order_by(Length(field), field)
+            .values_list("id", flat=True)[:limit]
+        )
+
+
+def get_search_backend(connection=None):
+    """
+    Returns the backend of the database vendor of the connection - the backends can be replaced in the
+    SEARCH_BACKENDS setting ({vendor: import path})
+    """
+
+    connection = connection or default_connection
+    backends = {**DEFAULT_SEARCH_BACKENDS, **getattr(settings, "SEARCH_BACKENDS", {})}
+
+    return import_string(backends[connection.vendor])(connection)
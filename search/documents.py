@@ -0,0 +1,113 @@
+import json
+from urllib.parse import quote
+
+from profiles.models import Profile
+from projects.models import Project
+
+from .backends import get_search_backend
+
+PROJECT = "project"
+PROFILE = "profile"
+
+SEARCH_KINDS = [PROJECT, PROFILE]
+
+# fields matched by the autocomplete
+AUTOCOMPLETE_FIELDS = {PROJECT: "name", PROFILE: "user__username"}
+
+# the results of each prefix are cached for a short time, since the same prefixes are typed by many users
+AUTOCOMPLETE_CACHE_KEY = "autocomplete:{kind}:{prefix}"
+AUTOCOMPLETE_CACHE_TIMEOUT = 30
+AUTOCOMPLETE_MAX_PREFIX_LENGTH = 50
+
+
+def get_description_text(description):
+    """
+    Project descriptions are draft.js raw contents - only the text of the blocks is indexed
+    """
+
+    try:
+        return " ".join(block.get("text", "") for block in json.loads(description)["blocks"])
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return description or ""
+
+
+def get_project_document(project):
+    title = " ".join([project.name or "", project.slogan or ""])
+    body = " ".join([get_description_text(project.description), *[field.name for field in project.fields.all()]])
+
+    return title, body
+
+
+def get_profile_document(profile):
+    title = " ".join([profile.user.username, profile.first_name, profile.last_name])
+    body = " ".join([profile.bio or "", *[skill.name for skill in profile.skills.all()]])
+
+    return title, body
+
+
+def index_projects(projects):
+    backend = get_search_backend()
+
+    for project in projects:
+        backend.index(PROJECT, project.id, *get_project_document(project))
+        backend.update_autocomplete(PROJECT, project.id, project.name)
+
+
+def index_profiles(profiles):
+    backend = get_search_backend()
+
+    for profile in profiles:
+        # superusers never show up in the searches
+        if profile.user.is_superuser:
+            backend.delete(PROFILE, [profile.id])
+            backend.remove_autocomplete(PROFILE, profile.id)
+        else:
+            backend.index(PROFILE, profile.id, *get_profile_document(profile))
+            backend.update_autocomplete(PROFILE, profile.id, profile.user.username)
+
+
+def unindex(kind, object_ids):
+    backend = get_search_backend()
+    backend.delete(kind, list(object_ids))
+
+    for object_id in object_ids:
+        backend.remove_autocomplete(kind, object_id)
+
+
+def rebuild_search_index():
+    backend = get_search_backend()
+
+    for kind in SEARCH_KINDS:
+        backend.clear(kind)
+
+    index_projects(Project.objects.prefetch_related("fields"))
+    index_profiles(Profile.objects.select_related("user").prefetch_related("skills"))
+
+
+def search(queryset, kind, query, limit):
+    """
+    Returns the objects of the queryset that match the query, from the most to the least relevant
+    """
+
+    ids = get_search_backend().search(kind, query, limit)
+    objects = queryset.in_bulk(ids)
+
+    return [objects[id] for id in ids if id in objects]
+
+
+def get_autocomplete_cache_key(kind, prefix):
+    return AUTOCOMPLETE_CACHE_KEY.format(kind=kind, prefix=quote(prefix.lower()))
+
+
+def autocomplete(queryset, kind, prefix, limit):
+    """
+    Returns the objects of the queryset whose name (see AUTOCOMPLETE_FIELDS) starts with the prefix
+    """
+
+    field = AUTOCOMPLETE_FIELDS[kind]
+    ids = get_search_backend().autocomplete(kind, queryset, field, prefix, limit)
+
+    # the prefix is checked again, since in-memory indexes may be outdated
+    objects = queryset.filter(**{f"{field}__istartswith": prefix}).in_bulk(ids)
+
+    return [objects[id] for id in ids if id in objects]
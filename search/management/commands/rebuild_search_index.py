@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from search.documents import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Indexes every project and profile in the full-text search index"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_index()
+
+        self.stdout.write("Search index rebuilt")
@@ -0,0 +1,33 @@
+from django.db import migrations
+from search.backends import get_search_backend
+
+SEARCH_KINDS = ["project", "profile"]
+
+
+def create_indexes(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+
+    for kind in SEARCH_KINDS:
+        backend.create_index(schema_editor, kind)
+
+
+def drop_indexes(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+
+    for kind in SEARCH_KINDS:
+        backend.drop_index(schema_editor, kind)
+
+
+class Migration(migrations.Migration):
+    """
+    The index tables are vendor specific (FTS5 virtual tables on SQLite, tsvector tables on PostgreSQL), so they're
+    created by the search backend. Existing rows are indexed by the rebuild_search_index command
+    """
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from search.backends import get_search_backend
+
+# (app label, model, column) of the autocomplete fields
+AUTOCOMPLETE_COLUMNS = [("profiles", "User", "username"), ("projects", "Project", "name")]
+
+
+def create_autocomplete_indexes(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+
+    for app_label, model_name, column in AUTOCOMPLETE_COLUMNS:
+        backend.create_autocomplete_index(schema_editor, apps.get_model(app_label, model_name)._meta.db_table, column)
+
+
+def drop_autocomplete_indexes(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+
+    for app_label, model_name, column in AUTOCOMPLETE_COLUMNS:
+        backend.drop_autocomplete_index(schema_editor, apps.get_model(app_label, model_name)._meta.db_table, column)
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram indexes for the prefix lookups of the autocomplete on PostgreSQL - the SQLite backend keeps in-memory
+    tries instead, so nothing is created there
+    """
+
+    dependencies = [
+        ("search", "0001_initial"),
+        ("profiles", "0028_alter_profile_options"),
+        ("projects", "0052_notification"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_autocomplete_indexes, drop_autocomplete_indexes),
+    ]
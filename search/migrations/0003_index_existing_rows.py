@@ -0,0 +1,34 @@
+from django.db import migrations
+from search.backends import get_search_backend
+from search.documents import PROFILE, PROJECT, get_profile_document, get_project_document
+
+
+def index_existing_rows(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+    Project = apps.get_model("projects", "Project")
+    Profile = apps.get_model("profiles", "Profile")
+
+    for project in Project.objects.prefetch_related("fields"):
+        backend.index(PROJECT, project.id, *get_project_document(project))
+
+    # superusers never show up in the searches
+    profiles = Profile.objects.filter(user__is_superuser=False).select_related("user").prefetch_related("skills")
+
+    for profile in profiles:
+        backend.index(PROFILE, profile.id, *get_profile_document(profile))
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes the projects and profiles created before the search app - later changes are indexed by the signals
+    """
+
+    dependencies = [
+        ("search", "0002_autocomplete_indexes"),
+        ("profiles", "0029_image_variants"),
+        ("projects", "0054_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
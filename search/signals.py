@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from profiles.models import Profile, Skill
+from projects.models import Field, Project
+
+from .documents import PROFILE, PROJECT, index_profiles, index_projects, unindex
+
+# the search index is kept up to date incrementally - every change to an indexed text reindexes only the objects
+# that contain it. Fixtures (raw saves) aren't indexed, the rebuild_search_index command must be run after loading them
+
+
+@receiver(post_save, sender=Project)
+def project_index(sender, instance, raw, **kwargs):
+    if not raw:
+        index_projects([instance])
+
+
+@receiver(post_delete, sender=Project)
+def project_unindex(sender, instance, **kwargs):
+    unindex(PROJECT, [instance.id])
+
+
+@receiver(post_save, sender=Profile)
+def profile_index(sender, instance, raw, **kwargs):
+    if not raw:
+        index_profiles([instance])
+
+
+@receiver(post_delete, sender=Profile)
+def profile_unindex(sender, instance, **kwargs):
+    unindex(PROFILE, [instance.id])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_index(sender, instance, created, raw, update_fields, **kwargs):
+    # the profile of a new user is indexed when it's created, logins only change last_login
+    if not created and not raw and update_fields != frozenset(["last_login"]):
+        index_profiles(Profile.objects.filter(user=instance).select_related("user"))
+
+
+@receiver(post_save, sender=Field)
+def field_index(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        index_projects(instance.projects.all())
+
+
+@receiver(post_save, sender=Skill)
+def skill_index(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        index_profiles(instance.profiles.select_related("user"))
+
+
+# the m2m rows are already deleted on post_delete, so the related objects are collected before the deletion
+
+
+@receiver(pre_delete, sender=Field)
+def field_collect_projects(sender, instance, **kwargs):
+    instance.indexed_projects_ids = list(instance.projects.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Field)
+def field_reindex_projects(sender, instance, **kwargs):
+    index_projects(Project.objects.filter(id__in=getattr(instance, "indexed_projects_ids", [])))
+
+
+@receiver(pre_delete, sender=Skill)
+def skill_collect_profiles(sender, instance, **kwargs):
+    instance.indexed_profiles_ids = list(instance.profiles.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Skill)
+def skill_reindex_profiles(sender, instance, **kwargs):
+    index_profiles(Profile.objects.filter(id__in=getattr(instance, "indexed_profiles_ids", [])).select_related("user"))
+
+
+def get_changed_objects_ids(instance, action, reverse, pk_set, related_name):
+    """
+    Returns the ids of the indexed objects affected by a m2m change - on reverse changes (e.g. field.projects.add())
+    they're the related objects, which are collected before a clear
+    """
+
+    if not reverse:
+        return [instance.id] if action in ["post_add", "post_remove", "post_clear"] else []
+
+    if action == "pre_clear":
+        instance.cleared_ids = list(getattr(instance, related_name).values_list("id", flat=True))
+        return []
+
+    if action == "post_clear":
+        return getattr(instance, "cleared_ids", [])
+
+    return list(pk_set or []) if action in ["post_add", "post_remove"] else []
+
+
+@receiver(m2m_changed, sender=Project.fields.through)
+def project_fields_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    ids = get_changed_objects_ids(instance, action, reverse, pk_set, "projects")
+
+    if ids:
+        index_projects(Project.objects.filter(id__in=ids))
+
+
+@receiver(m2m_changed, sender=Profile.skills.through)
+def profile_skills_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    ids = get_changed_objects_ids(instance, action, reverse, pk_set, "profiles")
+
+    if ids:
+        index_profiles(Profile.objects.filter(id__in=ids).select_related("user"))
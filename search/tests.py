@@ -0,0 +1,267 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from profiles.models import Profile, Skill
+from projects.models import Field, Project
+
+from .backends import SQLiteSearchBackend, get_search_backend, get_words, stem
+from .documents import PROFILE, PROJECT, autocomplete, get_description_text, search
+from .trie import Trie
+
+User = get_user_model()
+
+
+def search_ids(kind, query):
+    return get_search_backend().search(kind, query, 20)
+
+
+class TestText(TestCase):
+    def test_get_words(self):
+        self.assertEqual(get_words("Programação, AÇAÍ & co."), ["programacao", "acai", "co"])
+        self.assertEqual(get_words('"foo"* OR bar:* joao_silva'), ["foo", "or", "bar", "joao", "silva"])
+        self.assertEqual(get_words(None), [])
+
+    def test_stem(self):
+        self.assertEqual(stem("projetos"), "projeto")
+        self.assertEqual(stem("inovacoes"), "inovacao")
+        self.assertEqual(stem("digitais"), "digital")
+        self.assertEqual(stem("onibus"), "onibus")
+        self.assertEqual(stem("classes"), "classe")
+        self.assertEqual(stem("uns"), "uns")
+
+    def test_get_description_text(self):
+        description = '{"blocks": [{"text": "Foo"}, {"text": "bar"}], "entityMap": {}}'
+        self.assertEqual(get_description_text(description), "Foo bar")
+        self.assertEqual(get_description_text("plain text"), "plain text")
+        self.assertEqual(get_description_text(None), "")
+
+
+class TestSearch(TestCase):
+    def test_ranking(self):
+        project01 = Project.objects.create(name="Rockets", slogan="Space travel")
+        project02 = Project.objects.create(name="Space", slogan="Space travel for everyone")
+        Project.objects.create(name="Cars")
+
+        # title matches rank higher than body matches
+        project03 = Project.objects.create(name="Cars")
+        project03.description = '{"blocks": [{"text": "Space cars"}]}'
+        project03.save()
+
+        self.assertEqual(search_ids(PROJECT, "space"), [project02.id, project01.id, project03.id])
+        self.assertEqual(search_ids(PROJECT, "spa trav"), [project02.id, project01.id])
+        self.assertEqual(search_ids(PROJECT, "   "), [])
+
+    def test_search(self):
+        project01 = Project.objects.create(name="Foo")
+        project02 = Project.objects.create(name="Foo bar")
+
+        self.assertEqual(search(Project.objects.all(), PROJECT, "foo", 20), [project01, project02])
+        self.assertEqual(search(Project.objects.exclude(pk=project01.pk), PROJECT, "foo", 20), [project02])
+        self.assertEqual(search(Project.objects.all(), PROJECT, "foo", 1), [project01])
+
+    @mock.patch.object(SQLiteSearchBackend, "MAX_PREFIX_TERMS", 2)
+    def test_prefix_terms_limit(self):
+        spaceships = [Project.objects.create(name="Spaceship") for i in range(3)]
+        spacecrafts = [Project.objects.create(name="Spacecraft") for i in range(2)]
+        spacey = Project.objects.create(name="Spacey")
+
+        # the prefix is only expanded into the most frequent terms, so the documents of the rare ones are dropped
+        self.assertEqual(sorted(search_ids(PROJECT, "spa")), [project.id for project in spaceships + spacecrafts])
+
+        # a longer prefix (or the whole word) still finds them
+        self.assertEqual(search_ids(PROJECT, "spacey"), [spacey.id])
+
+
+class TestIndexMaintenance(TestCase):
+    def test_project(self):
+        project = Project.objects.create(name="SpaceX")
+        self.assertEqual(search_ids(PROJECT, "spacex"), [project.id])
+
+        project.name = "BlueOrigin"
+        project.save()
+        self.assertEqual(search_ids(PROJECT, "spacex"), [])
+        self.assertEqual(search_ids(PROJECT, "blueorigin"), [project.id])
+
+        field = Field.objects.create(name="Inovação")
+        project.fields.add(field)
+        self.assertEqual(search_ids(PROJECT, "inovacao"), [project.id])
+
+        field.name = "Finanças"
+        field.save()
+        self.assertEqual(search_ids(PROJECT, "inovacao"), [])
+        self.assertEqual(search_ids(PROJECT, "financa"), [project.id])
+
+        field.projects.clear()
+        self.assertEqual(search_ids(PROJECT, "financa"), [])
+
+        project.fields.add(field)
+        field.delete()
+        self.assertEqual(search_ids(PROJECT, "financa"), [])
+
+        project.delete()
+        self.assertEqual(search_ids(PROJECT, "blueorigin"), [])
+
+    def test_profile(self):
+        user = User.objects.create(username="felipe")
+        profile = user.profile
+        self.assertEqual(search_ids(PROFILE, "felipe"), [profile.id])
+
+        user.username = "felipe.silva"
+        user.save()
+        self.assertEqual(search_ids(PROFILE, "silva"), [profile.id])
+
+        profile.bio = "Desenvolvedor de jogos"
+        profile.save()
+        self.assertEqual(search_ids(PROFILE, "jogo"), [profile.id])
+
+        skill = Skill.objects.create(name="design")
+        profile.skills.add(skill)
+        self.assertEqual(search_ids(PROFILE, "design"), [profile.id])
+
+        skill.name = "marketing"
+        skill.save()
+        self.assertEqual(search_ids(PROFILE, "design"), [])
+        self.assertEqual(search_ids(PROFILE, "marketing"), [profile.id])
+
+        skill.delete()
+        self.assertEqual(search_ids(PROFILE, "marketing"), [])
+
+        user.is_superuser = True
+        user.save()
+        self.assertEqual(search_ids(PROFILE, "felipe"), [])
+
+        user.is_superuser = False
+        user.save()
+        user.delete()
+        self.assertEqual(search_ids(PROFILE, "felipe"), [])
+
+    def test_rebuild_search_index_command(self):
+        project = Project.objects.create(name="SpaceX")
+        profile = User.objects.create(username="felipe").profile
+
+        get_search_backend().clear(PROJECT)
+        get_search_backend().clear(PROFILE)
+        self.assertEqual(search_ids(PROJECT, "spacex"), [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+
+        self.assertEqual(search_ids(PROJECT, "spacex"), [project.id])
+        self.assertEqual(search_ids(PROFILE, "felipe"), [profile.id])
+        self.assertEqual(Profile.objects.count(), 1)
+
+    def test_index_existing_rows_migration(self):
+        project = Project.objects.create(name="SpaceX")
+        profile = User.objects.create(username="felipe").profile
+        User.objects.create(username="admin", is_superuser=True)
+
+        get_search_backend().clear(PROJECT)
+        get_search_backend().clear(PROFILE)
+
+        migration = import_module("search.migrations.0003_index_existing_rows")
+        migration.index_existing_rows(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(search_ids(PROJECT, "spacex"), [project.id])
+        self.assertEqual(search_ids(PROFILE, "felipe"), [profile.id])
+        self.assertEqual(search_ids(PROFILE, "admin"), [])
+
+    def test_login(self):
+        user = User.objects.create(username="felipe")
+        get_search_backend().clear(PROFILE)
+
+        # logins only save last_login, which isn't indexed
+        user.save(update_fields=["last_login"])
+        self.assertEqual(search_ids(PROFILE, "felipe"), [])
+
+        user.save()
+        self.assertEqual(search_ids(PROFILE, "felipe"), [user.profile.id])
+
+
+class TestTrie(TestCase):
+    def test_find(self):
+        trie = Trie()
+        trie.insert(1, "Felipe")
+        trie.insert(2, "fe")
+        trie.insert(3, "felix")
+        trie.insert(4, "fabio")
+        trie.insert(5, "fe")
+
+        self.assertEqual(trie.find("FE", 10), [2, 5, 3, 1])
+        self.assertEqual(trie.find("fel", 1), [3])
+        self.assertEqual(trie.find("", 10), [2, 5, 4, 3, 1])
+        self.assertEqual(trie.find("x", 10), [])
+
+    def test_update(self):
+        trie = Trie()
+        trie.insert(1, "felipe")
+        trie.insert(1, "joao")
+        self.assertEqual(trie.find("f", 10), [])
+        self.assertEqual(trie.find("j", 10), [1])
+
+        trie.remove(1)
+        trie.remove(2)
+        self.assertEqual(trie.find("j", 10), [])
+        self.assertEqual(trie.root, {})
+
+
+class TestAutocomplete(TestCase):
+    def setUp(self):
+        SQLiteSearchBackend.tries.clear()
+        cache.clear()
+
+    def test_autocomplete(self):
+        project01 = Project.objects.create(name="Space Rockets")
+        project02 = Project.objects.create(name="Space")
+        Project.objects.create(name="Cars")
+
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "spa", 10), [project02, project01])
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "rockets", 10), [])
+
+        # the index is updated after it's built
+        project02.name = "Cars 2"
+        project02.save()
+        project03 = Project.objects.create(name="Spaceship")
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "spa", 10), [project03, project01])
+
+        project03.delete()
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "spa", 10), [project01])
+
+    def test_outdated_index(self):
+        project = Project.objects.create(name="Space")
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "spa", 10), [project])
+
+        # changes made without signals (e.g. by other processes) aren't returned
+        Project.objects.filter(id=project.id).update(name="Cars")
+        self.assertEqual(autocomplete(Project.objects.all(), PROJECT, "spa", 10), [])
+
+    def test_autocomplete_profiles(self):
+        profile = User.objects.create(username="felipe").profile
+        User.objects.create(username="fernanda", is_superuser=True)
+
+        response = self.client.get("/api/profiles/autocomplete-profiles/fe")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item["id"], item["username"]) for item in response.data], [(profile.id, "felipe")])
+        self.assertEqual(set(response.data[0]), {"id", "username", "photo"})
+
+    def test_autocomplete_projects(self):
+        project = Project.objects.create(name="Space")
+
+        response = self.client.get("/api/projects/autocomplete-projects/Sp")
+        self.assertEqual([(item["id"], item["name"]) for item in response.data], [(project.id, "Space")])
+        self.assertEqual(set(response.data[0]), {"id", "name", "image"})
+
+        # the results of a prefix are cached
+        Project.objects.create(name="Spaceship")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/projects/autocomplete-projects/sp")
+
+        self.assertEqual(len(response.data), 1)
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+
+class Trie:
+    """
+    Prefix tree of lowercase keys to object ids - lookups only walk the prefix and as many nodes as needed to collect
+    the results, so they don't depend on the number of keys
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.root = {}
+        self.keys = {}
+
+    def insert(self, object_id, key):
+        key = key.lower()
+
+        with self.lock:
+            if self.keys.get(object_id) == key:
+                return
+
+            self._remove(object_id)
+            self.keys[object_id] = key
+
+            node = self.root
+
+            for char in key:
+                node = node.setdefault(char, {})
+
+            node.setdefault(None, set()).add(object_id)
+
+    def remove(self, object_id):
+        with self.lock:
+            self._remove(object_id)
+
+    def _remove(self, object_id):
+        key = self.keys.pop(object_id, None)
+
+        if key is None:
+            return
+
+        path = [self.root]
+
+        for char in key:
+            path.append(path[-1][char])
+
+        path[-1][None].discard(object_id)
+
+        # pruning the nodes left empty
+        for index in range(len(key), -1, -1):
+            node = path[index]
+
+            if node.get(None) == set():
+                del node[None]
+
+            if node or index == 0:
+                break
+
+            del path[index - 1][key[index - 1]]
+
+    def find(self, prefix, limit):
+        """
+        Returns the ids of up to *limit* keys starting with the prefix - shorter keys first, then alphabetically
+        """
+
+        with self.lock:
+            node = self.root
+
+            for char in prefix.lower():
+                if char not in node:
+                    return []
+
+                node = node[char]
+
+            ids = []
+            nodes = deque([node])
+
+            while nodes and len(ids) < limit:
+                node = nodes.popleft()
+                ids.extend(sorted(node.get(None, [])))
+                nodes.extend(node[char] for char in sorted(char for char in node if char is not None))
+
+            return ids[:limit]
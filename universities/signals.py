@@ -0,0 +1,15 @@
+from core.caching import MAJORS_LIST, UNIVERSITIES_LIST, invalidate_reference_lists
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Major, University
+
+
+@receiver([post_save, post_delete], sender=University)
+def university_invalidate_list(sender, **kwargs):
+    invalidate_reference_lists(UNIVERSITIES_LIST)
+
+
+@receiver([post_save, post_delete], sender=Major)
+def major_invalidate_list(sender, **kwargs):
+    invalidate_reference_lists(MAJORS_LIST)
@@ -47,3 +47,15 @@ class TestGetMajorNameList(TestCase):
 
         response = client.get(self.url)
         self.assertEqual(response.data, serializer.data)
+
+    def test_cache(self):
+        major = Major.objects.create(name="computer eng.")
+        response = client.get(self.url)
+
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        major.name = "law"
+        major.save()
+        response = client.get(self.url)
+        self.assertEqual(response.data, MajorSerializer01([major], many=True).data)
@@ -1,3 +1,4 @@
+from core.caching import MAJORS_LIST, UNIVERSITIES_LIST, cached_reference_list
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
@@ -6,6 +7,7 @@ from .serializers import MajorSerializer01, UniversitySerializer01
 
 
 @api_view(["GET"])
+@cached_reference_list(UNIVERSITIES_LIST)
 def get_universities_name_list(request):
     universities = University.objects.all()
     serializer = UniversitySerializer01(universities, many=True)
@@ -14,6 +16,7 @@ def get_universities_name_list(request):
 
 
 @api_view(["GET"])
+@cached_reference_list(MAJORS_LIST)
 def get_majors_name_list(request):
     majors = Major.objects.all()
     serializer = MajorSerializer01(majors, many=True)